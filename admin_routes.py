@@ -1,3 +1,6 @@
+import io
+import sqlite3
+
 from flask import (
     Blueprint,
     render_template,
@@ -6,42 +9,59 @@ from flask import (
     url_for,
     flash,
     current_app,
+    abort,
+    Response,
+    stream_with_context,
 )
 from flask_login import login_required
-from werkzeug.security import generate_password_hash
 
-from database import get_db
+from database import get_db, read_mostly, write_lane
 from utils import role_required
 from models import fetch_user_by_username
+from pagination import appointment_filters, fetch_page, wants_json
+from search import search_doctors, search_patients
+from counters import read_totals
+from user_cache import invalidate_user
+from passwords import get_hasher
+from exports import EXPORT_FORMATS, stream_export
+from importer import IMPORT_KINDS, import_csv
+from fragments import Lazy
+from rollups import department_summary, doctor_summary, parse_range, pending_backlog
+from bulk_ops import (
+    REASSIGN_MODES,
+    future_open_count,
+    preview_reassignment,
+    reassign_future,
+)
 
 admin_bp = Blueprint("admin", __name__, template_folder="templates/admin")
 
+# Module-level so query_plans checks exactly what the views run.
+UPCOMING_SQL = """
+    SELECT a.*, p.full_name AS patient_name, d.full_name AS doctor_name
+    FROM appointments a
+    JOIN patients p ON a.patient_id = p.id
+    JOIN doctors d ON a.doctor_id = d.id
+    WHERE a.start_at >= date('now')
+    ORDER BY a.start_at
+    LIMIT 5
+"""
+APPOINTMENTS_SQL = """
+    SELECT a.*, p.full_name AS patient_name, d.full_name AS doctor_name
+    FROM appointments a
+    JOIN patients p ON a.patient_id = p.id
+    JOIN doctors d ON a.doctor_id = d.id
+"""
+
 
 @admin_bp.route("/dashboard")
 @login_required
 @role_required("admin")
 def dashboard():
     conn = get_db()
-    totals = conn.execute(
-        """
-        SELECT
-            (SELECT COUNT(*) FROM doctors) AS doctors,
-            (SELECT COUNT(*) FROM patients) AS patients,
-            (SELECT COUNT(*) FROM appointments) AS appointments
-        """
-    ).fetchone()
+    totals = read_totals(conn)
 
-    upcoming = conn.execute(
-        """
-        SELECT a.*, p.full_name AS patient_name, d.full_name AS doctor_name
-        FROM appointments a
-        JOIN patients p ON a.patient_id = p.id
-        JOIN doctors d ON a.doctor_id = d.id
-        WHERE date(a.date) >= date('now')
-        ORDER BY a.date, a.time
-        LIMIT 5
-        """
-    ).fetchall()
+    upcoming = conn.execute(UPCOMING_SQL).fetchall()
 
     return render_template("admin/dashboard.html", totals=totals, upcoming=upcoming)
 
@@ -63,16 +83,20 @@ def doctors():
         flash("Department saved.", "success")
         return redirect(url_for("admin.doctors"))
 
-    doctors = conn.execute(
-        """
-        SELECT d.*, u.email, dept.name AS department_name
-        FROM doctors d
-        JOIN users u ON d.user_id = u.id
-        LEFT JOIN departments dept ON d.department_id = dept.id
-        ORDER BY d.full_name
-        """
-    ).fetchall()
-    departments = conn.execute("SELECT * FROM departments ORDER BY name").fetchall()
+    doctors = Lazy(
+        lambda: conn.execute(
+            """
+            SELECT d.*, u.email, dept.name AS department_name
+            FROM doctors d
+            JOIN users u ON d.user_id = u.id
+            LEFT JOIN departments dept ON d.department_id = dept.id
+            ORDER BY d.full_name
+            """
+        ).fetchall()
+    )
+    departments = Lazy(
+        lambda: conn.execute("SELECT * FROM departments ORDER BY name").fetchall()
+    )
 
     return render_template(
         "admin/doctors.html", doctors=doctors, departments=departments
@@ -80,6 +104,7 @@ def doctors():
 
 
 @admin_bp.route("/add_doctor", methods=["GET", "POST"])
+@read_mostly
 @login_required
 @role_required("admin")
 def add_doctor():
@@ -98,10 +123,13 @@ def add_doctor():
             flash("Username already exists.", "danger")
             return redirect(url_for("admin.add_doctor"))
 
+        # Hash before taking the writer lane so other writes aren't held up.
+        password_hash = get_hasher().hash(password)
+        conn = get_db(write=True)
         cursor = conn.cursor()
         cursor.execute(
             "INSERT INTO users (username, email, password_hash, role) VALUES (?, ?, ?, 'doctor')",
-            (username, email, generate_password_hash(password)),
+            (username, email, password_hash),
         )
         user_id = cursor.lastrowid
         cursor.execute(
@@ -153,7 +181,14 @@ def edit_doctor(doctor_id):
             (full_name, specialization, department_id, is_blacklisted, doctor_id),
         )
         conn.commit()
+        invalidate_user(doctor["user_id"])
         flash("Doctor updated.", "success")
+        if is_blacklisted and future_open_count(conn, doctor_id):
+            flash(
+                "This doctor still has upcoming appointments. Reassign or cancel them.",
+                "warning",
+            )
+            return redirect(url_for("admin.reassign_appointments", doctor_id=doctor_id))
         return redirect(url_for("admin.doctors"))
 
     return render_template(
@@ -161,6 +196,43 @@ def edit_doctor(doctor_id):
     )
 
 
+@admin_bp.route("/doctors/<int:doctor_id>/reassign", methods=["GET", "POST"])
+@login_required
+@role_required("admin")
+def reassign_appointments(doctor_id):
+    conn = get_db()
+    doctor = conn.execute(
+        """
+        SELECT d.*, dept.name AS department_name
+        FROM doctors d
+        LEFT JOIN departments dept ON d.department_id = dept.id
+        WHERE d.id = ?
+        """,
+        (doctor_id,),
+    ).fetchone()
+    if not doctor:
+        flash("Doctor not found.", "warning")
+        return redirect(url_for("admin.doctors"))
+
+    if request.method == "POST":
+        mode = request.form.get("mode")
+        if mode not in REASSIGN_MODES:
+            flash("Choose how to handle the appointments.", "warning")
+            return redirect(url_for("admin.reassign_appointments", doctor_id=doctor_id))
+        summary = reassign_future(conn, doctor_id, mode)
+        flash(
+            f"Reassigned {summary.reassigned} appointment(s) to "
+            f"{len(summary.by_doctor)} doctor(s); cancelled {summary.cancelled}; "
+            f"{summary.unmatched} left with no free doctor.",
+            "success" if not summary.unmatched else "warning",
+        )
+        return redirect(url_for("admin.reassign_appointments", doctor_id=doctor_id))
+
+    return render_template(
+        "admin/reassign.html", doctor=doctor, moves=preview_reassignment(conn, doctor_id)
+    )
+
+
 @admin_bp.route("/delete_doctor/<int:doctor_id>", methods=["POST"])
 @login_required
 @role_required("admin")
@@ -171,9 +243,15 @@ def delete_doctor(doctor_id):
         flash("Doctor not found.", "warning")
         return redirect(url_for("admin.doctors"))
 
-    conn.execute("DELETE FROM doctors WHERE id = ?", (doctor_id,))
-    conn.execute("DELETE FROM users WHERE id = ?", (doctor["user_id"],))
-    conn.commit()
+    try:
+        conn.execute("DELETE FROM doctors WHERE id = ?", (doctor_id,))
+        conn.execute("DELETE FROM users WHERE id = ?", (doctor["user_id"],))
+        conn.commit()
+        invalidate_user(doctor["user_id"])
+    except sqlite3.IntegrityError:
+        conn.rollback()
+        flash("Doctor has appointment records. Blacklist instead.", "warning")
+        return redirect(url_for("admin.doctors"))
     flash("Doctor deleted.", "info")
     return redirect(url_for("admin.doctors"))
 
@@ -188,23 +266,9 @@ def search():
     doctors = patients = []
 
     if scope == "doctor":
-        doctors = conn.execute(
-            """
-            SELECT d.*, dept.name AS department_name
-            FROM doctors d
-            LEFT JOIN departments dept ON d.department_id = dept.id
-            WHERE d.full_name LIKE ? OR d.specialization LIKE ?
-            """,
-            (f"%{query}%", f"%{query}%"),
-        ).fetchall()
+        doctors = search_doctors(conn, query)
     else:
-        patients = conn.execute(
-            """
-            SELECT * FROM patients
-            WHERE full_name LIKE ? OR contact LIKE ? OR CAST(id AS TEXT) LIKE ?
-            """,
-            (f"%{query}%", f"%{query}%", f"%{query}%"),
-        ).fetchall()
+        patients = search_patients(conn, query)
 
     return render_template(
         "admin/search.html", query=query, scope=scope, doctors=doctors, patients=patients
@@ -216,14 +280,107 @@ def search():
 @role_required("admin")
 def appointments():
     conn = get_db()
-    data = conn.execute(
-        """
-        SELECT a.*, p.full_name AS patient_name, d.full_name AS doctor_name
-        FROM appointments a
-        JOIN patients p ON a.patient_id = p.id
-        JOIN doctors d ON a.doctor_id = d.id
-        ORDER BY date(a.date) DESC, time(a.time) DESC
-        """
-    ).fetchall()
-    return render_template("admin/appointments.html", appointments=data)
+    clauses, params = appointment_filters(
+        request.args,
+        allowed=("status", "date_from", "date_to", "doctor_id", "department_id"),
+    )
+    page = fetch_page(
+        conn,
+        APPOINTMENTS_SQL,
+        clauses,
+        params,
+    )
+    if wants_json():
+        return page.to_json()
+
+    doctors = conn.execute("SELECT id, full_name FROM doctors ORDER BY full_name").fetchall()
+    departments = conn.execute("SELECT * FROM departments ORDER BY name").fetchall()
+    return render_template(
+        "admin/appointments.html",
+        appointments=page.items,
+        page=page,
+        doctors=doctors,
+        departments=departments,
+    )
 
+
+@admin_bp.route("/export/appointments.<fmt>")
+@login_required
+@role_required("admin")
+def export_appointments(fmt):
+    if fmt not in EXPORT_FORMATS:
+        abort(404)
+    conn = get_db()
+    body = stream_export(
+        conn,
+        fmt,
+        request.args,
+        batch_size=current_app.config.get("EXPORT_BATCH_SIZE", 500),
+    )
+    return Response(
+        stream_with_context(body),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={
+            "Content-Disposition": f"attachment; filename=appointments.{fmt}",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+@admin_bp.route("/import", methods=["GET", "POST"])
+@read_mostly
+@login_required
+@role_required("admin")
+def bulk_import():
+    report = None
+    kind = request.form.get("kind", "patient")
+
+    if request.method == "POST":
+        upload = request.files.get("file")
+        if kind not in IMPORT_KINDS or not upload or not upload.filename:
+            flash("Choose what to import and a CSV file.", "warning")
+            return redirect(url_for("admin.bulk_import"))
+
+        stream = io.TextIOWrapper(upload.stream, encoding="utf-8-sig", newline="")
+        report = import_csv(
+            get_db(),
+            kind,
+            stream,
+            get_hasher(),
+            chunk_size=current_app.config.get("IMPORT_CHUNK_SIZE", 1000),
+            writer=write_lane,
+        )
+        flash(
+            f"Imported {report.inserted} {kind}(s); {report.failed} row(s) rejected.",
+            "success" if not report.failed else "warning",
+        )
+
+    return render_template("admin/import.html", report=report, kind=kind)
+
+
+@admin_bp.route("/analytics")
+@login_required
+@role_required("admin")
+def analytics():
+    conn = get_db()
+    date_from, date_to = parse_range(request.args)
+    department_id = request.args.get("department_id", type=int)
+    return render_template(
+        "admin/analytics.html",
+        date_from=date_from,
+        date_to=date_to,
+        department_id=department_id,
+        departments=conn.execute("SELECT * FROM departments ORDER BY name").fetchall(),
+        by_department=department_summary(conn, date_from, date_to),
+        by_doctor=doctor_summary(conn, date_from, date_to, department_id=department_id),
+        backlog=pending_backlog(conn),
+    )
+
+
+@admin_bp.route("/slow-queries")
+@login_required
+@role_required("admin")
+def slow_queries():
+    log = current_app.extensions.get("slow_query_log")
+    queries = log.summary() if log is not None else None
+    return render_template("admin/slow_queries.html", log=log, queries=queries)
@@ -1,30 +1,43 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, abort, current_app, jsonify, request
 from flask_login import login_required
 
 from database import get_db
 from utils import role_required
+from counters import read_department_counts, read_status_counts, read_totals
+from slot_finder import find_next_slots, parse_window
+from rollups import (
+    daily_series,
+    department_summary,
+    doctor_summary,
+    parse_range,
+    pending_backlog,
+)
 
 api_bp = Blueprint("api", __name__)
 
+# Module-level so query_plans checks exactly what the view runs.
+DOCTOR_APPOINTMENTS_SQL = """
+    SELECT id, date, time, status, patient_id
+    FROM appointments
+    WHERE doctor_id = ?
+    ORDER BY start_at DESC
+    LIMIT 50
+"""
+
 
 @api_bp.route("/stats")
 @login_required
 @role_required("admin")
 def stats():
     conn = get_db()
-    totals = conn.execute(
-        """
-        SELECT
-            (SELECT COUNT(*) FROM doctors) AS doctors,
-            (SELECT COUNT(*) FROM patients) AS patients,
-            (SELECT COUNT(*) FROM appointments) AS appointments
-        """
-    ).fetchone()
+    totals = read_totals(conn)
     return jsonify(
         {
             "doctors": totals["doctors"],
             "patients": totals["patients"],
             "appointments": totals["appointments"],
+            "appointments_by_status": read_status_counts(conn),
+            "appointments_by_department": read_department_counts(conn),
         }
     )
 
@@ -34,15 +47,93 @@ def stats():
 @role_required("admin")
 def doctor_appointments(doctor_id):
     conn = get_db()
-    data = conn.execute(
-        """
-        SELECT id, date, time, status, patient_id
-        FROM appointments
-        WHERE doctor_id = ?
-        ORDER BY date(date) DESC, time(time) DESC
-        LIMIT 50
-        """,
-        (doctor_id,),
-    ).fetchall()
+    data = conn.execute(DOCTOR_APPOINTMENTS_SQL, (doctor_id,)).fetchall()
     return jsonify([dict(row) for row in data])
 
+
+@api_bp.route("/metrics")
+@login_required
+@role_required("admin")
+def metrics():
+    registry = current_app.extensions.get("metrics")
+    if registry is None:
+        abort(404)
+    return registry.render(), 200, {"Content-Type": "text/plain; version=0.0.4"}
+
+
+@api_bp.route("/slots/next")
+@login_required
+def next_slots():
+    date_from, days, limit = parse_window(request.args)
+    slots = find_next_slots(
+        get_db(),
+        current_app.extensions["occupancy_index"],
+        department_id=request.args.get("department_id", type=int),
+        specialization=request.args.get("specialization", ""),
+        date_from=date_from,
+        days=days,
+        limit=limit,
+    )
+    return jsonify(slots)
+
+
+@api_bp.route("/analytics/departments")
+@login_required
+@role_required("admin")
+def analytics_departments():
+    date_from, date_to = parse_range(request.args)
+    return jsonify(
+        {
+            "from": date_from,
+            "to": date_to,
+            "departments": department_summary(get_db(), date_from, date_to),
+        }
+    )
+
+
+@api_bp.route("/analytics/doctors")
+@login_required
+@role_required("admin")
+def analytics_doctors():
+    date_from, date_to = parse_range(request.args)
+    limit = max(1, min(request.args.get("limit", 50, type=int), 1000))
+    return jsonify(
+        {
+            "from": date_from,
+            "to": date_to,
+            "doctors": doctor_summary(
+                get_db(),
+                date_from,
+                date_to,
+                department_id=request.args.get("department_id", type=int),
+                limit=limit,
+            ),
+        }
+    )
+
+
+@api_bp.route("/analytics/daily")
+@login_required
+@role_required("admin")
+def analytics_daily():
+    date_from, date_to = parse_range(request.args)
+    return jsonify(
+        {
+            "from": date_from,
+            "to": date_to,
+            "days": daily_series(
+                get_db(),
+                date_from,
+                date_to,
+                department_id=request.args.get("department_id", type=int),
+                doctor_id=request.args.get("doctor_id", type=int),
+            ),
+        }
+    )
+
+
+@api_bp.route("/analytics/backlog")
+@login_required
+@role_required("admin")
+def analytics_backlog():
+    return jsonify(pending_backlog(get_db()))
@@ -1,31 +1,133 @@
 import os
+import time
 from flask import Flask, redirect, url_for
 from flask_login import LoginManager, current_user
 
-from database import init_db, close_db
-from models import User, fetch_user_by_id
-
-
-def create_app():
+from database import ensure_schema, init_pool, close_db
+from db_pool import PoolTimeout
+from fragments import init_templates
+from live_feed import init_feed
+from metrics import init_metrics
+from slow_queries import init_slow_query_log
+from slot_finder import OccupancyIndex
+from static_assets import init_assets
+from models import fetch_identity, fetch_identity_version
+from passwords import HasherBusy, init_hasher
+from reminders import init_reminders
+from user_cache import IdentityCache
+from utils import timed
+
+
+def create_app(config=None):
+    started = time.perf_counter()
+    timings = {}
     app = Flask(__name__, template_folder="templates", static_folder="static")
     app.config["SECRET_KEY"] = "super-secure-hms-key"
     app.config["DATABASE"] = os.path.join(os.path.dirname(__file__), "hms.db")
+    app.config["DB_POOL_SIZE"] = 8  # read-only connections for GET requests
+    app.config["DB_WRITE_POOL_SIZE"] = 1  # the writer lane
+    app.config["DB_POOL_TIMEOUT"] = 10.0
+    app.config["DB_MAX_USES"] = 1000
+    app.config["DB_BUSY_TIMEOUT_MS"] = 5000
+    app.config["DB_CACHE_SIZE_KB"] = 16384
+    app.config["DB_MMAP_SIZE"] = 64 * 1024 * 1024
+    app.config["PAGE_SIZE"] = 25
+    app.config["MAX_PAGE_SIZE"] = 200
+    app.config["SEARCH_RESULT_LIMIT"] = 50
+    app.config["USER_CACHE_SIZE"] = 1024
+    app.config["USER_CACHE_TTL"] = 60.0
+    app.config["PASSWORD_HASH_METHOD"] = "scrypt"
+    app.config["PASSWORD_SALT_LENGTH"] = 16
+    app.config["PASSWORD_HASH_WORKERS"] = None  # None = one per core, 0 = inline
+    app.config["PASSWORD_HASH_MAX_PENDING"] = 64
+    app.config["PASSWORD_HASH_TIMEOUT"] = 10.0
+    app.config["AUTO_MIGRATE"] = True
+    app.config["EXPORT_BATCH_SIZE"] = 500
+    app.config["IMPORT_CHUNK_SIZE"] = 1000
+    app.config["METRICS_ENABLED"] = True
+    app.config["SLOW_QUERY_LOG"] = False
+    app.config["SLOW_QUERY_THRESHOLD_MS"] = 100
+    app.config["SLOW_QUERY_LOG_FILE"] = os.path.join(
+        os.path.dirname(__file__), "slow_queries.log"
+    )
+    app.config["JINJA_BYTECODE_CACHE_DIR"] = os.path.join(
+        os.path.dirname(__file__), ".jinja_cache"
+    )
+    app.config["FRAGMENT_CACHE_SIZE"] = 512  # 0 disables fragment caching
+    app.config["STATIC_FINGERPRINT"] = True  # hashed, pre-compressed static URLs
+    app.config["ARCHIVE_DATABASE"] = None  # None = <DATABASE>-archive.db, "" = off
+    app.config["ARCHIVE_AFTER_DAYS"] = 365
+    app.config["ARCHIVE_BATCH_SIZE"] = 1000
+    app.config["FEED_POLL_INTERVAL"] = 1.0  # live feed poller, one per worker
+    app.config["FEED_HEARTBEAT"] = 15.0
+    app.config["FEED_QUEUE_SIZE"] = 256
+    app.config["FEED_REPLAY_LIMIT"] = 500
+    app.config["FEED_RETENTION_HOURS"] = 24
+    app.config["REMINDERS_ENABLED"] = False  # or run `flask hms reminders`
+    app.config["REMINDER_LEAD_MINUTES"] = 24 * 60
+    app.config["REMINDER_INTERVAL"] = 60.0
+    app.config["REMINDER_BATCH_SIZE"] = 1000
+    app.config["REMINDER_LEASE_SECONDS"] = 300
+    app.config["REMINDER_MAX_ATTEMPTS"] = 5
+    app.config["REMINDER_RETENTION_DAYS"] = 7
+    app.config["REMINDER_SENDER"] = None  # None = FileSender(REMINDER_OUTBOX_FILE)
+    app.config["REMINDER_OUTBOX_FILE"] = os.path.join(
+        os.path.dirname(__file__), "reminders.jsonl"
+    )
+    if config:
+        app.config.update(config)
+    if app.config["ARCHIVE_DATABASE"] is None:
+        app.config["ARCHIVE_DATABASE"] = (
+            os.path.splitext(app.config["DATABASE"])[0] + "-archive.db"
+        )
 
     # Ensure the instance path exists for SQLite file placement
     os.makedirs(os.path.dirname(app.config["DATABASE"]), exist_ok=True)
 
-    init_db(app)
+    with timed(timings, "pool"):
+        init_pool(app)
+    # Registered before ensure_schema() so its boot-time connection is
+    # returned to the pool too.
+    app.teardown_appcontext(close_db)
+    with timed(timings, "hasher"):
+        init_hasher(app)
+    with timed(timings, "schema"):
+        ensure_schema(app)
+    with timed(timings, "templates"):
+        init_templates(app)
+    with timed(timings, "assets"):
+        init_assets(app)
+
+    if app.config["METRICS_ENABLED"]:
+        init_metrics(app)
+    if app.config["SLOW_QUERY_LOG"]:
+        init_slow_query_log(app)
 
     login_manager = LoginManager()
     login_manager.login_view = "auth.login"
     login_manager.init_app(app)
 
+    identity_cache = IdentityCache(
+        fetch_identity,
+        version=fetch_identity_version,
+        max_size=app.config["USER_CACHE_SIZE"],
+        ttl=app.config["USER_CACHE_TTL"],
+    )
+    app.extensions["identity_cache"] = identity_cache
+    app.extensions["occupancy_index"] = OccupancyIndex()
+    init_feed(app)
+
     @login_manager.user_loader
     def load_user(user_id):
-        row = fetch_user_by_id(user_id)
-        if row:
-            return User(row["id"], row["username"], row["role"])
-        return None
+        return identity_cache.get(user_id)
+
+    @app.errorhandler(HasherBusy)
+    def hasher_busy(e):
+        return "Server is busy, please retry shortly.", 503, {"Retry-After": "1"}
+
+    @app.errorhandler(PoolTimeout)
+    def pool_timeout(e):
+        return "Server is busy, please retry shortly.", 503, {"Retry-After": "1"}
 
     @app.route("/")
     def home():
@@ -34,19 +136,32 @@ def create_app():
         return redirect(url_for("auth.login"))
 
     # Register blueprints
-    from auth_routes import auth_bp
-    from admin_routes import admin_bp
-    from doctor_routes import doctor_bp
-    from patient_routes import patient_bp
-    from api_routes import api_bp
-
-    app.register_blueprint(auth_bp)
-    app.register_blueprint(admin_bp, url_prefix="/admin")
-    app.register_blueprint(doctor_bp, url_prefix="/doctor")
-    app.register_blueprint(patient_bp, url_prefix="/patient")
-    app.register_blueprint(api_bp, url_prefix="/api")
-
-    app.teardown_appcontext(close_db)
+    with timed(timings, "blueprints"):
+        from auth_routes import auth_bp
+        from admin_routes import admin_bp
+        from doctor_routes import doctor_bp
+        from patient_routes import patient_bp
+        from api_routes import api_bp
+
+        app.register_blueprint(auth_bp)
+        app.register_blueprint(admin_bp, url_prefix="/admin")
+        app.register_blueprint(doctor_bp, url_prefix="/doctor")
+        app.register_blueprint(patient_bp, url_prefix="/patient")
+        app.register_blueprint(api_bp, url_prefix="/api")
+
+    from cli import hms_cli
+
+    app.cli.add_command(hms_cli)
+
+    # Last, so the scheduler thread never sees a half-built app.
+    init_reminders(app)
+
+    timings["total"] = time.perf_counter() - started
+    app.extensions["startup_timings"] = timings
+    app.logger.info(
+        "startup %s",
+        " ".join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in timings.items()),
+    )
 
     return app
 
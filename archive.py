@@ -0,0 +1,213 @@
+import json
+import sqlite3
+
+from rollups import rollup_statements
+
+APPOINTMENT_COLUMNS = "id, patient_id, doctor_id, date, time, status, start_at"
+TREATMENT_COLUMNS = "id, appointment_id, diagnosis, prescription, notes"
+ARCHIVED_STATUSES = ("Completed", "Cancelled")
+
+_BATCH = "(SELECT value FROM json_each(?))"
+
+
+def has_archive(conn):
+    try:
+        row = conn.execute(
+            "SELECT 1 FROM archive.sqlite_master WHERE name = 'appointments'"
+        ).fetchone()
+    except sqlite3.OperationalError:
+        return False  # not attached
+    return row is not None
+
+
+def init_archive(conn):
+    # The archive mirrors the live columns without foreign keys (SQLite
+    # cannot enforce them across databases) and keeps the indexes the
+    # history pages page through.
+    try:
+        row = conn.execute(
+            "SELECT 1 FROM archive.sqlite_master WHERE name = 'treatments'"
+        ).fetchone()
+    except sqlite3.OperationalError:
+        return False
+    if row:
+        # Added after the first archives were created.
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS archive.idx_archive_appointments_start"
+            " ON appointments (start_at, id)"
+        )
+        return True
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS archive.appointments (
+            id INTEGER PRIMARY KEY,
+            patient_id INTEGER NOT NULL,
+            doctor_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            time TEXT NOT NULL,
+            status TEXT NOT NULL,
+            start_at TEXT
+        );
+        CREATE INDEX IF NOT EXISTS archive.idx_archive_appointments_patient_start
+        ON appointments (patient_id, start_at);
+        CREATE INDEX IF NOT EXISTS archive.idx_archive_appointments_doctor_start
+        ON appointments (doctor_id, start_at);
+        CREATE INDEX IF NOT EXISTS archive.idx_archive_appointments_start
+        ON appointments (start_at, id);
+        CREATE TABLE IF NOT EXISTS archive.treatments (
+            id INTEGER PRIMARY KEY,
+            appointment_id INTEGER UNIQUE NOT NULL,
+            diagnosis TEXT,
+            prescription TEXT,
+            notes TEXT
+        );
+        """
+    )
+    return True
+
+
+def all_appointments(conn):
+    # Live plus archived appointments as one table expression, for rebuilding
+    # the derived totals.
+    if not has_archive(conn):
+        return "appointments"
+    return f"""(
+        SELECT {APPOINTMENT_COLUMNS} FROM main.appointments
+        UNION ALL
+        SELECT {APPOINTMENT_COLUMNS} FROM archive.appointments x
+        WHERE NOT EXISTS (SELECT 1 FROM main.appointments m WHERE m.id = x.id)
+    )"""
+
+
+def with_archive(conn, select_sql, key="id"):
+    """Expand a history query over live and, if attached, archived rows.
+
+    ``select_sql`` names its tables ``{appointments}`` and ``{treatments}``,
+    aliases appointments as ``a`` and selects the appointment id as ``key``;
+    the result is usable as fetch_page's select_sql. Filters on the outer
+    query are pushed into both arms, so each side pages through its own
+    (patient_id, start_at) index.
+    """
+    live = select_sql.format(appointments="appointments", treatments="treatments")
+    if not has_archive(conn):
+        return live
+    archived = select_sql.format(
+        appointments="archive.appointments", treatments="archive.treatments"
+    )
+    # A batch is copied before it is deleted from the live tables, so skip
+    # archived rows that are still live rather than showing them twice. The
+    # archived arm is wrapped so the filter holds whatever clauses
+    # select_sql ends with.
+    return f"""
+        SELECT * FROM (
+            {live}
+            UNION ALL
+            SELECT * FROM ({archived}) x
+            WHERE NOT EXISTS (SELECT 1 FROM main.appointments m WHERE m.id = x.{key})
+        ) a
+    """
+
+
+def archive_appointments(conn, cutoff, batch_size=1000):
+    """Move Completed/Cancelled appointments that start before ``cutoff``.
+
+    Each batch is copied into the archive in one transaction and removed
+    from the live tables in a second one. WAL commits are not atomic across
+    attached databases, so this order can only ever leave a row in both
+    places (hidden by with_archive and finished by the next run), never in
+    neither. Returns the number of appointments moved.
+    """
+    if not has_archive(conn):
+        raise RuntimeError("No archive database is attached.")
+    if conn.in_transaction:
+        conn.commit()
+
+    moved = 0
+    while True:
+        ids = [
+            row[0]
+            for row in conn.execute(
+                """
+                SELECT id FROM main.appointments
+                WHERE status IN (?, ?) AND start_at < ?
+                ORDER BY start_at, id
+                LIMIT ?
+                """,
+                (*ARCHIVED_STATUSES, cutoff, batch_size),
+            )
+        ]
+        if not ids:
+            if moved:
+                # Without stats the planner ignores the archive's start_at
+                # index and sorts the whole archive for date-ordered reads.
+                conn.execute("ANALYZE archive")
+                conn.commit()
+            return moved
+        batch = json.dumps(ids)
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                f"""
+                INSERT OR REPLACE INTO archive.appointments ({APPOINTMENT_COLUMNS})
+                SELECT {APPOINTMENT_COLUMNS} FROM main.appointments
+                WHERE id IN {_BATCH}
+                """,
+                (batch,),
+            )
+            conn.execute(
+                f"""
+                INSERT OR REPLACE INTO archive.treatments ({TREATMENT_COLUMNS})
+                SELECT {TREATMENT_COLUMNS} FROM main.treatments
+                WHERE appointment_id IN {_BATCH}
+                """,
+                (batch,),
+            )
+            conn.commit()
+
+            conn.execute("BEGIN IMMEDIATE")
+            # Dashboard counters and daily rollups cover archived rows too:
+            # add back what the delete triggers are about to subtract.
+            conn.execute(
+                f"""
+                INSERT INTO counters (scope, key, value)
+                SELECT * FROM (
+                    SELECT 'total', 'appointments', COUNT(*)
+                    FROM main.appointments WHERE id IN {_BATCH}
+                    UNION ALL
+                    SELECT 'status', status, COUNT(*)
+                    FROM main.appointments WHERE id IN {_BATCH}
+                    GROUP BY status
+                    UNION ALL
+                    SELECT 'department',
+                           COALESCE(CAST(d.department_id AS TEXT), 'none'), COUNT(*)
+                    FROM main.appointments a
+                    LEFT JOIN doctors d ON a.doctor_id = d.id
+                    WHERE a.id IN {_BATCH}
+                    GROUP BY d.department_id
+                    UNION ALL
+                    SELECT 'archived_doctor', CAST(doctor_id AS TEXT), COUNT(*)
+                    FROM main.appointments WHERE id IN {_BATCH}
+                    GROUP BY doctor_id
+                ) WHERE true
+                ON CONFLICT (scope, key) DO UPDATE SET value = value + excluded.value
+                """,
+                (batch, batch, batch, batch),
+            )
+            for statement in rollup_statements(
+                f"(SELECT date, doctor_id, status FROM main.appointments"
+                f" WHERE id IN {_BATCH})"
+            ):
+                conn.execute(statement, (batch,))
+            conn.execute(
+                f"DELETE FROM main.treatments WHERE appointment_id IN {_BATCH}",
+                (batch,),
+            )
+            conn.execute(
+                f"DELETE FROM main.appointments WHERE id IN {_BATCH}", (batch,)
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        moved += len(ids)
@@ -1,14 +1,14 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_user, logout_user, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
-
-from database import get_db
+from database import get_db, read_mostly
 from models import User, fetch_user_by_username
+from passwords import get_hasher
 
 auth_bp = Blueprint("auth", __name__)
 
 
 @auth_bp.route("/login", methods=["GET", "POST"])
+@read_mostly
 def login():
     if current_user.is_authenticated:
         return redirect(url_for(f"{current_user.role}.dashboard"))
@@ -22,7 +22,16 @@ def login():
             "SELECT * FROM users WHERE username = ?", (username,)
         ).fetchone()
 
-        if user_row and check_password_hash(user_row["password_hash"], password):
+        hasher = get_hasher()
+        if user_row and hasher.verify(user_row["password_hash"], password):
+            if hasher.needs_rehash(user_row["password_hash"]):
+                password_hash = hasher.hash(password)
+                writer = get_db(write=True)
+                writer.execute(
+                    "UPDATE users SET password_hash = ? WHERE id = ?",
+                    (password_hash, user_row["id"]),
+                )
+                writer.commit()
             user = User(user_row["id"], user_row["username"], user_row["role"])
             login_user(user)
             flash("Login successful.", "success")
@@ -34,6 +43,7 @@ def login():
 
 
 @auth_bp.route("/register", methods=["GET", "POST"])
+@read_mostly
 def register():
     if request.method == "POST":
         username = request.form.get("username").strip()
@@ -48,8 +58,9 @@ def register():
             flash("Username already exists.", "danger")
             return redirect(url_for("auth.register"))
 
-        conn = get_db()
-        password_hash = generate_password_hash(password)
+        # Hash before taking the writer lane so other writes aren't held up.
+        password_hash = get_hasher().hash(password)
+        conn = get_db(write=True)
         cursor = conn.cursor()
         cursor.execute(
             "INSERT INTO users (username, email, password_hash, role) VALUES (?, ?, ?, 'patient')",
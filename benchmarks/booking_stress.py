@@ -0,0 +1,118 @@
+"""Concurrent booking stress run.
+
+Fires many simultaneous bookings at one doctor slot and checks that exactly
+one wins, then measures throughput for bookings spread over distinct slots.
+
+    python benchmarks/booking_stress.py --threads 32 --attempts 4000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from booking import BOOKED, book_appointment  # noqa: E402
+from db_pool import ConnectionPool  # noqa: E402
+from migrations import migrate  # noqa: E402
+
+
+def build_database(path, patients):
+    pool = ConnectionPool(path, max_size=1)
+    conn = pool.acquire()
+    migrate(conn)
+    conn.execute(
+        "INSERT INTO users (username, email, password_hash, role) "
+        "VALUES ('doc', 'doc@example.com', '-', 'doctor')"
+    )
+    conn.execute(
+        "INSERT INTO doctors (user_id, full_name, specialization) "
+        "VALUES (1, 'Stress Doctor', 'General')"
+    )
+    conn.executemany(
+        "INSERT INTO users (username, email, password_hash, role) "
+        "VALUES (?, ?, '-', 'patient')",
+        [(f"p{i}", f"p{i}@example.com") for i in range(patients)],
+    )
+    conn.execute(
+        "INSERT INTO patients (user_id, full_name) "
+        "SELECT id, username FROM users WHERE role = 'patient'"
+    )
+    conn.commit()
+    pool.release(conn)
+    pool.close_all()
+
+
+def run(pool, threads, attempts, slot_for):
+    results = Counter()
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+    per_thread = attempts // threads
+
+    def worker(index):
+        conn = pool.acquire()
+        local = Counter()
+        barrier.wait()
+        try:
+            for n in range(per_thread):
+                attempt = index * per_thread + n
+                date, time_ = slot_for(attempt)
+                result = book_appointment(
+                    conn, attempt + 1, 1, date, time_, retries=50, backoff=0.001
+                )
+                local[result.status] += 1
+        finally:
+            pool.release(conn)
+        with lock:
+            results.update(local)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--attempts", type=int, default=4000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "stress.db")
+        build_database(path, args.attempts)
+        pool = ConnectionPool(path, max_size=args.threads)
+
+        results, elapsed = run(
+            pool, args.threads, args.attempts, lambda n: ("2030-01-01", "09:00")
+        )
+        total = sum(results.values())
+        print(
+            f"same slot: {dict(results)} in {elapsed:.2f}s ({total / elapsed:.0f}/s)"
+        )
+        assert results[BOOKED] == 1, "exactly one booking must win the slot"
+
+        results, elapsed = run(
+            pool,
+            args.threads,
+            args.attempts,
+            lambda n: (
+                f"2031-{1 + n // 1440 % 12:02d}-01",
+                f"{n // 60 % 24:02d}:{n % 60:02d}",
+            ),
+        )
+        total = sum(results.values())
+        print(
+            f"distinct slots: {dict(results)} in {elapsed:.2f}s ({total / elapsed:.0f}/s)"
+        )
+        pool.close_all()
+
+
+if __name__ == "__main__":
+    main()
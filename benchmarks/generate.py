@@ -0,0 +1,279 @@
+"""Deterministic synthetic hospital for benchmarks.
+
+The same --scale, --seed and --today always produce the same rows, so
+results from different commits are comparable. Every date is laid out
+around --today (a fixed day unless given); pass the real date when the
+app's "upcoming" views should have rows. Every user's password is ``bench``.
+
+    python benchmarks/generate.py --scale 10k --out /tmp/hms-10k.db
+    python benchmarks/generate.py --scale 1m --out /tmp/hms-1m.db --seed 7
+
+The 10m preset takes a long while to build (all schema triggers fire), so
+generate it once and point the harness at the file.
+"""
+import argparse
+import math
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from migrations import migrate  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+SCALES = {
+    "10k": {
+        "departments": 8,
+        "doctors": 40,
+        "patients": 2_000,
+        "years": 1,
+        "appointments": 10_000,
+    },
+    "1m": {
+        "departments": 20,
+        "doctors": 600,
+        "patients": 100_000,
+        "years": 3,
+        "appointments": 1_000_000,
+    },
+    "10m": {
+        "departments": 40,
+        "doctors": 3_000,
+        "patients": 1_000_000,
+        "years": 5,
+        "appointments": 10_000_000,
+    },
+}
+
+PASSWORD = "bench"
+TODAY = date(2026, 1, 5)
+SLOT_TIMES = [f"{hour:02d}:{minute:02d}" for hour in range(9, 17) for minute in (0, 30)]
+FUTURE_DAYS = 14
+SPECIALIZATIONS = [
+    "Cardiology",
+    "Neurology",
+    "Pediatrics",
+    "Orthopedics",
+    "Dermatology",
+    "Oncology",
+    "Radiology",
+    "General Medicine",
+]
+FIRST_NAMES = ["Asha", "Ben", "Chen", "Dina", "Eli", "Farah", "Gus", "Hana", "Ivan", "Jo"]
+LAST_NAMES = ["Rao", "Smith", "Li", "Khan", "Garcia", "Novak", "Okafor", "Sato", "Meyer"]
+DIAGNOSES = ["Hypertension", "Migraine", "Fracture", "Flu", "Dermatitis", "Checkup"]
+BLOOD_GROUPS = ["A+", "A-", "B+", "B-", "O+", "O-", "AB+", "AB-"]
+
+
+def _name(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def _chunks(rows, size=5000):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _insert_users(conn, role, count, pwhash):
+    first = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM users").fetchone()[0]
+    for chunk in _chunks(
+        (f"{role}{n}", f"{role}{n}@bench.local", pwhash, role) for n in range(count)
+    ):
+        conn.executemany(
+            "INSERT INTO users (username, email, password_hash, role) "
+            "VALUES (?, ?, ?, ?)",
+            chunk,
+        )
+    return first
+
+
+def _appointment_days(today, years):
+    first = today - timedelta(days=365 * years)
+    return [first + timedelta(days=n) for n in range((today - first).days + FUTURE_DAYS)]
+
+
+def _status(rng, day, today):
+    roll = rng.random()
+    if day < today:
+        return "Completed" if roll < 0.8 else "Cancelled" if roll < 0.95 else "Booked"
+    return "Booked" if roll < 0.9 else "PendingApproval" if roll < 0.95 else "Cancelled"
+
+
+def generate(
+    path, departments, doctors, patients, years, appointments, seed=42, today=TODAY
+):
+    rng = random.Random(seed)
+    days = _appointment_days(today, years)
+    capacity = len(days) * len(SLOT_TIMES)
+    doctors = max(doctors, math.ceil(appointments / (capacity * 0.6)))
+
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA foreign_keys=ON")
+    migrate(conn)
+
+    pwhash = generate_password_hash(PASSWORD)
+    conn.execute(
+        "INSERT INTO users (id, username, email, password_hash, role) "
+        "VALUES (1, 'admin', 'admin@hms.local', ?, 'admin')",
+        (pwhash,),
+    )
+    conn.executemany(
+        "INSERT INTO departments (name, description) VALUES (?, ?)",
+        [
+            (
+                SPECIALIZATIONS[n % len(SPECIALIZATIONS)]
+                + ("" if n < len(SPECIALIZATIONS) else f" {n // len(SPECIALIZATIONS)}"),
+                "Synthetic department",
+            )
+            for n in range(departments)
+        ],
+    )
+
+    first_user = _insert_users(conn, "doctor", doctors, pwhash)
+    conn.executemany(
+        "INSERT INTO doctors (user_id, full_name, specialization, department_id) "
+        "VALUES (?, ?, ?, ?)",
+        [
+            (
+                first_user + n,
+                f"Dr {_name(rng)}",
+                SPECIALIZATIONS[n % departments % len(SPECIALIZATIONS)],
+                n % departments + 1,
+            )
+            for n in range(doctors)
+        ],
+    )
+
+    first_user = _insert_users(conn, "patient", patients, pwhash)
+    for chunk in _chunks(
+        (
+            first_user + n,
+            _name(rng),
+            rng.randint(1, 95),
+            rng.choice(("Male", "Female")),
+            f"555-{n:07d}",
+            rng.choice(BLOOD_GROUPS),
+        )
+        for n in range(patients)
+    ):
+        conn.executemany(
+            "INSERT INTO patients (user_id, full_name, age, gender, contact, blood_group) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            chunk,
+        )
+    conn.commit()
+
+    # Every doctor publishes every slot for the coming fortnight.
+    upcoming = [today + timedelta(days=n) for n in range(FUTURE_DAYS)]
+    for chunk in _chunks(
+        (doctor_id, f"{day.isoformat()} {slot}")
+        for doctor_id in range(1, doctors + 1)
+        for day in upcoming
+        for slot in SLOT_TIMES
+    ):
+        conn.executemany(
+            "INSERT INTO doctor_slots (doctor_id, start_at) VALUES (?, ?)", chunk
+        )
+    conn.commit()
+
+    # Spread appointments evenly over the days, sampling distinct
+    # (doctor, slot) cells per day so UNIQUE(doctor_id, date, time) holds.
+    per_day, extra = divmod(appointments, len(days))
+    cells = doctors * len(SLOT_TIMES)
+    next_id = 1
+    treatments = []
+    for index, day in enumerate(days):
+        rows = []
+        wanted = min(cells, per_day + (1 if index < extra else 0))
+        for cell in rng.sample(range(cells), wanted):
+            doctor_id, slot = divmod(cell, len(SLOT_TIMES))
+            status = _status(rng, day, today)
+            rows.append(
+                (
+                    next_id,
+                    rng.randint(1, patients),
+                    doctor_id + 1,
+                    day.isoformat(),
+                    SLOT_TIMES[slot],
+                    status,
+                )
+            )
+            if status == "Completed":
+                treatments.append(
+                    (next_id, rng.choice(DIAGNOSES), "Rest and fluids", "Synthetic")
+                )
+            next_id += 1
+        conn.executemany(
+            "INSERT INTO appointments (id, patient_id, doctor_id, date, time, status) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        if len(treatments) >= 5000 or index == len(days) - 1:
+            conn.executemany(
+                "INSERT INTO treatments (appointment_id, diagnosis, prescription, notes) "
+                "VALUES (?, ?, ?, ?)",
+                treatments,
+            )
+            treatments = []
+            conn.commit()
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.close()
+    return {
+        "departments": departments,
+        "doctors": doctors,
+        "patients": patients,
+        "appointments": next_id - 1,
+        "days": len(days),
+        "seed": seed,
+        "today": today.isoformat(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(SCALES), default="10k")
+    parser.add_argument("--out", required=True, help="SQLite file to (re)create.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--today",
+        type=date.fromisoformat,
+        default=TODAY,
+        help=f"Day the history ends and the upcoming weeks start (default {TODAY}).",
+    )
+    for name in SCALES["10k"]:
+        parser.add_argument(f"--{name}", type=int, help=f"Override the preset's {name}.")
+    args = parser.parse_args()
+
+    params = dict(SCALES[args.scale])
+    for name in params:
+        if getattr(args, name) is not None:
+            params[name] = getattr(args, name)
+
+    started = time.perf_counter()
+    summary = generate(args.out, seed=args.seed, today=args.today, **params)
+    elapsed = time.perf_counter() - started
+    print(
+        ", ".join(f"{key}={value}" for key, value in summary.items())
+        + f" in {elapsed:.1f}s -> {args.out}"
+    )
+
+
+if __name__ == "__main__":
+    main()
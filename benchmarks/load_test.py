@@ -0,0 +1,463 @@
+"""Drive the real app through patient/doctor/admin role mixes.
+
+Reports throughput and p50/p95/p99 latency per route and can save the run
+as JSON to compare against another commit:
+
+    python benchmarks/generate.py --scale 10k --out /tmp/hms-10k.db
+    python benchmarks/load_test.py --db /tmp/hms-10k.db --threads 8 --duration 30 \\
+        --save benchmarks/results/base.json
+    python benchmarks/load_test.py --db /tmp/hms-10k.db --mode http --threads 16 \\
+        --compare benchmarks/results/base.json
+
+--mode client uses Flask's test client in-process; --mode http serves the
+app from a threaded Werkzeug server (or hits --url) over real sockets.
+Writes happen against the --db file, so regenerate it between runs that
+need identical starting data.
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from datetime import date
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from generate import PASSWORD, SPECIALIZATIONS  # noqa: E402
+
+
+class ClientSession:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None):
+        return self.client.open(path, method=method, data=data).status_code
+
+
+class HttpSession:
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.cookies = SimpleCookie()
+
+    def request(self, method, path, data=None):
+        headers = {}
+        if self.cookies:
+            headers["Cookie"] = "; ".join(
+                f"{name}={morsel.value}" for name, morsel in self.cookies.items()
+            )
+        body = None
+        if data is not None:
+            body = urlencode(data)
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        try:
+            conn.request(method, path, body, headers)
+            response = conn.getresponse()
+            response.read()
+            for header in response.headers.get_all("Set-Cookie") or []:
+                self.cookies.load(header)
+            return response.status
+        finally:
+            conn.close()
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+        self.errors = {}
+
+    def add(self, label, seconds, ok):
+        with self._lock:
+            self.samples.setdefault(label, []).append(seconds)
+            if not ok:
+                self.errors[label] = self.errors.get(label, 0) + 1
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class VirtualUser:
+    def __init__(self, role, account, session, db, recorder, rng):
+        self.role = role
+        self.account = account
+        self.session = session
+        self.db = db
+        self.recorder = recorder
+        self.rng = rng
+        self.today = date.today().isoformat()
+
+    def call(self, label, method, path, data=None):
+        started = time.perf_counter()
+        try:
+            status = self.session.request(method, path, data)
+            ok = status < 400
+        except Exception:
+            ok = False
+        self.recorder.add(label, time.perf_counter() - started, ok)
+
+    def one(self, sql, params=()):
+        return self.db.execute(sql, params).fetchone()
+
+    def login(self):
+        self.call(
+            "auth.login",
+            "POST",
+            "/login",
+            {"username": self.account["username"], "password": PASSWORD},
+        )
+
+    # Patient actions
+    def patient_dashboard(self):
+        self.call("patient.dashboard", "GET", "/patient/dashboard")
+
+    def patient_search(self):
+        term = self.rng.choice(SPECIALIZATIONS).split()[0]
+        self.call(
+            "patient.search_doctor", "GET", f"/patient/search_doctor?specialization={term}"
+        )
+
+    def patient_book(self):
+        if not hasattr(self, "max_slot_id"):
+            self.max_slot_id = self.one("SELECT MAX(id) FROM doctor_slots")[0] or 0
+        slot = self.one(
+            "SELECT doctor_id, start_at FROM doctor_slots WHERE id >= ? LIMIT 1",
+            (self.rng.randint(1, max(self.max_slot_id, 1)),),
+        )
+        if slot is None:
+            return
+        day, time_ = slot["start_at"].split(" ")
+        path = f"/patient/book/{slot['doctor_id']}"
+        self.call("patient.book_form", "GET", path)
+        self.call("patient.book", "POST", path, {"date": day, "time": time_})
+
+    def patient_cancel(self):
+        row = self.one(
+            "SELECT id FROM appointments WHERE patient_id = ? AND status = 'Booked' "
+            "AND start_at >= ? LIMIT 1",
+            (self.account["id"], self.today),
+        )
+        if row is not None:
+            self.call("patient.cancel", "POST", f"/patient/cancel/{row['id']}")
+
+    def patient_history(self):
+        self.call("patient.history", "GET", "/patient/history")
+
+    # Doctor actions
+    def doctor_dashboard(self):
+        self.call("doctor.dashboard", "GET", "/doctor/dashboard")
+
+    def doctor_appointments(self):
+        self.call("doctor.appointments", "GET", "/doctor/appointments")
+
+    def doctor_approve(self):
+        row = self.one(
+            "SELECT id FROM appointments WHERE doctor_id = ? "
+            "AND status = 'PendingApproval' LIMIT 1",
+            (self.account["id"],),
+        )
+        if row is not None:
+            self.call(
+                "doctor.approve_pending", "POST", f"/doctor/pending/{row['id']}/approve"
+            )
+
+    def doctor_treatment(self):
+        row = self.one(
+            "SELECT id FROM appointments WHERE doctor_id = ? AND start_at < ? "
+            "AND status IN ('Booked', 'Completed') ORDER BY start_at DESC LIMIT 1",
+            (self.account["id"], self.today),
+        )
+        if row is not None:
+            self.call(
+                "doctor.update_treatment",
+                "POST",
+                f"/doctor/update_treatment/{row['id']}",
+                {"diagnosis": "Checkup", "prescription": "Rest", "notes": "bench"},
+            )
+
+    def doctor_patient_history(self):
+        row = self.one(
+            "SELECT patient_id FROM appointments WHERE doctor_id = ? LIMIT 1",
+            (self.account["id"],),
+        )
+        if row is not None:
+            self.call(
+                "doctor.patient_history",
+                "GET",
+                f"/doctor/patient_history/{row['patient_id']}",
+            )
+
+    # Admin actions
+    def admin_dashboard(self):
+        self.call("admin.dashboard", "GET", "/admin/dashboard")
+
+    def admin_search(self):
+        scope = self.rng.choice(("doctor", "patient"))
+        term = self.rng.choice(("Asha", "Khan", "Li", "Sato", "Cardio", "Neuro"))
+        self.call("admin.search", "GET", f"/admin/search?q={term}&scope={scope}")
+
+    def admin_appointments(self):
+        status = self.rng.choice(("", "Booked", "Completed", "Cancelled"))
+        self.call("admin.appointments", "GET", f"/admin/appointments?status={status}")
+
+    def admin_stats(self):
+        self.call("api.stats", "GET", "/api/stats")
+
+
+MIXES = {
+    "patient": [
+        (30, VirtualUser.patient_dashboard),
+        (25, VirtualUser.patient_search),
+        (20, VirtualUser.patient_book),
+        (10, VirtualUser.patient_cancel),
+        (15, VirtualUser.patient_history),
+    ],
+    "doctor": [
+        (35, VirtualUser.doctor_dashboard),
+        (25, VirtualUser.doctor_appointments),
+        (10, VirtualUser.doctor_approve),
+        (15, VirtualUser.doctor_treatment),
+        (15, VirtualUser.doctor_patient_history),
+    ],
+    "admin": [
+        (35, VirtualUser.admin_dashboard),
+        (25, VirtualUser.admin_search),
+        (30, VirtualUser.admin_appointments),
+        (10, VirtualUser.admin_stats),
+    ],
+}
+
+
+def pick_accounts(db, role, count, rng):
+    if role == "admin":
+        row = db.execute("SELECT id, username FROM users WHERE role = 'admin'").fetchone()
+        return [{"id": row["id"], "username": row["username"]}] * count
+    table = "doctors" if role == "doctor" else "patients"
+    total = db.execute(f"SELECT MAX(id) FROM {table}").fetchone()[0]
+    accounts = []
+    for profile_id in rng.sample(range(1, total + 1), min(count, total)):
+        row = db.execute(
+            f"SELECT t.id, u.username FROM {table} t JOIN users u ON u.id = t.user_id "
+            "WHERE t.id = ?",
+            (profile_id,),
+        ).fetchone()
+        accounts.append({"id": row["id"], "username": row["username"]})
+    return accounts
+
+
+def parse_mix(text):
+    weights = {}
+    for part in text.split(","):
+        role, _, weight = part.partition("=")
+        if role not in MIXES:
+            raise SystemExit(f"unknown role {role!r} in --mix")
+        weights[role] = float(weight)
+    return weights
+
+
+def run(args, make_session):
+    rng = random.Random(args.seed)
+    weights = parse_mix(args.mix)
+    roles = rng.choices(list(weights), weights=list(weights.values()), k=args.threads)
+
+    db = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+    db.row_factory = sqlite3.Row
+    accounts = {
+        role: pick_accounts(db, role, roles.count(role), rng) for role in set(roles)
+    }
+    db.close()
+
+    recorder = Recorder()
+    barrier = threading.Barrier(args.threads + 1)
+    go = threading.Event()
+    deadline = [None]
+
+    def worker(index, role, account):
+        db = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+        db.row_factory = sqlite3.Row
+        user = VirtualUser(
+            role, account, make_session(), db, recorder, random.Random(args.seed + index)
+        )
+        actions = [action for _, action in MIXES[role]]
+        action_weights = [weight for weight, _ in MIXES[role]]
+        user.login()
+        barrier.wait()
+        go.wait()
+        done = 0
+        while time.perf_counter() < deadline[0] and done < args.iterations:
+            user.rng.choices(actions, weights=action_weights)[0](user)
+            done += 1
+        db.close()
+
+    threads = []
+    for index, role in enumerate(roles):
+        account = accounts[role].pop()
+        accounts[role].insert(0, account)
+        threads.append(threading.Thread(target=worker, args=(index, role, account)))
+    for thread in threads:
+        thread.start()
+    # Logins are measured but the clock for throughput starts once every
+    # virtual user is signed in.
+    barrier.wait()
+    started = time.perf_counter()
+    deadline[0] = started + args.duration
+    go.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return recorder, elapsed, roles
+
+
+def summarise(recorder, elapsed):
+    routes = {}
+    for label, samples in sorted(recorder.samples.items()):
+        samples.sort()
+        counted = len(samples) if label != "auth.login" else 0
+        routes[label] = {
+            "count": len(samples),
+            "errors": recorder.errors.get(label, 0),
+            "rps": round(counted / elapsed, 2) if elapsed else 0.0,
+            "mean_ms": round(sum(samples) / len(samples) * 1000, 3),
+            "p50_ms": round(percentile(samples, 50) * 1000, 3),
+            "p95_ms": round(percentile(samples, 95) * 1000, 3),
+            "p99_ms": round(percentile(samples, 99) * 1000, 3),
+            "max_ms": round(samples[-1] * 1000, 3),
+        }
+    return routes
+
+
+def print_table(routes, total_rps):
+    print(
+        f"{'route':28s} {'count':>7s} {'err':>5s} {'rps':>8s} "
+        f"{'p50':>8s} {'p95':>8s} {'p99':>8s} {'max':>8s}  (ms)"
+    )
+    for label, row in routes.items():
+        print(
+            f"{label:28s} {row['count']:7d} {row['errors']:5d} {row['rps']:8.1f} "
+            f"{row['p50_ms']:8.1f} {row['p95_ms']:8.1f} {row['p99_ms']:8.1f} "
+            f"{row['max_ms']:8.1f}"
+        )
+    print(f"total throughput {total_rps:.1f} req/s")
+
+
+def print_comparison(routes, baseline_path):
+    with open(baseline_path) as fh:
+        baseline = json.load(fh)
+    print(f"\nvs {baseline_path} ({baseline['meta'].get('commit', '?')})")
+    print(f"{'route':28s} {'p50':>16s} {'p95':>16s} {'p99':>16s}")
+    for label, row in routes.items():
+        old = baseline["routes"].get(label)
+        if old is None:
+            continue
+        cells = []
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            change = (row[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+            cells.append(f"{row[key]:7.1f} ({change:+5.0f}%)")
+        print(f"{label:28s} " + " ".join(f"{cell:>16s}" for cell in cells))
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", required=True, help="Database from generate.py.")
+    parser.add_argument("--mode", choices=("client", "http"), default="client")
+    parser.add_argument("--url", help="Target an already running server (http mode).")
+    parser.add_argument("--threads", type=int, default=8, help="Virtual users.")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds.")
+    parser.add_argument(
+        "--iterations", type=int, default=10**9, help="Cap on actions per user."
+    )
+    parser.add_argument("--mix", default="patient=70,doctor=25,admin=5")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", help="Write results as JSON here.")
+    parser.add_argument("--compare", help="Earlier --save output to diff against.")
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        args.mode = "http"
+    else:
+        from app import create_app
+
+        app = create_app({"DATABASE": os.path.abspath(args.db)})
+    if args.mode == "client":
+
+        def make_session():
+            return ClientSession(app)
+
+    else:
+        base_url = args.url
+        if base_url is None:
+            from werkzeug.serving import make_server
+
+            logging.getLogger("werkzeug").setLevel(logging.ERROR)
+            server = make_server("127.0.0.1", 0, app, threaded=True)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            base_url = f"http://127.0.0.1:{server.port}"
+
+        def make_session():
+            return HttpSession(base_url)
+
+    try:
+        recorder, elapsed, roles = run(args, make_session)
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    routes = summarise(recorder, elapsed)
+    total_rps = sum(row["rps"] for row in routes.values())
+    print_table(routes, total_rps)
+    if args.compare:
+        print_comparison(routes, args.compare)
+
+    if args.save:
+        db = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+        appointments = db.execute("SELECT COUNT(*) FROM appointments").fetchone()[0]
+        db.close()
+        result = {
+            "meta": {
+                "commit": git_commit(),
+                "at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "mode": args.mode,
+                "threads": args.threads,
+                "roles": {role: roles.count(role) for role in set(roles)},
+                "duration_s": round(elapsed, 2),
+                "appointments": appointments,
+                "python": platform.python_version(),
+                "sqlite": sqlite3.sqlite_version,
+                "cpus": os.cpu_count(),
+            },
+            "total_rps": round(total_rps, 2),
+            "routes": routes,
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as fh:
+            json.dump(result, fh, indent=2)
+        print(f"saved {args.save}")
+
+
+if __name__ == "__main__":
+    main()
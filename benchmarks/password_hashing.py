@@ -0,0 +1,76 @@
+"""Login throughput (password verifications per second) versus worker count.
+
+    python benchmarks/password_hashing.py --logins 200
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from passwords import HasherBusy, PasswordHasher  # noqa: E402
+
+
+def measure(hasher, pwhash, logins, threads):
+    remaining = [logins]
+    lock = threading.Lock()
+    rejected = [0]
+
+    def worker():
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            try:
+                hasher.verify(pwhash, "Admin@123")
+            except HasherBusy:
+                with lock:
+                    rejected[0] += 1
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return time.perf_counter() - started, rejected[0]
+
+
+def worker_counts(limit):
+    count = 1
+    while count < limit:
+        yield count
+        count *= 2
+    yield limit
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--method", default="scrypt")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    inline = PasswordHasher(method=args.method, workers=0)
+    pwhash = inline.hash("Admin@123")
+    elapsed, _ = measure(inline, pwhash, args.logins, threads=4)
+    print(f"inline (4 request threads): {args.logins / elapsed:8.1f} logins/s")
+
+    for workers in worker_counts(args.max_workers):
+        hasher = PasswordHasher(
+            method=args.method, workers=workers, max_pending=args.logins
+        )
+        hasher.verify(pwhash, "warm-up")
+        elapsed, rejected = measure(hasher, pwhash, args.logins, threads=workers * 2)
+        hasher.shutdown()
+        print(
+            f"{workers:3d} worker(s):               {args.logins / elapsed:8.1f} logins/s"
+            f"  (rejected {rejected})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Reminder scheduler on a 100k-appointment day.
+
+Books --appointments Booked appointments over the next 24 hours on top of a
+generated database, runs one scheduler pass into a counting sender, runs a
+second pass to show nothing is sent twice, and checks that the scan and
+claim queries stay on their indexes.
+
+    python benchmarks/reminder_day.py --db /tmp/hms-1m.db --appointments 100000
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from database import get_db  # noqa: E402
+from generate import SCALES, generate  # noqa: E402
+from query_plans import check_query_plans, hot_queries  # noqa: E402
+from reminders import run_once  # noqa: E402
+
+
+class CountingSender:
+    def __init__(self):
+        self.keys = set()
+        self.messages = 0
+        self.batches = 0
+
+    def send(self, messages):
+        self.batches += 1
+        self.messages += len(messages)
+        self.keys.update(message["key"] for message in messages)
+
+
+def book_day(conn, count):
+    # A doctor holds one appointment per minute, so small presets get extra
+    # doctors to fit the whole day.
+    conn.execute("BEGIN IMMEDIATE")
+    doctors = [row[0] for row in conn.execute("SELECT id FROM doctors ORDER BY id")]
+    for n in range(len(doctors), -(-count // 1430)):
+        user_id = conn.execute(
+            "INSERT INTO users (username, email, password_hash, role)"
+            " VALUES (?, ?, '-', 'doctor')",
+            (f"reminder-doc{n}", f"reminder-doc{n}@example.com"),
+        ).lastrowid
+        doctors.append(
+            conn.execute(
+                "INSERT INTO doctors (user_id, full_name, specialization)"
+                " VALUES (?, ?, 'General Medicine')",
+                (user_id, f"Dr Reminder {n}"),
+            ).lastrowid
+        )
+    per_doctor = -(-count // len(doctors))
+    patients = conn.execute("SELECT MIN(id), MAX(id) FROM patients").fetchone()
+    start = datetime.now(timezone.utc).replace(second=0, microsecond=0) + timedelta(
+        minutes=5
+    )
+    rows = []
+    for n in range(count):
+        at = start + timedelta(minutes=n // len(doctors) * 1430 // per_doctor)
+        rows.append(
+            (
+                patients[0] + n % (patients[1] - patients[0] + 1),
+                doctors[n % len(doctors)],
+                at.strftime("%Y-%m-%d"),
+                at.strftime("%H:%M"),
+            )
+        )
+    # Slots the generated data already holds are skipped.
+    booked = conn.executemany(
+        "INSERT OR IGNORE INTO appointments (patient_id, doctor_id, date, time, status)"
+        " VALUES (?, ?, ?, ?, 'Booked')",
+        rows,
+    ).rowcount
+    conn.commit()
+    return booked
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", help="Database from generate.py (copied, not modified).")
+    parser.add_argument("--appointments", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "reminders.db")
+        if args.db:
+            shutil.copyfile(args.db, path)
+        else:
+            generate(path, **SCALES["10k"])
+        sender = CountingSender()
+        app = create_app(
+            {
+                "DATABASE": path,
+                "ARCHIVE_DATABASE": "",
+                "REMINDER_SENDER": sender,
+                "REMINDER_BATCH_SIZE": args.batch_size,
+            }
+        )
+        with app.app_context():
+            conn = get_db()
+            started = time.perf_counter()
+            booked = book_day(conn, args.appointments)
+            print(f"booked {booked} in {time.perf_counter() - started:.1f}s")
+            total = conn.execute("SELECT COUNT(*) FROM appointments").fetchone()[0]
+            print(f"appointments in database: {total}")
+
+        started = time.perf_counter()
+        stats = run_once(app)
+        elapsed = time.perf_counter() - started
+        print(f"first pass: {stats} in {elapsed:.2f}s ({sender.batches} batches)")
+        assert stats["sent"] >= booked, "every booking gets a reminder"
+
+        started = time.perf_counter()
+        again = run_once(app)
+        print(f"second pass: {again} in {(time.perf_counter() - started) * 1000:.1f}ms")
+        assert again["queued"] == again["sent"] == 0, "nothing is queued or sent twice"
+        assert len(sender.keys) == sender.messages, "one message per key"
+
+        with app.app_context():
+            conn = get_db()
+            queries = {
+                name: query
+                for name, query in hot_queries(conn).items()
+                if name.startswith("reminders.")
+            }
+            results = check_query_plans(conn, queries)
+        for name, result in results.items():
+            print(f"{name}: {'FULL SCAN' if result['full_scans'] else 'ok'}")
+            for step in result["plan"]:
+                print(f"    {step}")
+        if any(result["full_scans"] for result in results.values()):
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
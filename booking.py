@@ -0,0 +1,144 @@
+import random
+import sqlite3
+import time
+
+from slots import check_slot, slot_start
+
+BOOKED = "booked"
+PENDING_APPROVAL = "pending_approval"
+CONFLICT = "conflict"
+
+
+class BookingResult:
+    def __init__(
+        self, status, appointment_id=None, reason="", can_request_approval=False
+    ):
+        self.status = status
+        self.appointment_id = appointment_id
+        self.reason = reason
+        self.can_request_approval = can_request_approval
+
+    def __repr__(self):
+        return f"BookingResult({self.status!r}, {self.appointment_id!r}, {self.reason!r})"
+
+
+def _is_busy(exc):
+    message = str(exc).lower()
+    return "locked" in message or "busy" in message
+
+
+def book_appointment(
+    conn,
+    patient_id,
+    doctor_id,
+    date,
+    time_,
+    appointment_id=None,
+    request_approval=False,
+    retries=5,
+    backoff=0.02,
+):
+    start_at = slot_start(date or "", time_ or "")
+    if not start_at:
+        return BookingResult(CONFLICT, reason="Invalid date or time.")
+    date, time_ = start_at.split(" ")
+
+    for attempt in range(retries + 1):
+        try:
+            return _reserve(
+                conn,
+                patient_id,
+                doctor_id,
+                date,
+                time_,
+                start_at,
+                appointment_id,
+                request_approval,
+            )
+        except sqlite3.OperationalError as exc:
+            if conn.in_transaction:
+                conn.rollback()
+            if not _is_busy(exc) or attempt == retries:
+                raise
+            time.sleep(backoff * (2**attempt) * (1 + random.random()))
+        except sqlite3.IntegrityError:
+            if conn.in_transaction:
+                conn.rollback()
+            return BookingResult(CONFLICT, reason="Selected slot is already booked.")
+
+
+def _reserve(
+    conn,
+    patient_id,
+    doctor_id,
+    date,
+    time_,
+    start_at,
+    appointment_id,
+    request_approval,
+):
+    if conn.in_transaction:
+        # Committing here would publish the caller's half-done work, and
+        # rolling back would silently drop it; neither is ours to decide.
+        raise RuntimeError("book_appointment() called inside an open transaction.")
+    # BEGIN IMMEDIATE takes the write lock up front, so the availability
+    # check and the reservation below cannot interleave with another booking.
+    conn.execute("BEGIN IMMEDIATE")
+
+    current = None
+    if appointment_id:
+        current = conn.execute(
+            "SELECT id, status FROM appointments WHERE id = ? AND patient_id = ?",
+            (appointment_id, patient_id),
+        ).fetchone()
+        if not current or current["status"] == "Completed":
+            conn.rollback()
+            return BookingResult(CONFLICT, reason="Appointment not found.")
+
+    # Cancelled rows no longer hold the slot (idx_appointments_slot covers
+    # live bookings only), so they stay with their patient's history.
+    existing = conn.execute(
+        """
+        SELECT id FROM appointments
+        WHERE doctor_id = ? AND date = ? AND time = ? AND status != 'Cancelled'
+        """,
+        (doctor_id, date, time_),
+    ).fetchone()
+    if existing and not (current and existing["id"] == current["id"]):
+        conn.rollback()
+        return BookingResult(CONFLICT, reason="Selected slot is already booked.")
+
+    has_slots, in_schedule = check_slot(conn, doctor_id, start_at)
+    if has_slots and not in_schedule and not request_approval:
+        conn.rollback()
+        return BookingResult(
+            CONFLICT,
+            reason="Selected time is outside the doctor's published availability.",
+            can_request_approval=True,
+        )
+    status = "PendingApproval" if has_slots and not in_schedule else "Booked"
+
+    if current:
+        conn.execute(
+            """
+            UPDATE appointments
+            SET doctor_id = ?, date = ?, time = ?, status = ?
+            WHERE id = ?
+            """,
+            (doctor_id, date, time_, status, current["id"]),
+        )
+        booked_id = current["id"]
+    else:
+        cursor = conn.execute(
+            """
+            INSERT INTO appointments (patient_id, doctor_id, date, time, status)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (patient_id, doctor_id, date, time_, status),
+        )
+        booked_id = cursor.lastrowid
+
+    conn.commit()
+    return BookingResult(
+        BOOKED if status == "Booked" else PENDING_APPROVAL, appointment_id=booked_id
+    )
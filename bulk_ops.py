@@ -0,0 +1,166 @@
+import json
+
+REVIEW_STATUSES = {"approve": "Booked", "reject": "Cancelled"}
+REASSIGN_MODES = ("reassign", "reassign_or_cancel", "cancel")
+
+# For each of a doctor's future open appointments, the best other active
+# doctor in the same department who is free at that time: publishes a slot
+# there (or publishes no schedule at all, the same rule booking uses) and has
+# no live booking at that time (idx_appointments_slot). Doctors with the
+# published slot win, then the one with the fewest bookings that day. The
+# moved appointments all start at distinct times, so ranking candidates per
+# appointment cannot hand two of them the same slot.
+_MOVES = """
+    WITH open_appointments AS (
+        SELECT a.id, a.date, a.time, a.start_at, src.department_id, src.id AS doctor_id
+        FROM appointments a
+        JOIN doctors src ON src.id = a.doctor_id
+        WHERE a.doctor_id = ?
+          AND a.start_at >= strftime('%Y-%m-%d %H:%M', 'now')
+          AND a.status IN ('Booked', 'PendingApproval')
+    ),
+    candidates AS (
+        SELECT o.id, d.id AS target,
+               EXISTS (
+                   SELECT 1 FROM doctor_slots s
+                   WHERE s.doctor_id = d.id AND s.start_at = o.start_at
+               ) AS has_slot,
+               EXISTS (
+                   SELECT 1 FROM doctor_slots s WHERE s.doctor_id = d.id
+               ) AS has_schedule,
+               (
+                   SELECT COUNT(*) FROM appointments y
+                   WHERE y.doctor_id = d.id
+                     AND y.start_at >= o.date AND y.start_at < date(o.date, '+1 day')
+                     AND y.status != 'Cancelled'
+               ) AS day_load
+        FROM open_appointments o
+        JOIN doctors d
+          ON d.department_id = o.department_id
+         AND d.id != o.doctor_id
+         AND d.is_blacklisted = 0
+        WHERE NOT EXISTS (
+            SELECT 1 FROM appointments x
+            WHERE x.doctor_id = d.id AND x.date = o.date AND x.time = o.time
+              AND x.status != 'Cancelled'
+        )
+    ),
+    ranked AS (
+        SELECT id, target,
+               ROW_NUMBER() OVER (
+                   PARTITION BY id ORDER BY has_slot DESC, day_load, target
+               ) AS rank
+        FROM candidates
+        WHERE has_slot OR NOT has_schedule
+    ),
+    moves AS MATERIALIZED (
+        SELECT o.id, r.target
+        FROM open_appointments o
+        LEFT JOIN ranked r ON r.id = o.id AND r.rank = 1
+    )
+"""
+
+_OPEN_FUTURE = """
+    doctor_id = ?
+    AND start_at >= strftime('%Y-%m-%d %H:%M', 'now')
+    AND status IN ('Booked', 'PendingApproval')
+"""
+
+
+class ReassignSummary:
+    def __init__(self):
+        self.reassigned = 0
+        self.cancelled = 0
+        self.unmatched = 0
+        self.by_doctor = {}
+
+    def __repr__(self):
+        return (
+            f"ReassignSummary(reassigned={self.reassigned}, "
+            f"cancelled={self.cancelled}, unmatched={self.unmatched})"
+        )
+
+
+def review_pending(conn, doctor_id, action, appointment_ids=None):
+    """Approve or reject many pending requests in one UPDATE.
+
+    ``appointment_ids=None`` covers every pending request of the doctor.
+    Returns the number of appointments changed.
+    """
+    status = REVIEW_STATUSES[action]
+    query = """
+        UPDATE appointments
+        SET status = ?
+        WHERE doctor_id = ? AND status = 'PendingApproval'
+    """
+    params = [status, doctor_id]
+    if appointment_ids is not None:
+        query += " AND id IN (SELECT value FROM json_each(?))"
+        params.append(json.dumps([int(i) for i in appointment_ids]))
+    cursor = conn.execute(query, params)
+    conn.commit()
+    return cursor.rowcount
+
+
+def preview_reassignment(conn, doctor_id):
+    return conn.execute(
+        _MOVES
+        + """
+        SELECT a.id, a.date, a.time, a.status, p.full_name AS patient_name,
+               m.target, d.full_name AS target_name
+        FROM moves m
+        JOIN appointments a ON a.id = m.id
+        JOIN patients p ON p.id = a.patient_id
+        LEFT JOIN doctors d ON d.id = m.target
+        ORDER BY a.start_at
+        """,
+        (doctor_id,),
+    ).fetchall()
+
+
+def reassign_future(conn, doctor_id, mode="reassign"):
+    """Move or cancel a doctor's future Booked/PendingApproval appointments.
+
+    ``reassign`` moves what it can and leaves the rest, ``reassign_or_cancel``
+    cancels what could not be moved and ``cancel`` cancels everything. Runs
+    as at most two set-based statements in one write transaction.
+    """
+    summary = ReassignSummary()
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if mode != "cancel":
+            rows = conn.execute(
+                _MOVES
+                + """
+                UPDATE appointments
+                SET doctor_id = moves.target
+                FROM moves
+                WHERE appointments.id = moves.id AND moves.target IS NOT NULL
+                RETURNING doctor_id
+                """,
+                (doctor_id,),
+            ).fetchall()
+            summary.reassigned = len(rows)
+            for (target,) in rows:
+                summary.by_doctor[target] = summary.by_doctor.get(target, 0) + 1
+
+        if mode == "reassign":
+            summary.unmatched = future_open_count(conn, doctor_id)
+        else:
+            summary.cancelled = conn.execute(
+                f"UPDATE appointments SET status = 'Cancelled' WHERE {_OPEN_FUTURE}",
+                (doctor_id,),
+            ).rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return summary
+
+
+def future_open_count(conn, doctor_id):
+    return conn.execute(
+        f"SELECT COUNT(*) FROM appointments WHERE {_OPEN_FUTURE}", (doctor_id,)
+    ).fetchone()[0]
@@ -0,0 +1,173 @@
+import time
+from datetime import date, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from archive import all_appointments, archive_appointments, has_archive
+from counters import read_totals, rebuild_counters
+from database import get_db, init_db
+from exports import EXPORT_FORMATS, stream_export
+from importer import import_csv, write_report
+from passwords import get_hasher
+from reminders import run_once
+from migrations import current_version, latest_version
+from query_plans import check_query_plans
+from rollups import rebuild_rollups
+
+hms_cli = AppGroup("hms", help="Hospital management maintenance commands.")
+
+
+@hms_cli.command("init-db")
+def init_db_command():
+    """Apply pending schema migrations and seed default data."""
+    applied = init_db(current_app)
+    if applied:
+        click.echo(f"applied migrations {', '.join(map(str, applied))}")
+    click.echo(f"schema version {current_version(get_db())}/{latest_version()}")
+
+
+@hms_cli.command("startup-report")
+def startup_report():
+    """Print how long each create_app() phase took in this process."""
+    for name, seconds in current_app.extensions.get("startup_timings", {}).items():
+        click.echo(f"{name:12s} {seconds * 1000:8.1f} ms")
+
+
+@hms_cli.command("check-plans")
+def check_plans():
+    """Fail if any hot appointment query falls back to a full table scan."""
+    conn = get_db()
+    click.echo(f"schema version {current_version(conn)}/{latest_version()}")
+    failed = False
+    for name, result in check_query_plans(conn).items():
+        status = "FULL SCAN" if result["full_scans"] else "ok"
+        click.echo(f"{name}: {status}")
+        for step in result["plan"]:
+            click.echo(f"    {step}")
+        failed = failed or bool(result["full_scans"])
+    if failed:
+        raise SystemExit(1)
+
+
+@hms_cli.command("rebuild-counters")
+def rebuild_counters_command():
+    """Recompute the trigger-maintained counters from the base tables."""
+    conn = get_db()
+    before = read_totals(conn)
+    conn.execute("BEGIN IMMEDIATE")
+    rebuild_counters(conn)
+    conn.commit()
+    after = read_totals(conn)
+    for key in after:
+        drift = after[key] - before.get(key, 0)
+        click.echo(f"{key}: {after[key]} (drift {drift:+d})")
+
+
+@hms_cli.command("rebuild-rollups")
+def rebuild_rollups_command():
+    """Recompute the daily analytics rollups from live and archived rows."""
+    conn = get_db()
+    started = time.perf_counter()
+    conn.execute("BEGIN IMMEDIATE")
+    rebuild_rollups(conn, all_appointments(conn))
+    conn.commit()
+    days = conn.execute(
+        "SELECT COUNT(DISTINCT day) FROM daily_department_stats"
+    ).fetchone()[0]
+    click.echo(f"rebuilt rollups for {days} day(s) in {time.perf_counter() - started:.1f}s")
+
+
+@hms_cli.command("archive")
+@click.option(
+    "--days",
+    type=int,
+    help="Archive appointments older than this many days (ARCHIVE_AFTER_DAYS).",
+)
+@click.option("--batch-size", type=int, help="Appointments per transaction.")
+def archive_command(days, batch_size):
+    """Move old Completed/Cancelled appointments into the archive database."""
+    conn = get_db()
+    if not has_archive(conn):
+        raise click.ClickException("ARCHIVE_DATABASE is not configured.")
+    days = current_app.config["ARCHIVE_AFTER_DAYS"] if days is None else days
+    cutoff = (date.today() - timedelta(days=days)).isoformat()
+    started = time.perf_counter()
+    moved = archive_appointments(
+        conn,
+        cutoff,
+        batch_size=batch_size or current_app.config["ARCHIVE_BATCH_SIZE"],
+    )
+    elapsed = time.perf_counter() - started
+    live = conn.execute("SELECT COUNT(*) FROM main.appointments").fetchone()[0]
+    archived = conn.execute("SELECT COUNT(*) FROM archive.appointments").fetchone()[0]
+    click.echo(f"archived {moved} appointment(s) before {cutoff} in {elapsed:.1f}s")
+    click.echo(f"live {live}, archived {archived}")
+
+
+@hms_cli.command("reminders")
+@click.option("--once", is_flag=True, help="Run a single pass and exit.")
+def reminders_command(once):
+    """Queue and send appointment reminders (a worker outside the web app)."""
+    app = current_app._get_current_object()
+    while True:
+        started = time.perf_counter()
+        stats = run_once(app)
+        elapsed = time.perf_counter() - started
+        if once or any(stats.values()):
+            click.echo(
+                f"queued {stats['queued']}, sent {stats['sent']},"
+                f" failed {stats['failed']}, purged {stats['purged']} in {elapsed:.1f}s"
+            )
+        if once:
+            break
+        time.sleep(app.config["REMINDER_INTERVAL"])
+
+
+@hms_cli.command("export")
+@click.option(
+    "--format", "fmt", type=click.Choice(sorted(EXPORT_FORMATS)), default="csv"
+)
+@click.option("--date-from", help="YYYY-MM-DD, inclusive.")
+@click.option("--date-to", help="YYYY-MM-DD, inclusive.")
+@click.option("--status")
+@click.option("--doctor-id", type=int)
+@click.option("--department-id", type=int)
+@click.option("--output", "-o", type=click.File("w"), default="-")
+@click.option("--batch-size", type=int, default=500)
+def export_command(
+    fmt, date_from, date_to, status, doctor_id, department_id, output, batch_size
+):
+    """Stream appointments with patient, doctor and treatment details."""
+    filters = {
+        "date_from": date_from,
+        "date_to": date_to,
+        "status": status,
+        "doctor_id": doctor_id,
+        "department_id": department_id,
+    }
+    filters = {key: value for key, value in filters.items() if value is not None}
+    for chunk in stream_export(get_db(), fmt, filters, batch_size=batch_size):
+        output.write(chunk)
+    output.flush()
+
+
+@hms_cli.command("import")
+@click.argument("kind", type=click.Choice(["doctors", "patients"]))
+@click.argument("source", type=click.File("r", encoding="utf-8-sig"))
+@click.option("--report", type=click.File("w"), help="Write rejected rows here.")
+@click.option("--chunk-size", type=int, default=1000)
+def import_command(kind, source, report, chunk_size):
+    """Bulk-load doctors or patients from a CSV file."""
+    started = time.perf_counter()
+    result = import_csv(get_db(), kind[:-1], source, get_hasher(), chunk_size)
+    elapsed = time.perf_counter() - started
+    click.echo(
+        f"inserted {result.inserted}, rejected {result.failed} in {elapsed:.1f}s"
+    )
+    if report:
+        write_report(result, report)
+    elif result.errors:
+        for line, username, message in result.errors[:20]:
+            click.echo(f"  line {line} ({username}): {message}")
@@ -0,0 +1,123 @@
+import json
+
+from archive import all_appointments
+
+
+def bump_sql(scope, key_expr, delta):
+    # Upsert used by the counter triggers; key_expr is evaluated inside the
+    # trigger body so it can reference NEW/OLD.
+    return f"""
+        INSERT INTO counters (scope, key, value)
+        VALUES ('{scope}', {key_expr}, {int(delta)})
+        ON CONFLICT (scope, key) DO UPDATE SET value = value + excluded.value;
+    """
+
+
+def department_key(doctor_expr):
+    return (
+        "COALESCE((SELECT CAST(department_id AS TEXT) FROM doctors"
+        f" WHERE id = {doctor_expr}), 'none')"
+    )
+
+
+def department_move_sql(old_department, new_department, doctor_id):
+    # Moves a doctor's appointments, live and archived, between department
+    # counters. Triggers cannot read the attached archive, so archived rows
+    # are counted per doctor under 'archived_doctor' by the archive job.
+    count = f"""(
+        (SELECT COUNT(*) FROM appointments WHERE doctor_id = {doctor_id})
+        + COALESCE((SELECT value FROM counters WHERE scope = 'archived_doctor'
+                    AND key = CAST({doctor_id} AS TEXT)), 0)
+    )"""
+    return f"""
+        INSERT INTO counters (scope, key, value)
+        VALUES ('department', COALESCE(CAST({old_department} AS TEXT), 'none'), -{count}),
+               ('department', COALESCE(CAST({new_department} AS TEXT), 'none'), {count})
+        ON CONFLICT (scope, key) DO UPDATE SET value = value + excluded.value;
+    """
+
+
+def rebuild_counters(conn):
+    # 'version' rows are change stamps for the fragment cache, not counts;
+    # resetting them could make a stale cached fragment look current again.
+    conn.execute("DELETE FROM counters WHERE scope != 'version'")
+    # Totals cover archived appointments too; see archive.archive_appointments.
+    appointments = all_appointments(conn)
+    conn.execute(
+        f"""
+        INSERT INTO counters (scope, key, value)
+        SELECT 'total', 'doctors', COUNT(*) FROM doctors
+        UNION ALL
+        SELECT 'total', 'patients', COUNT(*) FROM patients
+        UNION ALL
+        SELECT 'total', 'appointments', COUNT(*) FROM {appointments}
+        """
+    )
+    conn.execute(
+        f"""
+        INSERT INTO counters (scope, key, value)
+        SELECT 'status', status, COUNT(*) FROM {appointments} GROUP BY status
+        """
+    )
+    conn.execute(
+        f"""
+        INSERT INTO counters (scope, key, value)
+        SELECT 'department', COALESCE(CAST(d.department_id AS TEXT), 'none'), COUNT(*)
+        FROM {appointments} a
+        JOIN doctors d ON a.doctor_id = d.id
+        GROUP BY d.department_id
+        """
+    )
+    if appointments != "appointments":
+        conn.execute(
+            """
+            INSERT INTO counters (scope, key, value)
+            SELECT 'archived_doctor', CAST(doctor_id AS TEXT), COUNT(*)
+            FROM archive.appointments x
+            WHERE NOT EXISTS (SELECT 1 FROM main.appointments m WHERE m.id = x.id)
+            GROUP BY doctor_id
+            """
+        )
+
+
+def read_totals(conn):
+    totals = {"doctors": 0, "patients": 0, "appointments": 0}
+    for row in conn.execute("SELECT key, value FROM counters WHERE scope = 'total'"):
+        totals[row["key"]] = row["value"]
+    return totals
+
+
+def read_status_counts(conn):
+    return {
+        row["key"]: row["value"]
+        for row in conn.execute(
+            "SELECT key, value FROM counters WHERE scope = 'status' AND value != 0"
+        )
+    }
+
+
+def read_department_counts(conn):
+    return {
+        row["name"] or "Unassigned": row["value"]
+        for row in conn.execute(
+            """
+            SELECT dept.name, c.value
+            FROM counters c
+            LEFT JOIN departments dept ON CAST(dept.id AS TEXT) = c.key
+            WHERE c.scope = 'department' AND c.value != 0
+            """
+        )
+    }
+
+
+def read_versions(conn, keys):
+    versions = dict.fromkeys(keys, 0)
+    for row in conn.execute(
+        """
+        SELECT key, value FROM counters
+        WHERE scope = 'version' AND key IN (SELECT value FROM json_each(?))
+        """,
+        (json.dumps(list(keys)),),
+    ):
+        versions[row["key"]] = row["value"]
+    return versions
@@ -1,133 +1,162 @@
-import sqlite3
-from flask import current_app, g
-from werkzeug.security import generate_password_hash
+from contextlib import contextmanager
 
+from flask import current_app, g, has_request_context, request
+from werkzeug.security import generate_password_hash
 
-def get_db():
-    if "db" not in g:
-        db_path = current_app.config["DATABASE"]
-        g.db = sqlite3.connect(db_path)
-        g.db.row_factory = sqlite3.Row
-    return g.db
+from archive import init_archive
+from db_pool import ConnectionPool
+from metrics import instrument, unwrap
+from migrations import current_version, latest_version, migrate
+from passwords import normalize_method
+
+
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def init_pool(app):
+    options = dict(
+        timeout=app.config.get("DB_POOL_TIMEOUT", 10.0),
+        max_uses=app.config.get("DB_MAX_USES", 1000),
+        busy_timeout_ms=app.config.get("DB_BUSY_TIMEOUT_MS", 5000),
+        cache_size_kb=app.config.get("DB_CACHE_SIZE_KB", 16384),
+        mmap_size=app.config.get("DB_MMAP_SIZE", 64 * 1024 * 1024),
+        attach={"archive": app.config["ARCHIVE_DATABASE"]}
+        if app.config.get("ARCHIVE_DATABASE")
+        else None,
+    )
+    # SQLite admits one writer at a time anyway; a single writer lane per
+    # worker makes POSTs queue on a semaphore instead of spinning on
+    # busy_timeout, while WAL readers scale across the read pool.
+    pool = ConnectionPool(
+        app.config["DATABASE"],
+        max_size=app.config.get("DB_WRITE_POOL_SIZE", 1),
+        **options,
+    )
+    read_pool = ConnectionPool(
+        app.config["DATABASE"],
+        max_size=app.config.get("DB_POOL_SIZE", 8),
+        readonly=True,
+        **options,
+    )
+    app.extensions["db_pool"] = pool
+    app.extensions["db_read_pool"] = read_pool
+    return pool
+
+
+def get_pool():
+    return current_app.extensions["db_pool"]
+
+
+def get_read_pool():
+    return current_app.extensions["db_read_pool"]
+
+
+def read_mostly(view):
+    # For POST views that mostly read (login, registration checks): plain
+    # get_db() hands out a reader and writes must ask for get_db(write=True).
+    view.db_read_mostly = True
+    return view
+
+
+def _default_to_writer():
+    if not has_request_context():
+        return True  # CLI commands, migrations, boot-time checks
+    if request.method in READ_METHODS:
+        return False
+    view = current_app.view_functions.get(request.endpoint)
+    return not getattr(view, "db_read_mostly", False)
+
+
+def get_db(write=None):
+    if write is None:
+        write = _default_to_writer()
+    if write or "db" in g:
+        # Once a request holds the writer it reads through it too, so it
+        # always sees its own uncommitted changes.
+        if "db" not in g:
+            g.db = instrument(get_pool().acquire())
+        return g.db
+    if "read_db" not in g:
+        g.read_db = instrument(get_read_pool().acquire())
+    return g.read_db
+
+
+@contextmanager
+def write_lane():
+    # Borrow the writer for one short step of a long read_mostly view (an
+    # import chunk) and hand it back straight after, instead of holding
+    # the lane until the request ends.
+    held = "db" in g
+    conn = get_db(write=True)
+    try:
+        yield conn
+    finally:
+        if not held:
+            db = g.pop("db", None)
+            if db is not None:
+                get_pool().release(unwrap(db))
 
 
 def close_db(e=None):
     db = g.pop("db", None)
     if db is not None:
-        db.close()
-
-
-def init_db(app):
-    with app.app_context():
-        conn = get_db()
-        cursor = conn.cursor()
-
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                role TEXT NOT NULL CHECK (role IN ('admin','doctor','patient'))
-            );
-            """
+        get_pool().release(unwrap(db))
+    read_db = g.pop("read_db", None)
+    if read_db is not None:
+        get_read_pool().release(unwrap(read_db))
+
+
+def seed_db(conn):
+    conn.executemany(
+        "INSERT OR IGNORE INTO departments (name, description) VALUES (?, ?)",
+        [
+            ("Cardiology", "Heart and blood vessel specialists"),
+            ("Neurology", "Brain and nervous system"),
+            ("Pediatrics", "Child healthcare"),
+            ("Orthopedics", "Bone and muscle care"),
+        ],
+    )
+
+    # Hashing is deliberately slow, so only hash the default admin password
+    # when the admin row is actually missing.
+    if not conn.execute("SELECT 1 FROM users WHERE id = 1").fetchone():
+        method = normalize_method(
+            current_app.config.get("PASSWORD_HASH_METHOD", "scrypt")
         )
-
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS departments (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT UNIQUE NOT NULL,
-                description TEXT
-            );
-            """
-        )
-
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS doctors (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER UNIQUE NOT NULL,
-                full_name TEXT NOT NULL,
-                department_id INTEGER,
-                specialization TEXT NOT NULL,
-                availability TEXT DEFAULT '',
-                is_blacklisted INTEGER DEFAULT 0,
-                FOREIGN KEY (user_id) REFERENCES users(id),
-                FOREIGN KEY (department_id) REFERENCES departments(id)
-            );
-            """
-        )
-
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS patients (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER UNIQUE NOT NULL,
-                full_name TEXT NOT NULL,
-                age INTEGER,
-                gender TEXT,
-                contact TEXT,
-                address TEXT,
-                blood_group TEXT,
-                emergency_contact TEXT,
-                FOREIGN KEY (user_id) REFERENCES users(id)
-            );
-            """
-        )
-
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS appointments (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                patient_id INTEGER NOT NULL,
-                doctor_id INTEGER NOT NULL,
-                date TEXT NOT NULL,
-                time TEXT NOT NULL,
-                status TEXT NOT NULL DEFAULT 'Booked',
-                UNIQUE(doctor_id, date, time),
-                FOREIGN KEY (patient_id) REFERENCES patients(id),
-                FOREIGN KEY (doctor_id) REFERENCES doctors(id)
-            );
-            """
-        )
-
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS treatments (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                appointment_id INTEGER UNIQUE NOT NULL,
-                diagnosis TEXT,
-                prescription TEXT,
-                notes TEXT,
-                FOREIGN KEY (appointment_id) REFERENCES appointments(id)
-            );
-            """
-        )
-
-        # Seed default departments
-        cursor.executemany(
-            "INSERT OR IGNORE INTO departments (name, description) VALUES (?, ?)",
-            [
-                ("Cardiology", "Heart and blood vessel specialists"),
-                ("Neurology", "Brain and nervous system"),
-                ("Pediatrics", "Child healthcare"),
-                ("Orthopedics", "Bone and muscle care"),
-            ],
-        )
-
-        # Seed admin user
-        admin_username = "admin"
-        admin_email = "admin@hms.local"
-        admin_password = generate_password_hash("Admin@123")
-        cursor.execute(
+        conn.execute(
             """
             INSERT OR IGNORE INTO users (id, username, email, password_hash, role)
             VALUES (1, ?, ?, ?, 'admin')
             """,
-            (admin_username, admin_email, admin_password),
+            ("admin", "admin@hms.local", generate_password_hash("Admin@123", method)),
         )
 
-        conn.commit()
+    conn.commit()
+
+
+def init_db(app):
+    with app.app_context():
+        conn = get_db()
+        init_archive(conn)
+        applied = migrate(conn)
+        seed_db(conn)
+        return applied
+
 
+def ensure_schema(app):
+    # Boot-time check: a couple of catalog reads when the schema is current.
+    with app.app_context():
+        conn = get_db()
+        init_archive(conn)
+        version = current_version(conn)
+        if version >= latest_version():
+            return []
+        if not app.config.get("AUTO_MIGRATE", True):
+            raise RuntimeError(
+                f"Database schema is at version {version}, expected "
+                f"{latest_version()}; run `flask hms init-db`."
+            )
+        applied = migrate(conn)
+        if version == 0:
+            seed_db(conn)
+        return applied
@@ -0,0 +1,147 @@
+import os
+import sqlite3
+import threading
+from urllib.parse import quote
+
+
+class PoolTimeout(RuntimeError):
+    pass
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        db_path,
+        max_size=8,
+        timeout=10.0,
+        max_uses=1000,
+        busy_timeout_ms=5000,
+        cache_size_kb=16384,
+        mmap_size=64 * 1024 * 1024,
+        readonly=False,
+        attach=None,
+    ):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_uses = max_uses
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self.readonly = readonly
+        self.attach = dict(attach or {})
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        # Connections must never be shared across a fork, so every worker
+        # process lazily builds its own idle list and slot semaphore.
+        self._pid = os.getpid()
+        self._idle = []
+        self._uses = {}
+        self._slots = threading.BoundedSemaphore(self.max_size)
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+
+    def _connect(self):
+        if self.readonly:
+            # mode=ro keeps the file handle read-only and query_only rejects
+            # writes up front, so a reader can never take the write lock.
+            conn = sqlite3.connect(
+                f"file:{quote(os.path.abspath(self.db_path))}?mode=ro",
+                uri=True,
+                timeout=self.busy_timeout_ms / 1000,
+                check_same_thread=False,
+            )
+            for name, path in self.attach.items():
+                conn.execute(
+                    f"ATTACH DATABASE ? AS {name}",
+                    (f"file:{quote(os.path.abspath(path))}?mode=ro",),
+                )
+            conn.execute("PRAGMA query_only=ON")
+        else:
+            conn = sqlite3.connect(
+                self.db_path,
+                timeout=self.busy_timeout_ms / 1000,
+                check_same_thread=False,
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for name, path in self.attach.items():
+                conn.execute(f"ATTACH DATABASE ? AS {name}", (path,))
+                conn.execute(f"PRAGMA {name}.journal_mode=WAL")
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute(f"PRAGMA cache_size={-int(self.cache_size_kb)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def _healthy(self, conn):
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn):
+        self._uses.pop(id(conn), None)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def acquire(self):
+        self._check_pid()
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(
+                f"No database connection available within {self.timeout}s"
+            )
+        try:
+            while True:
+                with self._lock:
+                    conn = self._idle.pop() if self._idle else None
+                if conn is None:
+                    conn = self._connect()
+                    self._uses[id(conn)] = 0
+                    break
+                if self._healthy(conn):
+                    break
+                self._discard(conn)
+        except BaseException:
+            self._slots.release()
+            raise
+        self._uses[id(conn)] += 1
+        return conn
+
+    def release(self, conn):
+        if self._pid != os.getpid():
+            return
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            recycle = self._uses.get(id(conn), 0) >= self.max_uses
+        except sqlite3.Error:
+            recycle = True
+
+        if recycle:
+            self._discard(conn)
+        else:
+            with self._lock:
+                self._idle.append(conn)
+        self._slots.release()
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._discard(conn)
+
+    def stats(self):
+        with self._lock:
+            return {"idle": len(self._idle), "open": len(self._uses)}
@@ -1,7 +1,8 @@
-import json
 from datetime import datetime, timedelta
 from flask import (
     Blueprint,
+    Response,
+    current_app,
     render_template,
     request,
     redirect,
@@ -10,30 +11,55 @@ from flask import (
 )
 from flask_login import login_required, current_user
 
-from database import get_db
+from database import close_db, get_db
 from utils import role_required
-from models import fetch_doctor_by_user
+from pagination import appointment_filters, fetch_page, wants_json
+from slots import add_slot, group_slots, list_slots, remove_slot, set_day_slots
+from fragments import Lazy
+from bulk_ops import REVIEW_STATUSES, review_pending
+from archive import with_archive
+from live_feed import feed_position, replay
 
 doctor_bp = Blueprint("doctor", __name__)
 
+# Module-level so query_plans checks exactly what the views run.
+UPCOMING_SQL = """
+    SELECT a.*, p.full_name AS patient_name
+    FROM appointments a
+    JOIN patients p ON a.patient_id = p.id
+    WHERE a.doctor_id = ? AND a.start_at >= date('now')
+    ORDER BY a.start_at
+    LIMIT 10
+"""
+WEEK_SQL = """
+    SELECT a.*, p.full_name AS patient_name
+    FROM appointments a
+    JOIN patients p ON a.patient_id = p.id
+    WHERE a.doctor_id = ?
+      AND a.start_at >= date('now') AND a.start_at < date(?, '+1 day')
+    ORDER BY a.start_at
+"""
+APPOINTMENTS_SQL = """
+    SELECT a.*, p.full_name AS patient_name
+    FROM appointments a
+    JOIN patients p ON a.patient_id = p.id
+"""
+PATIENT_HISTORY_SQL = """
+    SELECT a.id, a.patient_id, a.start_at, a.date, a.time, a.status,
+           t.diagnosis, t.prescription, t.notes
+    FROM {appointments} a
+    LEFT JOIN {treatments} t ON a.id = t.appointment_id
+"""
+
 
 def get_doctor():
-    doctor = fetch_doctor_by_user(current_user.id)
+    doctor = current_user.profile if current_user.role == "doctor" else None
     if not doctor:
         flash("Doctor profile not found. Contact admin.", "danger")
         return None
     return doctor
 
 
-def load_availability(doc_row):
-    if not doc_row["availability"]:
-        return {}
-    try:
-        return json.loads(doc_row["availability"])
-    except json.JSONDecodeError:
-        return {}
-
-
 @doctor_bp.route("/dashboard", methods=["GET", "POST"])
 @login_required
 @role_required("doctor")
@@ -49,56 +75,113 @@ def dashboard():
     ]
 
     if request.method == "POST":
-        availability = {}
         for day in week_dates:
+            if f"slot_{day}" not in request.form:
+                continue
             slot_string = request.form.get(f"slot_{day}", "")
             slots = [s.strip() for s in slot_string.split(",") if s.strip()]
-            if slots:
-                availability[day] = slots
-        conn.execute(
-            "UPDATE doctors SET availability = ? WHERE id = ?",
-            (json.dumps(availability), doctor["id"]),
-        )
+            set_day_slots(conn, doctor["id"], day, slots)
         conn.commit()
         flash("Availability updated.", "success")
         return redirect(url_for("doctor.dashboard"))
 
-    availability = load_availability(doctor)
-    upcoming = conn.execute(
-        """
-        SELECT a.*, p.full_name AS patient_name
-        FROM appointments a
-        JOIN patients p ON a.patient_id = p.id
-        WHERE a.doctor_id = ? AND date(a.date) >= date('now')
-        ORDER BY a.date, a.time
-        LIMIT 10
-        """,
-        (doctor["id"],),
-    ).fetchall()
+    slots = list_slots(conn, doctor["id"], week_dates[0], week_dates[-1])
+    availability = group_slots(slots)
+    upcoming = Lazy(lambda: conn.execute(UPCOMING_SQL, (doctor["id"],)).fetchall())
 
     week_end = (datetime.utcnow().date() + timedelta(days=7)).isoformat()
-    weekly = conn.execute(
-        """
-        SELECT a.*, p.full_name AS patient_name
-        FROM appointments a
-        JOIN patients p ON a.patient_id = p.id
-        WHERE a.doctor_id = ?
-          AND date(a.date) BETWEEN date('now') AND date(?)
-        ORDER BY a.date, a.time
-        """,
-        (doctor["id"], week_end),
-    ).fetchall()
+    weekly = Lazy(
+        lambda: conn.execute(WEEK_SQL, (doctor["id"], week_end)).fetchall()
+    )
 
     return render_template(
         "doctor/dashboard.html",
         doctor=doctor,
         availability=availability,
+        slots=slots,
         upcoming=upcoming,
         weekly=weekly,
         week_dates=week_dates,
+        schedule_version=f"doctor:{doctor['id']}",
+        feed_position=feed_position(conn),
     )
 
 
+@doctor_bp.route("/events")
+@login_required
+@role_required("doctor")
+def events():
+    doctor = get_doctor()
+    if not doctor:
+        return "", 204  # EventSource stops reconnecting on 204
+
+    last_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    hub = current_app.extensions["live_feed"]
+    subscription = hub.subscribe(doctor["id"])
+    backlog = []
+    if last_id and last_id.isdigit():
+        backlog = replay(
+            get_db(), doctor["id"], int(last_id), current_app.config["FEED_REPLAY_LIMIT"]
+        )
+    # The stream can stay open for hours; don't hold a pooled connection.
+    close_db()
+    if backlog is None:
+        hub.unsubscribe(subscription)
+        body = iter(["event: reset\ndata: {}\n\n"])
+    else:
+        body = hub.stream(subscription, backlog, current_app.config["FEED_HEARTBEAT"])
+    return Response(
+        body,
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@doctor_bp.route("/slots/add", methods=["POST"])
+@login_required
+@role_required("doctor")
+def add_availability_slot():
+    doctor = get_doctor()
+    if not doctor:
+        return redirect(url_for("auth.logout"))
+
+    try:
+        duration = max(5, int(request.form.get("duration_minutes", 30)))
+    except ValueError:
+        duration = 30
+
+    conn = get_db()
+    if add_slot(
+        conn,
+        doctor["id"],
+        request.form.get("date", ""),
+        request.form.get("time", ""),
+        duration_minutes=duration,
+    ):
+        conn.commit()
+        flash("Slot added.", "success")
+    else:
+        flash("Slot is invalid or already published.", "warning")
+    return redirect(url_for("doctor.dashboard"))
+
+
+@doctor_bp.route("/slots/<int:slot_id>/remove", methods=["POST"])
+@login_required
+@role_required("doctor")
+def remove_availability_slot(slot_id):
+    doctor = get_doctor()
+    if not doctor:
+        return redirect(url_for("auth.logout"))
+
+    conn = get_db()
+    if remove_slot(conn, doctor["id"], slot_id):
+        conn.commit()
+        flash("Slot removed.", "info")
+    else:
+        flash("Slot not found.", "warning")
+    return redirect(url_for("doctor.dashboard"))
+
+
 @doctor_bp.route("/appointments")
 @login_required
 @role_required("doctor")
@@ -108,21 +191,21 @@ def appointments():
         return redirect(url_for("auth.logout"))
 
     conn = get_db()
-    status_filter = request.args.get("status")
-    query = """
-        SELECT a.*, p.full_name AS patient_name
-        FROM appointments a
-        JOIN patients p ON a.patient_id = p.id
-        WHERE a.doctor_id = ?
-    """
-    params = [doctor["id"]]
-    if status_filter:
-        query += " AND a.status = ?"
-        params.append(status_filter)
-    query += " ORDER BY date(a.date) DESC, time(a.time) DESC"
-
-    items = conn.execute(query, params).fetchall()
-    return render_template("doctor/appointments.html", appointments=items)
+    clauses, params = appointment_filters(request.args)
+    page = fetch_page(
+        conn,
+        APPOINTMENTS_SQL,
+        ["a.doctor_id = ?"] + clauses,
+        [doctor["id"]] + params,
+    )
+    if wants_json():
+        return page.to_json()
+    return render_template(
+        "doctor/appointments.html",
+        appointments=page.items,
+        page=page,
+        feed_position=feed_position(conn),
+    )
 
 
 @doctor_bp.route("/complete/<int:appointment_id>", methods=["POST"])
@@ -138,7 +221,7 @@ def mark_complete(appointment_id):
         """
         UPDATE appointments
         SET status = 'Completed'
-        WHERE id = ? AND doctor_id = ?
+        WHERE id = ? AND doctor_id = ? AND status != 'Cancelled'
         """,
         (appointment_id, doctor["id"]),
     )
@@ -222,19 +305,21 @@ def patient_history(patient_id):
         flash("Patient not found.", "warning")
         return redirect(url_for("doctor.appointments"))
 
-    treatments = conn.execute(
-        """
-        SELECT a.date, a.time, a.status, t.diagnosis, t.prescription, t.notes
-        FROM appointments a
-        LEFT JOIN treatments t ON a.id = t.appointment_id
-        WHERE a.patient_id = ?
-        ORDER BY date(a.date) DESC
-        """,
-        (patient_id,),
-    ).fetchall()
+    clauses, params = appointment_filters(request.args)
+    page = fetch_page(
+        conn,
+        with_archive(conn, PATIENT_HISTORY_SQL),
+        ["a.patient_id = ?"] + clauses,
+        [patient_id] + params,
+    )
+    if wants_json():
+        return page.to_json()
 
     return render_template(
-        "doctor/patient_history.html", patient=patient, treatments=treatments
+        "doctor/patient_history.html",
+        patient=patient,
+        treatments=page.items,
+        page=page,
     )
 
 
@@ -289,3 +374,28 @@ def reject_pending(appointment_id):
         flash("Unable to update appointment.", "warning")
     return redirect(url_for("doctor.appointments"))
 
+
+@doctor_bp.route("/pending/bulk", methods=["POST"])
+@login_required
+@role_required("doctor")
+def review_pending_bulk():
+    doctor = get_doctor()
+    if not doctor:
+        return redirect(url_for("auth.logout"))
+
+    action = request.form.get("action")
+    ids = None if request.form.get("scope") == "all" else request.form.getlist(
+        "appointment_ids", type=int
+    )
+    if action not in REVIEW_STATUSES or ids == []:
+        flash("Select pending requests and an action.", "warning")
+        return redirect(url_for("doctor.appointments", status="PendingApproval"))
+
+    updated = review_pending(get_db(), doctor["id"], action, ids)
+    verb = "approved" if action == "approve" else "declined"
+    requested = "all pending" if ids is None else len(ids)
+    flash(
+        f"{updated} request(s) {verb} ({requested} selected).",
+        "success" if updated else "warning",
+    )
+    return redirect(url_for("doctor.appointments", status="PendingApproval"))
@@ -0,0 +1,98 @@
+import csv
+import io
+import json
+
+from archive import with_archive
+from pagination import appointment_filters
+
+EXPORT_COLUMNS = (
+    "appointment_id",
+    "start_at",
+    "date",
+    "time",
+    "status",
+    "patient_id",
+    "patient_name",
+    "doctor_id",
+    "doctor_name",
+    "specialization",
+    "department",
+    "diagnosis",
+    "prescription",
+    "notes",
+)
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def export_query(conn, filters):
+    clauses, params = appointment_filters(
+        filters,
+        allowed=("status", "date_from", "date_to", "doctor_id", "department_id"),
+    )
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    # Archived history is exported too, like the counters and history pages.
+    source = with_archive(
+        conn,
+        """
+        SELECT a.id AS appointment_id, a.start_at, a.date, a.time, a.status,
+               a.patient_id, p.full_name AS patient_name,
+               a.doctor_id, d.full_name AS doctor_name, d.specialization,
+               dept.name AS department,
+               t.diagnosis, t.prescription, t.notes
+        FROM {appointments} a
+        JOIN patients p ON a.patient_id = p.id
+        JOIN doctors d ON a.doctor_id = d.id
+        LEFT JOIN departments dept ON d.department_id = dept.id
+        LEFT JOIN {treatments} t ON t.appointment_id = a.id
+        """,
+        key="appointment_id",
+    )
+    sql = f"""
+        SELECT * FROM ({source}) a
+        {where}
+        ORDER BY a.start_at, a.appointment_id
+    """
+    return sql, params
+
+
+def iter_batches(conn, sql, params, batch_size=500):
+    # SQLite steps the statement lazily, so fetchmany() keeps at most one
+    # batch of rows in memory no matter how large the result is.
+    cursor = conn.execute(sql, params)
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cursor.close()
+
+
+def stream_csv(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue()
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(tuple(row) for row in rows)
+        yield buffer.getvalue()
+
+
+def stream_ndjson(batches):
+    for rows in batches:
+        yield "".join(json.dumps(dict(row)) + "\n" for row in rows)
+
+
+def stream_export(conn, fmt, filters, batch_size=500):
+    sql, params = export_query(conn, filters)
+    batches = iter_batches(conn, sql, params, batch_size)
+    if fmt == "ndjson":
+        return stream_ndjson(batches)
+    return stream_csv(batches)
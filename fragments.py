@@ -0,0 +1,112 @@
+import os
+import threading
+from collections import OrderedDict
+
+from flask import g
+from flask_login import current_user
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+
+from counters import read_versions
+from database import get_db
+
+
+class FragmentCache:
+    # Per-process LRU of rendered template fragments. Keys embed the data
+    # version of every table the fragment reads, so writes never have to
+    # invalidate anything: the next render simply misses.
+    def __init__(self, max_size=512):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            html = self._entries.get(key)
+            if html is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return html
+
+    def set(self, key, html):
+        with self._lock:
+            self._entries[key] = html
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class Lazy:
+    """Rows loaded on first use, so a cached fragment skips its query."""
+
+    def __init__(self, loader):
+        self._loader = loader
+        self._rows = None
+
+    @property
+    def rows(self):
+        if self._rows is None:
+            self._rows = self._loader()
+        return self._rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __bool__(self):
+        return bool(self.rows)
+
+    def __getitem__(self, index):
+        return self.rows[index]
+
+
+def data_versions(*keys):
+    # Read once per request; a fragment keyed on several tables costs one
+    # indexed lookup on the counters table.
+    known = g.setdefault("data_versions", {})
+    missing = [key for key in keys if key not in known]
+    if missing:
+        known.update(read_versions(get_db(), missing))
+    return tuple(known[key] for key in keys)
+
+
+def make_fragment_helper(cache):
+    def fragment(name, *tables, entity=None, caller=None):
+        if cache is None:
+            return caller()
+        role = current_user.role if current_user.is_authenticated else "anonymous"
+        key = (name, role, entity, tables, data_versions(*tables))
+        html = cache.get(key)
+        if html is None:
+            html = Markup(caller())
+            cache.set(key, html)
+        return html
+
+    return fragment
+
+
+def init_templates(app):
+    cache_dir = app.config.get("JINJA_BYTECODE_CACHE_DIR")
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Must be set before app.jinja_env is first touched.
+        app.jinja_options = {
+            **app.jinja_options,
+            "bytecode_cache": FileSystemBytecodeCache(cache_dir),
+        }
+
+    size = app.config.get("FRAGMENT_CACHE_SIZE", 512)
+    cache = FragmentCache(size) if size else None
+    app.extensions["fragment_cache"] = cache
+    app.jinja_env.globals["fragment"] = make_fragment_helper(cache)
+    return cache
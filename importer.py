@@ -0,0 +1,225 @@
+import csv
+import json
+import re
+import sqlite3
+from contextlib import nullcontext
+
+IMPORT_KINDS = ("doctor", "patient")
+
+_REQUIRED = {
+    "doctor": ("username", "email", "full_name", "specialization"),
+    "patient": ("username", "email", "full_name"),
+}
+_PATIENT_FIELDS = (
+    "age",
+    "gender",
+    "contact",
+    "address",
+    "blood_group",
+    "emergency_contact",
+)
+_EMAIL = re.compile(r"^[^@\s]+@[^@\s]+$")
+_WERKZEUG_HASH = re.compile(r"^(scrypt|pbkdf2)[^$]*\$[^$]+\$[0-9a-f]+$")
+
+
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.errors = []
+
+    @property
+    def failed(self):
+        return len(self.errors)
+
+    def add_error(self, line, username, message):
+        self.errors.append((line, username or "", message))
+
+
+def write_report(report, stream):
+    writer = csv.writer(stream)
+    writer.writerow(("line", "username", "error"))
+    writer.writerows(report.errors)
+
+
+def _department_lookup(conn):
+    lookup = {}
+    for row in conn.execute("SELECT id, name FROM departments"):
+        lookup[row["name"].strip().lower()] = row["id"]
+        lookup[str(row["id"])] = row["id"]
+    return lookup
+
+
+def _validate(kind, row, departments):
+    record = {key: (value or "").strip() for key, value in row.items() if key}
+
+    for field in _REQUIRED[kind]:
+        if not record.get(field):
+            return None, f"missing {field}"
+    if not _EMAIL.match(record["email"]):
+        return None, "invalid email"
+
+    if record.get("password_hash"):
+        if not _WERKZEUG_HASH.match(record["password_hash"]):
+            return None, "password_hash is not a Werkzeug hash"
+    elif not record.get("password"):
+        return None, "missing password"
+
+    if kind == "doctor":
+        department = record.get("department") or record.get("department_id")
+        record["department_id"] = None
+        if department:
+            record["department_id"] = departments.get(department.lower())
+            if record["department_id"] is None:
+                return None, f"unknown department {department!r}"
+    else:
+        age = record.get("age")
+        if age:
+            if not age.isdigit() or int(age) > 150:
+                return None, "invalid age"
+            record["age"] = int(age)
+        for field in _PATIENT_FIELDS:
+            record[field] = record.get(field) or None
+
+    return record, None
+
+
+def _insert(conn, kind, keep, report):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.executemany(
+            """
+            INSERT INTO users (username, email, password_hash, role)
+            VALUES (?, ?, ?, ?)
+            """,
+            [
+                (record["username"], record["email"], record["password_hash"], kind)
+                for _, record in keep
+            ],
+        )
+        user_ids = {
+            row["username"]: row["id"]
+            for row in conn.execute(
+                """
+                SELECT id, username FROM users
+                WHERE username IN (SELECT value FROM json_each(?))
+                """,
+                (json.dumps([record["username"] for _, record in keep]),),
+            )
+        }
+        if kind == "doctor":
+            conn.executemany(
+                """
+                INSERT INTO doctors (user_id, full_name, specialization, department_id)
+                VALUES (?, ?, ?, ?)
+                """,
+                [
+                    (
+                        user_ids[record["username"]],
+                        record["full_name"],
+                        record["specialization"],
+                        record["department_id"],
+                    )
+                    for _, record in keep
+                ],
+            )
+        else:
+            conn.executemany(
+                """
+                INSERT INTO patients (
+                    user_id, full_name, age, gender, contact, address,
+                    blood_group, emergency_contact
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    (user_ids[record["username"]], record["full_name"])
+                    + tuple(record[field] for field in _PATIENT_FIELDS)
+                    for _, record in keep
+                ],
+            )
+        conn.commit()
+    except sqlite3.IntegrityError as exc:
+        conn.rollback()
+        for line, record in keep:
+            report.add_error(line, record["username"], f"batch rolled back: {exc}")
+        return
+    report.inserted += len(keep)
+
+
+def _flush(conn, writer, kind, chunk, hasher, report):
+    usernames = json.dumps([record["username"] for _, record in chunk])
+    emails = json.dumps([record["email"] for _, record in chunk])
+    taken_usernames, taken_emails = set(), set()
+    for row in conn.execute(
+        """
+        SELECT username, email FROM users
+        WHERE username IN (SELECT value FROM json_each(?))
+           OR email IN (SELECT value FROM json_each(?))
+        """,
+        (usernames, emails),
+    ):
+        taken_usernames.add(row["username"])
+        taken_emails.add(row["email"])
+
+    keep = []
+    for line, record in chunk:
+        if record["username"] in taken_usernames:
+            report.add_error(line, record["username"], "username already exists")
+        elif record["email"] in taken_emails:
+            report.add_error(line, record["username"], "email already exists")
+        else:
+            keep.append((line, record))
+    if not keep:
+        return
+
+    # Hash before borrowing the writer so it is only held for the inserts.
+    hashes = iter(
+        hasher.hash_many(
+            [r["password"] for _, r in keep if not r.get("password_hash")]
+        )
+    )
+    for _, record in keep:
+        record["password_hash"] = record.get("password_hash") or next(hashes)
+
+    with writer() as write_conn:
+        _insert(write_conn, kind, keep, report)
+
+
+def import_csv(conn, kind, stream, hasher, chunk_size=1000, writer=None):
+    # Reads go through ``conn``. ``writer`` returns a context manager that
+    # lends the connection for one chunk's insert; by default that is
+    # ``conn`` itself.
+    if kind not in IMPORT_KINDS:
+        raise ValueError(f"Unknown import kind {kind!r}")
+    writer = writer or (lambda: nullcontext(conn))
+    if conn.in_transaction:
+        # As in booking: the caller's open work is not ours to commit.
+        raise RuntimeError("import_csv() called inside an open transaction.")
+
+    report = ImportReport()
+    departments = _department_lookup(conn)
+    seen_usernames, seen_emails = set(), set()
+    chunk = []
+
+    # Header is line 1, so data rows start at line 2.
+    for line, row in enumerate(csv.DictReader(stream), start=2):
+        record, error = _validate(kind, row, departments)
+        if error:
+            report.add_error(line, row.get("username"), error)
+            continue
+        if record["username"] in seen_usernames:
+            report.add_error(line, record["username"], "duplicate username in file")
+            continue
+        if record["email"] in seen_emails:
+            report.add_error(line, record["username"], "duplicate email in file")
+            continue
+        seen_usernames.add(record["username"])
+        seen_emails.add(record["email"])
+
+        chunk.append((line, record))
+        if len(chunk) >= chunk_size:
+            _flush(conn, writer, kind, chunk, hasher, report)
+            chunk = []
+    if chunk:
+        _flush(conn, writer, kind, chunk, hasher, report)
+    return report
@@ -0,0 +1,210 @@
+import json
+import logging
+import queue
+import threading
+import time
+
+from database import get_db
+
+log = logging.getLogger(__name__)
+
+_EVENT_COLUMNS = """
+    e.id, e.doctor_id, e.appointment_id, e.kind, e.status, e.start_at,
+    e.created_at, p.full_name AS patient_name
+"""
+# Module-level so query_plans checks exactly what replay() runs.
+REPLAY_SQL = f"""
+    SELECT {_EVENT_COLUMNS}
+    FROM appointment_events e
+    LEFT JOIN patients p ON p.id = e.patient_id
+    WHERE e.doctor_id = ? AND e.id > ?
+    ORDER BY e.id
+    LIMIT ?
+"""
+
+
+def _event(row):
+    return {key: row[key] for key in row.keys()}
+
+
+def format_event(event):
+    return f"id: {event['id']}\nevent: {event['kind']}\ndata: {json.dumps(event)}\n\n"
+
+
+def feed_position(conn):
+    # The id a freshly rendered page is current up to; the page hands it to
+    # the feed as last_event_id so nothing falls between render and connect.
+    return conn.execute("SELECT COALESCE(MAX(id), 0) FROM appointment_events").fetchone()[0]
+
+
+def replay(conn, doctor_id, after_id, limit=500):
+    """A doctor's events after ``after_id``, or None if the gap is too big.
+
+    None means the client missed more than ``limit`` events or events that
+    were already purged, and should reload the page instead.
+    """
+    first = conn.execute("SELECT MIN(id) FROM appointment_events").fetchone()[0]
+    if first is not None and after_id < first - 1:
+        return None
+    rows = conn.execute(REPLAY_SQL, (doctor_id, after_id, limit + 1)).fetchall()
+    if len(rows) > limit:
+        return None
+    return [_event(row) for row in rows]
+
+
+def purge_events(conn, keep_hours=24, batch_size=5000):
+    cursor = conn.execute(
+        """
+        DELETE FROM appointment_events
+        WHERE id IN (
+            SELECT id FROM appointment_events
+            WHERE created_at < strftime('%Y-%m-%d %H:%M:%S', 'now', ?)
+            LIMIT ?
+        )
+        """,
+        (f"-{int(keep_hours)} hours", batch_size),
+    )
+    conn.commit()
+    return cursor.rowcount
+
+
+class Subscription:
+    def __init__(self, doctor_id, max_queue):
+        self.doctor_id = doctor_id
+        self.queue = queue.Queue(max_queue)
+        self.overflowed = False
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # Drop the client rather than buffer without bound; see stream().
+            self.overflowed = True
+
+
+class FeedHub:
+    """Per-worker fan-out of appointment_events to connected doctors.
+
+    One poller thread per process reads new rows off the primary key and
+    hands each to the subscriptions of its doctor, so the database load does
+    not grow with the number of open streams.
+    """
+
+    def __init__(self, app, poll_interval=1.0, max_queue=256, retention_hours=24):
+        self.app = app
+        self.poll_interval = poll_interval
+        self.max_queue = max_queue
+        self.retention_hours = retention_hours
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_id = 0
+        self._last_purge = 0.0
+
+    def subscribe(self, doctor_id):
+        subscription = Subscription(doctor_id, self.max_queue)
+        with self._lock:
+            self._start()
+            self._subscribers.setdefault(doctor_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.doctor_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.doctor_id]
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def _start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        # Position the poller before the first subscriber replays, so every
+        # later event reaches it either by replay or live.
+        with self.app.app_context():
+            self._last_id = feed_position(get_db(write=False))
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="live-feed", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+                if time.monotonic() - self._last_purge > 600:
+                    self._last_purge = time.monotonic()
+                    with self.app.app_context():
+                        purge_events(get_db(write=True), self.retention_hours)
+            except Exception:
+                log.exception("live feed poll failed")
+            self._stop.wait(self.poll_interval)
+
+    def poll_once(self, limit=1000):
+        with self.app.app_context():
+            rows = get_db(write=False).execute(
+                f"""
+                SELECT {_EVENT_COLUMNS}
+                FROM appointment_events e
+                LEFT JOIN patients p ON p.id = e.patient_id
+                WHERE e.id > ?
+                ORDER BY e.id
+                LIMIT ?
+                """,
+                (self._last_id, limit),
+            ).fetchall()
+        if not rows:
+            return 0
+        self._last_id = rows[-1]["id"]
+        with self._lock:
+            for row in rows:
+                for subscription in self._subscribers.get(row["doctor_id"], ()):
+                    subscription.put(_event(row))
+        return len(rows)
+
+    def stream(self, subscription, backlog=(), heartbeat=15.0):
+        """Server-sent events for one client: backlog, then live events.
+
+        Comment lines keep proxies from closing an idle stream. A client
+        that falls too far behind is disconnected.
+        """
+        try:
+            yield "retry: 3000\n\n"
+            last_id = 0
+            for event in backlog:
+                last_id = event["id"]
+                yield format_event(event)
+            while not subscription.overflowed:
+                try:
+                    event = subscription.queue.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ": ping\n\n"
+                    continue
+                if event["id"] <= last_id:
+                    continue  # already sent as part of the backlog
+                last_id = event["id"]
+                yield format_event(event)
+            # Ending the stream makes the browser reconnect with Last-Event-ID
+            # and replay what was dropped from the database.
+        finally:
+            self.unsubscribe(subscription)
+
+
+def init_feed(app):
+    hub = FeedHub(
+        app,
+        poll_interval=app.config["FEED_POLL_INTERVAL"],
+        max_queue=app.config["FEED_QUEUE_SIZE"],
+        retention_hours=app.config["FEED_RETENTION_HOURS"],
+    )
+    app.extensions["live_feed"] = hub
+    return hub
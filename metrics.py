@@ -0,0 +1,314 @@
+import threading
+import time
+from bisect import bisect_left
+
+from flask import before_render_template, g, request, template_rendered
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+
+_METRICS = {
+    "hms_request_duration_seconds": (
+        "histogram",
+        "Wall time from before_request to teardown, per endpoint.",
+    ),
+    "hms_requests_total": ("counter", "Requests handled, by endpoint and status."),
+    "hms_request_sql_queries": ("histogram", "SQL statements executed per request."),
+    "hms_sql_queries_total": ("counter", "SQL statements executed, per endpoint."),
+    "hms_sql_seconds_total": (
+        "counter",
+        "Time spent in SQLite execute/fetch/commit calls, per endpoint.",
+    ),
+    "hms_template_seconds_total": (
+        "counter",
+        "Time spent rendering templates, per endpoint.",
+    ),
+    "hms_template_render_seconds": ("histogram", "Render time per top-level template."),
+}
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    # Per-process registry. Under a multi-worker server every worker keeps its
+    # own numbers, so scrape each worker or aggregate downstream.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    def observe(self, name, labels, value, buckets=LATENCY_BUCKETS):
+        key = (name, tuple(labels.items()))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def inc(self, name, labels, amount=1):
+        key = (name, tuple(labels.items()))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        series = {}
+        for (name, labels), histogram in histograms:
+            lines = series.setdefault(name, [])
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                cumulative += count
+                bucket_labels = labels + (("le", str(bound)),)
+                lines.append(f"{name}_bucket{_labels(bucket_labels)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {histogram.sum:.6f}")
+            lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+        for (name, labels), value in counters:
+            if isinstance(value, float):
+                value = f"{value:.6f}"
+            series.setdefault(name, []).append(f"{name}{_labels(labels)} {value}")
+
+        out = []
+        for name, (kind, help_text) in _METRICS.items():
+            if name not in series:
+                continue
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+            out.extend(series[name])
+        return "\n".join(out) + "\n"
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+class QueryStats:
+    __slots__ = ("count", "seconds", "on_statement", "cursors")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        # Optional per-statement hook, called as (conn, sql, params, seconds)
+        # once a statement's rows are consumed; see slow_queries.py.
+        self.on_statement = None
+        self.cursors = []
+
+    def finish(self):
+        for cursor in self.cursors:
+            cursor.finish()
+        self.cursors.clear()
+
+
+def _timed(stats, func, *args):
+    started = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        stats.seconds += time.perf_counter() - started
+
+
+class InstrumentedCursor:
+    def __init__(self, cursor, stats):
+        self.raw = cursor
+        self._stats = stats
+        self._statement = None
+        self._elapsed = 0.0
+
+    def _timed(self, func, *args):
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            elapsed = time.perf_counter() - started
+            self._elapsed += elapsed
+            self._stats.seconds += elapsed
+
+    def _start(self, sql, params):
+        self.finish()
+        self._stats.count += 1
+        self._elapsed = 0.0
+        if self._stats.on_statement is not None:
+            self._statement = (sql, params)
+            self._stats.cursors.append(self)
+
+    def finish(self):
+        statement, self._statement = self._statement, None
+        if statement is not None:
+            self._stats.on_statement(self.raw.connection, *statement, self._elapsed)
+
+    def execute(self, sql, params=()):
+        self._start(sql, params)
+        self._timed(self.raw.execute, sql, params)
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        if not isinstance(seq_of_params, (list, tuple)):
+            seq_of_params = list(seq_of_params)
+        self._start(sql, seq_of_params[:1])
+        self._timed(self.raw.executemany, sql, seq_of_params)
+        return self
+
+    def fetchone(self):
+        row = self._timed(self.raw.fetchone)
+        if row is None:
+            self.finish()
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._timed(self.raw.fetchmany, *args)
+        if not rows:
+            self.finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(self.raw.fetchall)
+        self.finish()
+        return rows
+
+    def close(self):
+        self.finish()
+        self.raw.close()
+
+    def __iter__(self):
+        # Step in small batches so lazily consumed cursors stay lazy.
+        while True:
+            rows = self.fetchmany(256)
+            if not rows:
+                return
+            yield from rows
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+
+class InstrumentedConnection:
+    """Counts and times every statement run through the request connection."""
+
+    def __init__(self, conn, stats):
+        self.raw = conn
+        self._stats = stats
+
+    def cursor(self):
+        return InstrumentedCursor(self.raw.cursor(), self._stats)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+    def executescript(self, script):
+        self._stats.count += 1
+        return _timed(self._stats, self.raw.executescript, script)
+
+    def commit(self):
+        return _timed(self._stats, self.raw.commit)
+
+    def rollback(self):
+        return _timed(self._stats, self.raw.rollback)
+
+    def __enter__(self):
+        self.raw.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return _timed(self._stats, self.raw.__exit__, *exc)
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+
+def instrument(conn):
+    stats = g.get("query_stats")
+    if stats is None:
+        return conn
+    return InstrumentedConnection(conn, stats)
+
+
+def unwrap(conn):
+    return getattr(conn, "raw", conn)
+
+
+def init_metrics(app):
+    metrics = Metrics()
+    app.extensions["metrics"] = metrics
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        g.setdefault("query_stats", QueryStats())
+        g.template_seconds = 0.0
+
+    @app.after_request
+    def remember_status(response):
+        g.response_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def record_request(exc=None):
+        started = g.pop("request_started", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        endpoint = request.endpoint or "unmatched"
+        status = 500 if exc is not None else g.get("response_status", 500)
+        stats = g.query_stats
+
+        metrics.observe(
+            "hms_request_duration_seconds",
+            {"endpoint": endpoint, "method": request.method},
+            elapsed,
+        )
+        metrics.inc(
+            "hms_requests_total",
+            {"endpoint": endpoint, "method": request.method, "status": status},
+        )
+        metrics.observe(
+            "hms_request_sql_queries",
+            {"endpoint": endpoint},
+            stats.count,
+            buckets=QUERY_COUNT_BUCKETS,
+        )
+        metrics.inc("hms_sql_queries_total", {"endpoint": endpoint}, stats.count)
+        metrics.inc("hms_sql_seconds_total", {"endpoint": endpoint}, stats.seconds)
+        metrics.inc(
+            "hms_template_seconds_total", {"endpoint": endpoint}, g.template_seconds
+        )
+
+    # Only top-level render_template() calls emit these signals; includes and
+    # extended base templates are counted as part of the page that uses them.
+    def render_started(sender, template, context, **extra):
+        g.setdefault("template_started", []).append(time.perf_counter())
+
+    def render_finished(sender, template, context, **extra):
+        stack = g.get("template_started")
+        if not stack:
+            return
+        elapsed = time.perf_counter() - stack.pop()
+        metrics.observe(
+            "hms_template_render_seconds", {"template": template.name}, elapsed
+        )
+        if "template_seconds" in g:
+            g.template_seconds += elapsed
+
+    before_render_template.connect(render_started, app, weak=False)
+    template_rendered.connect(render_finished, app, weak=False)
+    return metrics
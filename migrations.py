@@ -0,0 +1,1083 @@
+import json
+import sqlite3
+
+from slots import slot_start
+
+MIGRATIONS = []
+
+
+def migration(version):
+    def decorator(func):
+        MIGRATIONS.append((version, func))
+        MIGRATIONS.sort(key=lambda step: step[0])
+        return func
+
+    return decorator
+
+
+def current_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def latest_version():
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+# Migrations keep their own copies of any SQL they share with the app
+# (counters.py, rollups.py, archive.py): a later change to a live helper must
+# not change what an old migration does to a fresh database.
+
+
+def _bump(scope, key_expr, delta):
+    # counters.bump_sql() as of migration 7.
+    return f"""
+        INSERT INTO counters (scope, key, value)
+        VALUES ('{scope}', {key_expr}, {int(delta)})
+        ON CONFLICT (scope, key) DO UPDATE SET value = value + excluded.value;
+    """
+
+
+def _department_key(doctor_expr):
+    # counters.department_key() as of migration 7.
+    return (
+        "COALESCE((SELECT CAST(department_id AS TEXT) FROM doctors"
+        f" WHERE id = {doctor_expr}), 'none')"
+    )
+
+
+def _all_appointments(conn):
+    # archive.all_appointments(), for the recounts in migrations 9 and 12.
+    try:
+        attached = conn.execute(
+            "SELECT 1 FROM archive.sqlite_master WHERE name = 'appointments'"
+        ).fetchone()
+    except sqlite3.OperationalError:
+        attached = None
+    if not attached:
+        return "appointments"
+    columns = "id, patient_id, doctor_id, date, time, status, start_at"
+    return f"""(
+        SELECT {columns} FROM main.appointments
+        UNION ALL
+        SELECT {columns} FROM archive.appointments x
+        WHERE NOT EXISTS (SELECT 1 FROM main.appointments m WHERE m.id = x.id)
+    )"""
+
+
+def _rollup_statements(source, sign=1):
+    # rollups.rollup_statements() as of migration 9.
+    sums = (
+        f"{int(sign)} * COUNT(*), {int(sign)} * SUM(r.status = 'Booked'),"
+        f" {int(sign)} * SUM(r.status = 'Completed'),"
+        f" {int(sign)} * SUM(r.status = 'Cancelled'),"
+        f" {int(sign)} * SUM(r.status = 'PendingApproval')"
+    )
+    columns = "total, booked, completed, cancelled, pending"
+    updates = ", ".join(
+        f"{name} = {name} + excluded.{name}" for name in columns.split(", ")
+    )
+    return [
+        f"""
+        INSERT INTO daily_doctor_stats (day, doctor_id, {columns})
+        SELECT r.date, r.doctor_id, {sums}
+        FROM {source} r
+        WHERE true
+        GROUP BY r.date, r.doctor_id
+        ON CONFLICT (day, doctor_id) DO UPDATE SET {updates}
+        """,
+        f"""
+        INSERT INTO monthly_doctor_stats (month, doctor_id, {columns})
+        SELECT substr(r.date, 1, 7), r.doctor_id, {sums}
+        FROM {source} r
+        WHERE true
+        GROUP BY substr(r.date, 1, 7), r.doctor_id
+        ON CONFLICT (month, doctor_id) DO UPDATE SET {updates}
+        """,
+        f"""
+        INSERT INTO daily_department_stats (day, department_id, {columns})
+        SELECT r.date, COALESCE(d.department_id, 0), {sums}
+        FROM {source} r
+        LEFT JOIN doctors d ON d.id = r.doctor_id
+        WHERE true
+        GROUP BY r.date, COALESCE(d.department_id, 0)
+        ON CONFLICT (day, department_id) DO UPDATE SET {updates}
+        """,
+    ]
+
+
+def migrate(conn):
+    applied = []
+    version = current_version(conn)
+    for target, step in MIGRATIONS:
+        if target <= version:
+            continue
+        # Each step runs in its own transaction together with the version
+        # bump, so a failed step leaves the schema at the previous version.
+        conn.execute("BEGIN IMMEDIATE")
+        if current_version(conn) >= target:
+            # Another worker applied this step while we waited for the lock.
+            conn.rollback()
+            version = target
+            continue
+        try:
+            step(conn)
+            conn.execute(f"PRAGMA user_version = {int(target)}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(target)
+        version = target
+    return applied
+
+
+@migration(1)
+def create_base_schema(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            role TEXT NOT NULL CHECK (role IN ('admin','doctor','patient'))
+        );
+        """
+    )
+
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS departments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            description TEXT
+        );
+        """
+    )
+
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS doctors (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER UNIQUE NOT NULL,
+            full_name TEXT NOT NULL,
+            department_id INTEGER,
+            specialization TEXT NOT NULL,
+            availability TEXT DEFAULT '',
+            is_blacklisted INTEGER DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users(id),
+            FOREIGN KEY (department_id) REFERENCES departments(id)
+        );
+        """
+    )
+
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS patients (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER UNIQUE NOT NULL,
+            full_name TEXT NOT NULL,
+            age INTEGER,
+            gender TEXT,
+            contact TEXT,
+            address TEXT,
+            blood_group TEXT,
+            emergency_contact TEXT,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        );
+        """
+    )
+
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS appointments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patient_id INTEGER NOT NULL,
+            doctor_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            time TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'Booked',
+            UNIQUE(doctor_id, date, time),
+            FOREIGN KEY (patient_id) REFERENCES patients(id),
+            FOREIGN KEY (doctor_id) REFERENCES doctors(id)
+        );
+        """
+    )
+
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS treatments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            appointment_id INTEGER UNIQUE NOT NULL,
+            diagnosis TEXT,
+            prescription TEXT,
+            notes TEXT,
+            FOREIGN KEY (appointment_id) REFERENCES appointments(id)
+        );
+        """
+    )
+
+
+@migration(2)
+def add_appointment_start_at(conn):
+    # start_at is a normalized 'YYYY-MM-DD HH:MM' string so range predicates
+    # and ORDER BY can use an index instead of wrapping date/time in functions.
+    # This step once indexed the raw date/time columns and a version 3 swapped
+    # those for start_at; the two were folded together before release, so
+    # there is no version 3.
+    conn.execute("ALTER TABLE appointments ADD COLUMN start_at TEXT")
+    conn.execute(
+        """
+        UPDATE appointments
+        SET start_at = COALESCE(
+            strftime('%Y-%m-%d %H:%M', date || ' ' || time), date || ' ' || time
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_appointments_start_at_insert
+        AFTER INSERT ON appointments
+        BEGIN
+            UPDATE appointments
+            SET start_at = COALESCE(
+                strftime('%Y-%m-%d %H:%M', NEW.date || ' ' || NEW.time),
+                NEW.date || ' ' || NEW.time
+            )
+            WHERE id = NEW.id;
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_appointments_start_at_update
+        AFTER UPDATE OF date, time ON appointments
+        BEGIN
+            UPDATE appointments
+            SET start_at = COALESCE(
+                strftime('%Y-%m-%d %H:%M', NEW.date || ' ' || NEW.time),
+                NEW.date || ' ' || NEW.time
+            )
+            WHERE id = NEW.id;
+        END
+        """
+    )
+
+    # treatments(appointment_id) is already served by its UNIQUE index and
+    # appointments(doctor_id, date, time) by the UNIQUE constraint.
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_appointments_start_at
+        ON appointments (start_at, id)
+        """
+    )
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_appointments_patient_start
+        ON appointments (patient_id, start_at)
+        """
+    )
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_appointments_doctor_start
+        ON appointments (doctor_id, start_at)
+        """
+    )
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_appointments_doctor_status_start
+        ON appointments (doctor_id, status, start_at)
+        """
+    )
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_doctors_department
+        ON doctors (department_id)
+        """
+    )
+
+
+@migration(4)
+def add_appointment_status_index(conn):
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_appointments_status_start
+        ON appointments (status, start_at)
+        """
+    )
+
+
+@migration(5)
+def add_search_index(conn):
+    # Standalone FTS5 tables keyed by the doctor/patient rowid. Doctor rows
+    # carry their department name, so department renames re-index doctors.
+    conn.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS doctor_search USING fts5(
+            full_name, specialization, department_name,
+            tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS patient_search USING fts5(
+            full_name, contact, patient_ref,
+            tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+        )
+        """
+    )
+
+    conn.execute("DELETE FROM doctor_search")
+    conn.execute(
+        """
+        INSERT INTO doctor_search (rowid, full_name, specialization, department_name)
+        SELECT d.id, d.full_name, d.specialization, dept.name
+        FROM doctors d
+        LEFT JOIN departments dept ON d.department_id = dept.id
+        """
+    )
+    conn.execute("DELETE FROM patient_search")
+    conn.execute(
+        """
+        INSERT INTO patient_search (rowid, full_name, contact, patient_ref)
+        SELECT id, full_name, contact, CAST(id AS TEXT) FROM patients
+        """
+    )
+
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_doctor_search_insert
+        AFTER INSERT ON doctors
+        BEGIN
+            INSERT INTO doctor_search (rowid, full_name, specialization, department_name)
+            VALUES (
+                NEW.id, NEW.full_name, NEW.specialization,
+                (SELECT name FROM departments WHERE id = NEW.department_id)
+            );
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_doctor_search_update
+        AFTER UPDATE OF full_name, specialization, department_id ON doctors
+        BEGIN
+            DELETE FROM doctor_search WHERE rowid = OLD.id;
+            INSERT INTO doctor_search (rowid, full_name, specialization, department_name)
+            VALUES (
+                NEW.id, NEW.full_name, NEW.specialization,
+                (SELECT name FROM departments WHERE id = NEW.department_id)
+            );
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_doctor_search_delete
+        AFTER DELETE ON doctors
+        BEGIN
+            DELETE FROM doctor_search WHERE rowid = OLD.id;
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_doctor_search_department
+        AFTER UPDATE OF name ON departments
+        BEGIN
+            DELETE FROM doctor_search
+            WHERE rowid IN (SELECT id FROM doctors WHERE department_id = NEW.id);
+            INSERT INTO doctor_search (rowid, full_name, specialization, department_name)
+            SELECT id, full_name, specialization, NEW.name
+            FROM doctors WHERE department_id = NEW.id;
+        END
+        """
+    )
+
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_patient_search_insert
+        AFTER INSERT ON patients
+        BEGIN
+            INSERT INTO patient_search (rowid, full_name, contact, patient_ref)
+            VALUES (NEW.id, NEW.full_name, NEW.contact, CAST(NEW.id AS TEXT));
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_patient_search_update
+        AFTER UPDATE OF full_name, contact ON patients
+        BEGIN
+            DELETE FROM patient_search WHERE rowid = OLD.id;
+            INSERT INTO patient_search (rowid, full_name, contact, patient_ref)
+            VALUES (NEW.id, NEW.full_name, NEW.contact, CAST(NEW.id AS TEXT));
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_patient_search_delete
+        AFTER DELETE ON patients
+        BEGIN
+            DELETE FROM patient_search WHERE rowid = OLD.id;
+        END
+        """
+    )
+
+
+@migration(6)
+def add_doctor_slots(conn):
+    # Appointments keep UNIQUE(doctor_id, date, time), so a slot can hold at
+    # most one booking for now; capacity is stored for when that is relaxed.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS doctor_slots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            doctor_id INTEGER NOT NULL,
+            start_at TEXT NOT NULL,
+            duration_minutes INTEGER NOT NULL DEFAULT 30,
+            capacity INTEGER NOT NULL DEFAULT 1,
+            UNIQUE(doctor_id, start_at),
+            FOREIGN KEY (doctor_id) REFERENCES doctors(id) ON DELETE CASCADE
+        );
+        """
+    )
+
+    rows = conn.execute(
+        "SELECT id, availability FROM doctors WHERE availability != ''"
+    ).fetchall()
+    for doctor_id, raw in rows:
+        try:
+            availability = json.loads(raw)
+        except (TypeError, json.JSONDecodeError):
+            continue
+        if not isinstance(availability, dict):
+            continue
+        for day, times in availability.items():
+            for time in times or []:
+                start_at = slot_start(day, time)
+                if start_at:
+                    conn.execute(
+                        """
+                        INSERT OR IGNORE INTO doctor_slots (doctor_id, start_at)
+                        VALUES (?, ?)
+                        """,
+                        (doctor_id, start_at),
+                    )
+    conn.execute("UPDATE doctors SET availability = ''")
+
+
+@migration(7)
+def add_counters(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS counters (
+            scope TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (scope, key)
+        ) WITHOUT ROWID;
+        """
+    )
+
+    triggers = {
+        "trg_counters_doctor_insert": (
+            "AFTER INSERT ON doctors",
+            _bump("total", "'doctors'", 1),
+        ),
+        "trg_counters_doctor_delete": (
+            "AFTER DELETE ON doctors",
+            _bump("total", "'doctors'", -1),
+        ),
+        "trg_counters_doctor_department": (
+            "AFTER UPDATE OF department_id ON doctors"
+            " WHEN OLD.department_id IS NOT NEW.department_id",
+            f"""
+            INSERT INTO counters (scope, key, value)
+            SELECT 'department', COALESCE(CAST(OLD.department_id AS TEXT), 'none'),
+                   -COUNT(*)
+            FROM appointments WHERE doctor_id = NEW.id
+            ON CONFLICT (scope, key) DO UPDATE SET value = value + excluded.value;
+            INSERT INTO counters (scope, key, value)
+            SELECT 'department', COALESCE(CAST(NEW.department_id AS TEXT), 'none'),
+                   COUNT(*)
+            FROM appointments WHERE doctor_id = NEW.id
+            ON CONFLICT (scope, key) DO UPDATE SET value = value + excluded.value;
+            """,
+        ),
+        "trg_counters_patient_insert": (
+            "AFTER INSERT ON patients",
+            _bump("total", "'patients'", 1),
+        ),
+        "trg_counters_patient_delete": (
+            "AFTER DELETE ON patients",
+            _bump("total", "'patients'", -1),
+        ),
+        "trg_counters_appointment_insert": (
+            "AFTER INSERT ON appointments",
+            _bump("total", "'appointments'", 1)
+            + _bump("status", "NEW.status", 1)
+            + _bump("department", _department_key("NEW.doctor_id"), 1),
+        ),
+        "trg_counters_appointment_delete": (
+            "AFTER DELETE ON appointments",
+            _bump("total", "'appointments'", -1)
+            + _bump("status", "OLD.status", -1)
+            + _bump("department", _department_key("OLD.doctor_id"), -1),
+        ),
+        "trg_counters_appointment_status": (
+            "AFTER UPDATE OF status ON appointments"
+            " WHEN OLD.status IS NOT NEW.status",
+            _bump("status", "OLD.status", -1) + _bump("status", "NEW.status", 1),
+        ),
+        "trg_counters_appointment_doctor": (
+            "AFTER UPDATE OF doctor_id ON appointments"
+            " WHEN OLD.doctor_id IS NOT NEW.doctor_id",
+            _bump("department", _department_key("OLD.doctor_id"), -1)
+            + _bump("department", _department_key("NEW.doctor_id"), 1),
+        ),
+    }
+    for name, (event, body) in triggers.items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END")
+
+    # No archive existed yet, so the live tables are the whole count.
+    conn.execute(
+        """
+        INSERT INTO counters (scope, key, value)
+        SELECT 'total', 'doctors', COUNT(*) FROM doctors
+        UNION ALL
+        SELECT 'total', 'patients', COUNT(*) FROM patients
+        UNION ALL
+        SELECT 'total', 'appointments', COUNT(*) FROM appointments
+        """
+    )
+    conn.execute(
+        """
+        INSERT INTO counters (scope, key, value)
+        SELECT 'status', status, COUNT(*) FROM appointments GROUP BY status
+        """
+    )
+    conn.execute(
+        """
+        INSERT INTO counters (scope, key, value)
+        SELECT 'department', COALESCE(CAST(d.department_id AS TEXT), 'none'), COUNT(*)
+        FROM appointments a
+        JOIN doctors d ON a.doctor_id = d.id
+        GROUP BY d.department_id
+        """
+    )
+
+
+@migration(8)
+def add_data_versions(conn):
+    # Change stamps for the template fragment cache: every write to rows a
+    # cached fragment depends on bumps the matching 'version' counter.
+    doctor_key = "'doctor:' || {}.doctor_id"
+    triggers = {
+        "trg_version_department_insert": (
+            "AFTER INSERT ON departments",
+            _bump("version", "'departments'", 1),
+        ),
+        "trg_version_department_update": (
+            "AFTER UPDATE ON departments",
+            _bump("version", "'departments'", 1),
+        ),
+        "trg_version_department_delete": (
+            "AFTER DELETE ON departments",
+            _bump("version", "'departments'", 1),
+        ),
+        "trg_version_doctor_insert": (
+            "AFTER INSERT ON doctors",
+            _bump("version", "'doctors'", 1),
+        ),
+        "trg_version_doctor_update": (
+            "AFTER UPDATE ON doctors",
+            _bump("version", "'doctors'", 1)
+            + _bump("version", "'doctor:' || NEW.id", 1),
+        ),
+        "trg_version_doctor_delete": (
+            "AFTER DELETE ON doctors",
+            _bump("version", "'doctors'", 1),
+        ),
+        "trg_version_doctor_email": (
+            "AFTER UPDATE OF email ON users WHEN NEW.role = 'doctor'",
+            _bump("version", "'doctors'", 1),
+        ),
+        "trg_version_patient_name": (
+            "AFTER UPDATE OF full_name ON patients",
+            _bump("version", "'patients'", 1),
+        ),
+        "trg_version_slot_insert": (
+            "AFTER INSERT ON doctor_slots",
+            _bump("version", doctor_key.format("NEW"), 1),
+        ),
+        "trg_version_slot_update": (
+            "AFTER UPDATE ON doctor_slots",
+            _bump("version", doctor_key.format("OLD"), 1)
+            + _bump("version", doctor_key.format("NEW"), 1),
+        ),
+        "trg_version_slot_delete": (
+            "AFTER DELETE ON doctor_slots",
+            _bump("version", doctor_key.format("OLD"), 1),
+        ),
+        "trg_version_appointment_insert": (
+            "AFTER INSERT ON appointments",
+            _bump("version", doctor_key.format("NEW"), 1),
+        ),
+        "trg_version_appointment_update": (
+            "AFTER UPDATE ON appointments",
+            _bump("version", doctor_key.format("OLD"), 1)
+            + _bump("version", doctor_key.format("NEW"), 1),
+        ),
+        "trg_version_appointment_delete": (
+            "AFTER DELETE ON appointments",
+            _bump("version", doctor_key.format("OLD"), 1),
+        ),
+    }
+    for name, (event, body) in triggers.items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END")
+
+
+@migration(9)
+def add_daily_rollups(conn):
+    # Per-day appointment counts by status for the analytics pages, kept
+    # current by the triggers below so reports never scan appointments.
+    counts = """
+        total INTEGER NOT NULL DEFAULT 0,
+        booked INTEGER NOT NULL DEFAULT 0,
+        completed INTEGER NOT NULL DEFAULT 0,
+        cancelled INTEGER NOT NULL DEFAULT 0,
+        pending INTEGER NOT NULL DEFAULT 0
+    """
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS daily_doctor_stats (
+            day TEXT NOT NULL,
+            doctor_id INTEGER NOT NULL,
+            {counts},
+            PRIMARY KEY (day, doctor_id)
+        ) WITHOUT ROWID;
+        """
+    )
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_daily_doctor_stats_doctor
+        ON daily_doctor_stats (doctor_id, day)
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS monthly_doctor_stats (
+            month TEXT NOT NULL,
+            doctor_id INTEGER NOT NULL,
+            {counts},
+            PRIMARY KEY (month, doctor_id)
+        ) WITHOUT ROWID;
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS daily_department_stats (
+            day TEXT NOT NULL,
+            department_id INTEGER NOT NULL,
+            {counts},
+            PRIMARY KEY (day, department_id)
+        ) WITHOUT ROWID;
+        """
+    )
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_daily_department_stats_pending
+        ON daily_department_stats (department_id, day) WHERE pending != 0
+        """
+    )
+
+    def body(*rows):
+        return "".join(
+            statement + ";"
+            for row, sign in rows
+            for statement in _rollup_statements(
+                f"(SELECT {row}.date AS date, {row}.doctor_id AS doctor_id,"
+                f" {row}.status AS status)",
+                sign,
+            )
+        )
+
+    triggers = {
+        "trg_rollup_appointment_insert": (
+            "AFTER INSERT ON appointments",
+            body(("NEW", 1)),
+        ),
+        "trg_rollup_appointment_update": (
+            "AFTER UPDATE OF status, doctor_id, date ON appointments"
+            " WHEN OLD.status IS NOT NEW.status"
+            " OR OLD.doctor_id IS NOT NEW.doctor_id"
+            " OR OLD.date IS NOT NEW.date",
+            body(("OLD", -1), ("NEW", 1)),
+        ),
+        "trg_rollup_appointment_delete": (
+            "AFTER DELETE ON appointments",
+            body(("OLD", -1)),
+        ),
+    }
+    for name, (event, body_sql) in triggers.items():
+        conn.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body_sql} END"
+        )
+
+    for statement in _rollup_statements(_all_appointments(conn)):
+        conn.execute(statement)
+
+
+@migration(10)
+def add_reminder_outbox(conn):
+    # One row per (appointment, start time) that needs a reminder; the
+    # UNIQUE key makes enqueueing idempotent and a rescheduled appointment
+    # gets a fresh reminder for its new time.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS reminder_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            appointment_id INTEGER NOT NULL,
+            start_at TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%S', 'now')),
+            claimed_at TEXT,
+            sent_at TEXT,
+            UNIQUE (appointment_id, start_at)
+        );
+        """
+    )
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_reminder_outbox_pending
+        ON reminder_outbox (id) WHERE status = 'pending'
+        """
+    )
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_reminder_outbox_done
+        ON reminder_outbox (created_at) WHERE status != 'pending'
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS job_cursors (
+            name TEXT PRIMARY KEY,
+            position TEXT NOT NULL,
+            last_id INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT
+        ) WITHOUT ROWID;
+        """
+    )
+    conn.execute(
+        """
+        INSERT OR IGNORE INTO job_cursors (name, position, updated_at)
+        VALUES ('reminders', strftime('%Y-%m-%d %H:%M', 'now'),
+                strftime('%Y-%m-%d %H:%M:%S', 'now'))
+        """
+    )
+
+    # The scheduler walks start_at forward; a booking made (or moved) to a
+    # time the cursor has already passed is queued here instead. Rows
+    # inserted without start_at are caught by the update that fills it in.
+    late = """
+        NEW.status = 'Booked'
+        AND NEW.start_at > strftime('%Y-%m-%d %H:%M', 'now')
+        AND NEW.start_at <= (SELECT position FROM job_cursors WHERE name = 'reminders')
+    """
+    enqueue = """
+        INSERT OR IGNORE INTO reminder_outbox (appointment_id, start_at)
+        VALUES (NEW.id, NEW.start_at);
+    """
+    triggers = {
+        "trg_reminder_late_insert": f"AFTER INSERT ON appointments WHEN {late}",
+        "trg_reminder_late_update": (
+            f"AFTER UPDATE OF start_at, status ON appointments WHEN {late}"
+        ),
+    }
+    for name, event in triggers.items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {enqueue} END")
+
+
+@migration(11)
+def add_appointment_events(conn):
+    # Append-only change log behind the doctors' live feed. Rows are keyed
+    # by doctor so a reconnecting client replays only its own events.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS appointment_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            doctor_id INTEGER NOT NULL,
+            appointment_id INTEGER NOT NULL,
+            patient_id INTEGER,
+            kind TEXT NOT NULL,
+            status TEXT,
+            start_at TEXT,
+            created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%S', 'now'))
+        );
+        """
+    )
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_appointment_events_doctor
+        ON appointment_events (doctor_id, id)
+        """
+    )
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_appointment_events_created
+        ON appointment_events (created_at)
+        """
+    )
+
+    def status_kind(status):
+        return f"""
+            CASE {status}
+                WHEN 'PendingApproval' THEN 'requested'
+                WHEN 'Booked' THEN 'booked'
+                WHEN 'Cancelled' THEN 'cancelled'
+                WHEN 'Completed' THEN 'completed'
+                ELSE 'updated'
+            END
+        """
+
+    def log_event(doctor, kind):
+        return f"""
+            INSERT INTO appointment_events
+                (doctor_id, appointment_id, patient_id, kind, status, start_at)
+            VALUES ({doctor}, NEW.id, NEW.patient_id, {kind}, NEW.status, {start_at});
+        """
+
+    # start_at is filled in by trg_appointments_start_at_insert after this
+    # row's own insert triggers, so derive it the same way here.
+    start_at = (
+        "COALESCE(strftime('%Y-%m-%d %H:%M', NEW.date || ' ' || NEW.time),"
+        " NEW.date || ' ' || NEW.time)"
+    )
+    changed = """
+        OLD.status IS NOT NEW.status
+        OR OLD.doctor_id IS NOT NEW.doctor_id
+        OR (OLD.start_at IS NOT NULL AND OLD.start_at IS NOT NEW.start_at)
+    """
+    triggers = {
+        "trg_event_appointment_insert": (
+            "AFTER INSERT ON appointments",
+            log_event("NEW.doctor_id", status_kind("NEW.status")),
+        ),
+        "trg_event_appointment_update": (
+            f"AFTER UPDATE OF status, doctor_id, start_at ON appointments WHEN {changed}",
+            log_event(
+                "NEW.doctor_id",
+                f"""
+                CASE WHEN OLD.status IS NOT NEW.status OR OLD.doctor_id IS NOT NEW.doctor_id
+                     THEN {status_kind("NEW.status")}
+                     ELSE 'rescheduled'
+                END
+                """,
+            ),
+        ),
+        "trg_event_appointment_reassigned": (
+            "AFTER UPDATE OF doctor_id ON appointments"
+            " WHEN OLD.doctor_id IS NOT NEW.doctor_id",
+            log_event("OLD.doctor_id", "'reassigned'"),
+        ),
+    }
+    for name, (event, body) in triggers.items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END")
+
+
+@migration(12)
+def count_archived_department_moves(conn):
+    # trg_counters_doctor_department only moved live appointments, while the
+    # counter rebuild counts archived ones too. Triggers cannot read the
+    # attached archive, so archived rows are counted per doctor under
+    # 'archived_doctor' by the archive job and moved with the live ones.
+    count = """(
+        (SELECT COUNT(*) FROM appointments WHERE doctor_id = NEW.id)
+        + COALESCE((SELECT value FROM counters WHERE scope = 'archived_doctor'
+                    AND key = CAST(NEW.id AS TEXT)), 0)
+    )"""
+    conn.execute("DROP TRIGGER IF EXISTS trg_counters_doctor_department")
+    conn.execute(
+        f"""
+        CREATE TRIGGER trg_counters_doctor_department
+        AFTER UPDATE OF department_id ON doctors
+        WHEN OLD.department_id IS NOT NEW.department_id
+        BEGIN
+            INSERT INTO counters (scope, key, value)
+            VALUES ('department', COALESCE(CAST(OLD.department_id AS TEXT), 'none'),
+                    -{count}),
+                   ('department', COALESCE(CAST(NEW.department_id AS TEXT), 'none'),
+                    {count})
+            ON CONFLICT (scope, key) DO UPDATE SET value = value + excluded.value;
+        END
+        """
+    )
+
+    # Recount everything, archive included. 'version' rows are change
+    # stamps, not counts, and are kept.
+    appointments = _all_appointments(conn)
+    conn.execute("DELETE FROM counters WHERE scope != 'version'")
+    conn.execute(
+        f"""
+        INSERT INTO counters (scope, key, value)
+        SELECT 'total', 'doctors', COUNT(*) FROM doctors
+        UNION ALL
+        SELECT 'total', 'patients', COUNT(*) FROM patients
+        UNION ALL
+        SELECT 'total', 'appointments', COUNT(*) FROM {appointments}
+        """
+    )
+    conn.execute(
+        f"""
+        INSERT INTO counters (scope, key, value)
+        SELECT 'status', status, COUNT(*) FROM {appointments} GROUP BY status
+        """
+    )
+    conn.execute(
+        f"""
+        INSERT INTO counters (scope, key, value)
+        SELECT 'department', COALESCE(CAST(d.department_id AS TEXT), 'none'), COUNT(*)
+        FROM {appointments} a
+        JOIN doctors d ON a.doctor_id = d.id
+        GROUP BY d.department_id
+        """
+    )
+    if appointments != "appointments":
+        conn.execute(
+            """
+            INSERT INTO counters (scope, key, value)
+            SELECT 'archived_doctor', CAST(doctor_id AS TEXT), COUNT(*)
+            FROM archive.appointments x
+            WHERE NOT EXISTS (SELECT 1 FROM main.appointments m WHERE m.id = x.id)
+            GROUP BY doctor_id
+            """
+        )
+
+
+@migration(13)
+def release_cancelled_slots(conn):
+    # UNIQUE(doctor_id, date, time) made a cancelled row hold its slot, so
+    # rebooking it meant handing that row to the new patient and erasing the
+    # cancellation from the first one's history. Only live bookings hold a
+    # slot now. SQLite cannot drop a table constraint, so appointments is
+    # rebuilt, and treatments with it because its foreign key follows the
+    # old table through the rename. Indexes and triggers are replayed from
+    # the catalog.
+    tables = ("appointments", "treatments")
+    schema = conn.execute(
+        """
+        SELECT type, name, sql FROM main.sqlite_master
+        WHERE tbl_name IN ('appointments', 'treatments')
+          AND type IN ('index', 'trigger') AND sql IS NOT NULL
+        """
+    ).fetchall()
+    sequences = conn.execute(
+        """
+        SELECT name, seq FROM main.sqlite_sequence
+        WHERE name IN ('appointments', 'treatments')
+        """
+    ).fetchall()
+
+    for kind, name, _ in schema:
+        conn.execute(f"DROP {kind.upper()} main.{name}")
+    # The legacy rename leaves the triggers on other tables naming
+    # "appointments", which the new table then takes over.
+    conn.execute("PRAGMA legacy_alter_table = ON")
+    try:
+        for table in tables:
+            conn.execute(f"ALTER TABLE main.{table} RENAME TO {table}_old")
+    finally:
+        conn.execute("PRAGMA legacy_alter_table = OFF")
+    conn.execute(
+        """
+        CREATE TABLE main.appointments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patient_id INTEGER NOT NULL,
+            doctor_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            time TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'Booked',
+            start_at TEXT,
+            FOREIGN KEY (patient_id) REFERENCES patients(id),
+            FOREIGN KEY (doctor_id) REFERENCES doctors(id)
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE main.treatments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            appointment_id INTEGER UNIQUE NOT NULL,
+            diagnosis TEXT,
+            prescription TEXT,
+            notes TEXT,
+            FOREIGN KEY (appointment_id) REFERENCES appointments(id)
+        )
+        """
+    )
+    for table, columns in (
+        ("appointments", "id, patient_id, doctor_id, date, time, status, start_at"),
+        ("treatments", "id, appointment_id, diagnosis, prescription, notes"),
+    ):
+        conn.execute(
+            f"INSERT INTO main.{table} ({columns}) SELECT {columns} FROM main.{table}_old"
+        )
+    for table in reversed(tables):
+        conn.execute(f"DROP TABLE main.{table}_old")
+    for _, _, sql in schema:
+        conn.execute(sql)
+    conn.execute(
+        """
+        CREATE UNIQUE INDEX idx_appointments_slot
+        ON appointments (doctor_id, date, time) WHERE status != 'Cancelled'
+        """
+    )
+    # Keep the ids of archived rows from being handed out again.
+    conn.executemany(
+        "UPDATE main.sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?",
+        [(seq, name) for name, seq in sequences],
+    )
+
+
+@migration(14)
+def add_user_versions(conn):
+    # Change stamps for the per-worker identity cache: any write to a user or
+    # their doctor/patient profile bumps 'user:<id>', so every worker sees a
+    # blacklisting or deletion on its next request instead of after the TTL.
+    user_key = "'user:' || {}"
+    triggers = {
+        "trg_version_user_update": (
+            "AFTER UPDATE ON users",
+            _bump("version", user_key.format("NEW.id"), 1),
+        ),
+        "trg_version_user_delete": (
+            "AFTER DELETE ON users",
+            _bump("version", user_key.format("OLD.id"), 1),
+        ),
+    }
+    for table in ("doctors", "patients"):
+        triggers.update(
+            {
+                f"trg_version_{table}_user_insert": (
+                    f"AFTER INSERT ON {table}",
+                    _bump("version", user_key.format("NEW.user_id"), 1),
+                ),
+                f"trg_version_{table}_user_update": (
+                    f"AFTER UPDATE ON {table}",
+                    _bump("version", user_key.format("OLD.user_id"), 1)
+                    + _bump("version", user_key.format("NEW.user_id"), 1),
+                ),
+                f"trg_version_{table}_user_delete": (
+                    f"AFTER DELETE ON {table}",
+                    _bump("version", user_key.format("OLD.user_id"), 1),
+                ),
+            }
+        )
+    for name, (event, body) in triggers.items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END")
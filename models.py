@@ -1,13 +1,42 @@
 from flask_login import UserMixin
 from flask import current_app
 from database import get_db
+from counters import read_versions
 
 
 class User(UserMixin):
-    def __init__(self, id, username, role):
+    def __init__(self, id, username, role, profile=None):
         self.id = id
         self.username = username
         self.role = role
+        self.profile = profile
+
+    @property
+    def profile_id(self):
+        return self.profile["id"] if self.profile else None
+
+
+def fetch_identity(user_id):
+    conn = get_db()
+    row = conn.execute(
+        "SELECT id, username, role FROM users WHERE id = ?", (user_id,)
+    ).fetchone()
+    if not row:
+        return None
+
+    profile = None
+    if row["role"] == "doctor":
+        profile = fetch_doctor_by_user(row["id"])
+    elif row["role"] == "patient":
+        profile = fetch_patient_by_user(row["id"])
+    return User(
+        row["id"], row["username"], row["role"], dict(profile) if profile else None
+    )
+
+
+def fetch_identity_version(user_id):
+    key = f"user:{user_id}"
+    return read_versions(get_db(), [key])[key]
 
 
 def fetch_user_by_id(user_id):
@@ -0,0 +1,168 @@
+import base64
+import binascii
+from datetime import datetime
+
+from flask import current_app, jsonify, request, url_for
+
+APPOINTMENT_STATUSES = ("PendingApproval", "Booked", "Completed", "Cancelled")
+
+
+class Page:
+    def __init__(self, items, limit, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.limit = limit
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def next_url(self):
+        return _page_url(after=self.next_cursor) if self.next_cursor else None
+
+    @property
+    def prev_url(self):
+        return _page_url(before=self.prev_cursor) if self.prev_cursor else None
+
+    def to_json(self):
+        return jsonify(
+            {
+                "items": [dict(row) for row in self.items],
+                "limit": self.limit,
+                "next_cursor": self.next_cursor,
+                "prev_cursor": self.prev_cursor,
+            }
+        )
+
+
+def _page_url(**cursor):
+    args = {k: v for k, v in request.args.items() if k not in ("after", "before")}
+    args.update(cursor)
+    return url_for(request.endpoint, **(request.view_args or {}), **args)
+
+
+def wants_json():
+    return request.args.get("format") == "json"
+
+
+def page_limit():
+    default = current_app.config.get("PAGE_SIZE", 25)
+    maximum = current_app.config.get("MAX_PAGE_SIZE", 200)
+    try:
+        limit = int(request.args.get("limit", default))
+    except ValueError:
+        limit = default
+    return max(1, min(limit, maximum))
+
+
+def encode_cursor(row):
+    raw = f"{row['start_at']}|{row['id']}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        start_at, appointment_id = raw.rsplit("|", 1)
+        return start_at, int(appointment_id)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        return None
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date().isoformat()
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def appointment_filters(args, alias="a", allowed=("status", "date_from", "date_to")):
+    clauses, params = [], []
+
+    status = args.get("status")
+    if "status" in allowed and status in APPOINTMENT_STATUSES:
+        clauses.append(f"{alias}.status = ?")
+        params.append(status)
+
+    date_from = _parse_date(args.get("date_from"))
+    if "date_from" in allowed and date_from:
+        clauses.append(f"{alias}.start_at >= ?")
+        params.append(date_from)
+
+    date_to = _parse_date(args.get("date_to"))
+    if "date_to" in allowed and date_to:
+        clauses.append(f"{alias}.start_at < date(?, '+1 day')")
+        params.append(date_to)
+
+    doctor_id = _parse_int(args.get("doctor_id"))
+    if "doctor_id" in allowed and doctor_id is not None:
+        clauses.append(f"{alias}.doctor_id = ?")
+        params.append(doctor_id)
+
+    department_id = _parse_int(args.get("department_id"))
+    if "department_id" in allowed and department_id is not None:
+        clauses.append(
+            f"{alias}.doctor_id IN (SELECT id FROM doctors WHERE department_id = ?)"
+        )
+        params.append(department_id)
+
+    return clauses, params
+
+
+def page_query(
+    select_sql, clauses=(), params=(), limit=25, after=None, before=None, alias="a"
+):
+    # The keyset query fetch_page() runs, also used by query_plans to check
+    # the exact SQL the paged routes execute. Fetches one row past ``limit``
+    # to tell whether another page exists.
+    clauses, params = list(clauses), list(params)
+    if before:
+        clauses.append(f"({alias}.start_at, {alias}.id) > (?, ?)")
+        params.extend(before)
+        direction = "ASC"
+    else:
+        if after:
+            clauses.append(f"({alias}.start_at, {alias}.id) < (?, ?)")
+            params.extend(after)
+        direction = "DESC"
+
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    sql = (
+        f"{select_sql}{where}"
+        f" ORDER BY {alias}.start_at {direction}, {alias}.id {direction} LIMIT ?"
+    )
+    return sql, params + [limit + 1]
+
+
+def fetch_page(conn, select_sql, clauses=(), params=(), alias="a"):
+    # select_sql is the SELECT ... FROM ... JOIN part of the query and must
+    # include {alias}.id and {alias}.start_at, which form the page cursor.
+    limit = page_limit()
+    after = decode_cursor(request.args.get("after"))
+    before = decode_cursor(request.args.get("before"))
+    sql, params = page_query(select_sql, clauses, params, limit, after, before, alias)
+    rows = conn.execute(sql, params).fetchall()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if before:
+        rows.reverse()
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, after is not None
+
+    if not rows:
+        return Page(rows, limit)
+    return Page(
+        rows,
+        limit,
+        next_cursor=encode_cursor(rows[-1]) if has_next else None,
+        prev_cursor=encode_cursor(rows[0]) if has_prev else None,
+    )
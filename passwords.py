@@ -0,0 +1,154 @@
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# Werkzeug's defaults, spelled out so stored hashes can be compared against
+# the configured method to decide whether a rehash is due.
+_DEFAULT_PARAMS = {"scrypt": "scrypt:32768:8:1", "pbkdf2": "pbkdf2:sha256:600000"}
+
+
+class HasherBusy(RuntimeError):
+    pass
+
+
+def normalize_method(method):
+    if method in _DEFAULT_PARAMS:
+        return _DEFAULT_PARAMS[method]
+    if method.startswith("pbkdf2:") and method.count(":") == 1:
+        return f"{method}:600000"
+    return method
+
+
+def _hash_chunk(passwords, method, salt_length):
+    return [generate_password_hash(p, method, salt_length) for p in passwords]
+
+
+def _mp_context():
+    # The pool starts lazily from a request thread. Forking a process that
+    # already runs other threads (server, live feed, reminders) can deadlock
+    # the child, so workers come from a clean forkserver process instead.
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+class PasswordHasher:
+    def __init__(
+        self,
+        method="scrypt",
+        salt_length=16,
+        workers=None,
+        max_pending=64,
+        timeout=10.0,
+    ):
+        self.method = normalize_method(method)
+        self.salt_length = salt_length
+        self.workers = os.cpu_count() if workers is None else workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._pid = None
+        self._executor = None
+        self._slots = None
+
+    def _get_executor(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=_mp_context()
+                    )
+                    self._slots = threading.BoundedSemaphore(self.max_pending)
+                    self._pid = os.getpid()
+        return self._executor
+
+    def _submit(self, func, *args):
+        # The caller holds a slot. It goes back when the job finishes in the
+        # pool, not when the caller stops waiting, so max_pending bounds the
+        # real backlog even when callers time out.
+        try:
+            future = self._executor.submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _run(self, func, *args):
+        if not self.workers:
+            return func(*args)
+        self._get_executor()
+        # Fail fast instead of queueing: a full pool means every request
+        # thread would otherwise sit here waiting on CPU-bound work.
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy("Password hashing queue is full")
+        future = self._submit(func, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()  # only helps if it never started
+            raise HasherBusy("Password hashing timed out") from None
+
+    def hash(self, password):
+        return self._run(
+            generate_password_hash, password, self.method, self.salt_length
+        )
+
+    def hash_many(self, passwords, chunksize=32):
+        # Bulk path for imports. Each chunk in the pool holds a slot like a
+        # single hash does, but waits for one instead of failing, and at most
+        # one chunk per worker is in flight so logins still find free slots.
+        if not self.workers:
+            return _hash_chunk(passwords, self.method, self.salt_length)
+        self._get_executor()
+        hashes, in_flight = [], deque()
+        for start in range(0, len(passwords), chunksize):
+            if len(in_flight) >= self.workers:
+                hashes.extend(in_flight.popleft().result())
+            if not self._slots.acquire(timeout=self.timeout):
+                raise HasherBusy("Password hashing queue is full")
+            in_flight.append(
+                self._submit(
+                    _hash_chunk,
+                    passwords[start : start + chunksize],
+                    self.method,
+                    self.salt_length,
+                )
+            )
+        while in_flight:
+            hashes.extend(in_flight.popleft().result())
+        return hashes
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        return pwhash.split("$", 1)[0] != self.method
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._pid = None
+
+
+def init_hasher(app):
+    hasher = PasswordHasher(
+        method=app.config.get("PASSWORD_HASH_METHOD", "scrypt"),
+        salt_length=app.config.get("PASSWORD_SALT_LENGTH", 16),
+        workers=app.config.get("PASSWORD_HASH_WORKERS"),
+        max_pending=app.config.get("PASSWORD_HASH_MAX_PENDING", 64),
+        timeout=app.config.get("PASSWORD_HASH_TIMEOUT", 10.0),
+    )
+    app.extensions["password_hasher"] = hasher
+    return hasher
+
+
+def get_hasher():
+    return current_app.extensions["password_hasher"]
@@ -1,7 +1,7 @@
-import json
 from datetime import datetime
 from flask import (
     Blueprint,
+    current_app,
     render_template,
     request,
     redirect,
@@ -12,13 +12,43 @@ from flask_login import login_required, current_user
 
 from database import get_db
 from utils import role_required
-from models import fetch_patient_by_user
+from user_cache import invalidate_user
+from pagination import appointment_filters, fetch_page, wants_json
+from search import search_doctors
+from slots import load_slots
+from booking import BOOKED, PENDING_APPROVAL, book_appointment
+from fragments import Lazy
+from slot_finder import find_next_slots, parse_window
+from archive import with_archive
 
 patient_bp = Blueprint("patient", __name__)
 
+# Module-level so query_plans checks exactly what the views run.
+UPCOMING_SQL = """
+    SELECT a.*, d.full_name AS doctor_name, d.specialization
+    FROM appointments a
+    JOIN doctors d ON a.doctor_id = d.id
+    WHERE a.patient_id = ? AND a.start_at >= date('now')
+    ORDER BY a.start_at
+"""
+RECENT_SQL = """
+    SELECT a.*, d.full_name AS doctor_name
+    FROM appointments a
+    JOIN doctors d ON a.doctor_id = d.id
+    WHERE a.patient_id = ? AND a.start_at < date('now')
+    ORDER BY a.start_at DESC
+    LIMIT 5
+"""
+HISTORY_SQL = """
+    SELECT a.*, d.full_name AS doctor_name, t.diagnosis, t.prescription
+    FROM {appointments} a
+    JOIN doctors d ON a.doctor_id = d.id
+    LEFT JOIN {treatments} t ON a.id = t.appointment_id
+"""
+
 
 def get_patient():
-    patient = fetch_patient_by_user(current_user.id)
+    patient = current_user.profile if current_user.role == "patient" else None
     if not patient:
         flash("Patient profile not found. Please complete registration.", "danger")
     return patient
@@ -33,29 +63,11 @@ def dashboard():
         return redirect(url_for("auth.logout"))
 
     conn = get_db()
-    departments = conn.execute("SELECT * FROM departments ORDER BY name").fetchall()
-    upcoming = conn.execute(
-        """
-        SELECT a.*, d.full_name AS doctor_name, d.specialization
-        FROM appointments a
-        JOIN doctors d ON a.doctor_id = d.id
-        WHERE a.patient_id = ? AND date(a.date) >= date('now')
-        ORDER BY a.date, a.time
-        """,
-        (patient["id"],),
-    ).fetchall()
-
-    history = conn.execute(
-        """
-        SELECT a.*, d.full_name AS doctor_name
-        FROM appointments a
-        JOIN doctors d ON a.doctor_id = d.id
-        WHERE a.patient_id = ? AND date(a.date) < date('now')
-        ORDER BY a.date DESC
-        LIMIT 5
-        """,
-        (patient["id"],),
-    ).fetchall()
+    departments = Lazy(
+        lambda: conn.execute("SELECT * FROM departments ORDER BY name").fetchall()
+    )
+    upcoming = conn.execute(UPCOMING_SQL, (patient["id"],)).fetchall()
+    history = conn.execute(RECENT_SQL, (patient["id"],)).fetchall()
 
     return render_template(
         "patient/dashboard.html",
@@ -72,22 +84,51 @@ def dashboard():
 def search_doctor():
     conn = get_db()
     specialization = request.args.get("specialization", "")
-    doctors = conn.execute(
-        """
-        SELECT d.*, dept.name AS department_name
-        FROM doctors d
-        LEFT JOIN departments dept ON d.department_id = dept.id
-        WHERE d.is_blacklisted = 0
-          AND (d.specialization LIKE ? OR dept.name LIKE ?)
-        ORDER BY d.full_name
-        """,
-        (f"%{specialization}%", f"%{specialization}%"),
-    ).fetchall()
+    doctors = Lazy(
+        lambda: search_doctors(
+            conn,
+            specialization,
+            columns=("specialization", "department_name"),
+            include_blacklisted=False,
+        )
+    )
     return render_template(
         "patient/search_doctor.html", doctors=doctors, specialization=specialization
     )
 
 
+@patient_bp.route("/find_slot")
+@login_required
+@role_required("patient")
+def find_slot():
+    conn = get_db()
+    departments = conn.execute("SELECT id, name FROM departments ORDER BY name").fetchall()
+    department_id = request.args.get("department_id", type=int)
+    specialization = request.args.get("specialization", "").strip()
+    date_from, days, limit = parse_window(request.args)
+
+    slots = None
+    if department_id or specialization:
+        slots = find_next_slots(
+            conn,
+            current_app.extensions["occupancy_index"],
+            department_id=department_id,
+            specialization=specialization,
+            date_from=date_from,
+            days=days,
+            limit=limit,
+        )
+    return render_template(
+        "patient/find_slot.html",
+        departments=departments,
+        department_id=department_id,
+        specialization=specialization,
+        date_from=date_from.isoformat() if date_from else "",
+        days=days,
+        slots=slots,
+    )
+
+
 @patient_bp.route("/book/<int:doctor_id>", methods=["GET", "POST"])
 @login_required
 @role_required("patient")
@@ -110,12 +151,9 @@ def book(doctor_id):
         flash("Doctor not found or unavailable.", "warning")
         return redirect(url_for("patient.search_doctor"))
 
-    availability = {}
-    if doctor["availability"]:
-        try:
-            availability = json.loads(doctor["availability"])
-        except json.JSONDecodeError:
-            availability = {}
+    availability = load_slots(
+        conn, doctor_id, date_from=datetime.utcnow().date().isoformat()
+    )
 
     pending_choice = None
     selected_date = None
@@ -128,52 +166,27 @@ def book(doctor_id):
         confirm_pending = request.form.get("confirm_pending")
         selected_date, selected_time = date, time
 
-        has_defined_slots = bool(availability)
-        slot_in_schedule = (
-            not has_defined_slots
-            or (date in availability and time in availability.get(date, []))
+        result = book_appointment(
+            conn,
+            patient["id"],
+            doctor_id,
+            date,
+            time,
+            appointment_id=request.form.get("appointment_id", type=int),
+            request_approval=confirm_pending == "yes",
         )
 
-        conflict = conn.execute(
-            """
-            SELECT 1 FROM appointments
-            WHERE doctor_id = ? AND date = ? AND time = ? AND status != 'Cancelled'
-            """,
-            (doctor_id, date, time),
-        ).fetchone()
-
-        needs_approval = False
-        pending_reason = ""
-        if not slot_in_schedule and has_defined_slots:
-            needs_approval = True
-            pending_reason = "Selected time is outside the doctor's published availability."
-        elif conflict:
-            needs_approval = True
-            pending_reason = "Selected slot is already booked."
-
-        if needs_approval:
-            if confirm_pending == "yes":
-                if appointment_id:
-                    conn.execute(
-                        """
-                        UPDATE appointments
-                        SET date=?, time=?, status='PendingApproval'
-                        WHERE id=? AND patient_id=?
-                        """,
-                        (date, time, appointment_id, patient["id"]),
-                    )
-                else:
-                    conn.execute(
-                        """
-                        INSERT INTO appointments (patient_id, doctor_id, date, time, status)
-                        VALUES (?, ?, ?, ?, 'PendingApproval')
-                        """,
-                        (patient["id"], doctor_id, date, time),
-                    )
-                conn.commit()
-                flash("Approval request sent to doctor.", "info")
-                return redirect(url_for("patient.dashboard"))
+        if result.status == PENDING_APPROVAL:
+            flash("Approval request sent to doctor.", "info")
+            return redirect(url_for("patient.dashboard"))
+        if result.status == BOOKED:
+            if appointment_id:
+                flash("Appointment rescheduled.", "success")
+            else:
+                flash("Appointment booked.", "success")
+            return redirect(url_for("patient.dashboard"))
 
+        if result.can_request_approval:
             flash(
                 "Slot is not available. Do you want to request doctor approval?",
                 "warning",
@@ -182,30 +195,10 @@ def book(doctor_id):
                 "date": date,
                 "time": time,
                 "appointment_id": appointment_id or "",
-                "reason": pending_reason,
+                "reason": result.reason,
             }
         else:
-            if appointment_id:
-                conn.execute(
-                    """
-                    UPDATE appointments
-                    SET date=?, time=?, status='Booked'
-                    WHERE id=? AND patient_id=?
-                    """,
-                    (date, time, appointment_id, patient["id"]),
-                )
-                flash("Appointment rescheduled.", "success")
-            else:
-                conn.execute(
-                    """
-                    INSERT INTO appointments (patient_id, doctor_id, date, time)
-                    VALUES (?, ?, ?, ?)
-                    """,
-                    (patient["id"], doctor_id, date, time),
-                )
-                flash("Appointment booked.", "success")
-            conn.commit()
-            return redirect(url_for("patient.dashboard"))
+            flash(result.reason, "danger")
 
     return render_template(
         "patient/book.html",
@@ -247,19 +240,19 @@ def history():
         return redirect(url_for("patient.dashboard"))
 
     conn = get_db()
-    records = conn.execute(
-        """
-        SELECT a.*, d.full_name AS doctor_name, t.diagnosis, t.prescription
-        FROM appointments a
-        JOIN doctors d ON a.doctor_id = d.id
-        LEFT JOIN treatments t ON a.id = t.appointment_id
-        WHERE a.patient_id = ?
-        ORDER BY date(a.date) DESC
-        """,
-        (patient["id"],),
-    ).fetchall()
+    clauses, params = appointment_filters(request.args)
+    page = fetch_page(
+        conn,
+        with_archive(conn, HISTORY_SQL),
+        ["a.patient_id = ?"] + clauses,
+        [patient["id"]] + params,
+    )
+    if wants_json():
+        return page.to_json()
 
-    return render_template("patient/history.html", appointments=records)
+    return render_template(
+        "patient/history.html", appointments=page.items, page=page
+    )
 
 
 @patient_bp.route("/profile", methods=["GET", "POST"])
@@ -288,6 +281,7 @@ def profile():
             (full_name, age, gender, contact, address, blood, emergency, patient["id"]),
         )
         conn.commit()
+        invalidate_user(current_user.id)
         flash("Profile updated.", "success")
         return redirect(url_for("patient.profile"))
 
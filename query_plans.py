@@ -0,0 +1,92 @@
+import re
+
+import admin_routes
+import api_routes
+import doctor_routes
+import live_feed
+import patient_routes
+import reminders
+from archive import with_archive
+from pagination import page_query
+
+_CURSOR = ("2000-01-01 00:00", 1)
+
+
+def _paged(name, select_sql, clauses=(), params=()):
+    # Each paged route runs a first page and cursor pages in both directions.
+    return {
+        f"{name}:first": page_query(select_sql, clauses, params),
+        f"{name}:after": page_query(select_sql, clauses, params, after=_CURSOR),
+        f"{name}:before": page_query(select_sql, clauses, params, before=_CURSOR),
+    }
+
+
+def hot_queries(conn):
+    """The hot appointment queries, built from the SQL the routes execute.
+
+    History queries are expanded over the archive when ``conn`` has one
+    attached, as they are at request time.
+    """
+    queries = {
+        "patient.dashboard:upcoming": (patient_routes.UPCOMING_SQL, (1,)),
+        "patient.dashboard:history": (patient_routes.RECENT_SQL, (1,)),
+        "doctor.dashboard:upcoming": (doctor_routes.UPCOMING_SQL, (1,)),
+        "doctor.dashboard:weekly": (doctor_routes.WEEK_SQL, (1, "2000-01-08")),
+        "admin.dashboard:upcoming": (admin_routes.UPCOMING_SQL, ()),
+        "api.doctor_appointments": (api_routes.DOCTOR_APPOINTMENTS_SQL, (1,)),
+        "live_feed.replay": (live_feed.REPLAY_SQL, (1, 0, 501)),
+        "reminders.enqueue": (
+            reminders.ENQUEUE_SQL,
+            ("2000-01-01 00:00", 0, "2000-01-02 00:00", 1000),
+        ),
+        "reminders.claim": (reminders.CLAIM_SQL, ("-300 seconds", 500)),
+        "reminders.purge": (reminders.PURGE_SQL, ("-7 days", 5000)),
+    }
+    queries.update(
+        _paged(
+            "patient.history",
+            with_archive(conn, patient_routes.HISTORY_SQL),
+            ["a.patient_id = ?"],
+            [1],
+        )
+    )
+    queries.update(
+        _paged(
+            "doctor.appointments",
+            doctor_routes.APPOINTMENTS_SQL,
+            ["a.doctor_id = ?", "a.status = ?"],
+            [1, "Booked"],
+        )
+    )
+    queries.update(
+        _paged(
+            "doctor.patient_history",
+            with_archive(conn, doctor_routes.PATIENT_HISTORY_SQL),
+            ["a.patient_id = ?"],
+            [1],
+        )
+    )
+    queries.update(_paged("admin.appointments", admin_routes.APPOINTMENTS_SQL))
+    return queries
+
+
+_FULL_SCAN = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+
+
+def explain(conn, sql, params=()):
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    return [row[3] for row in rows]
+
+
+def full_scans(plan):
+    # "SCAN a USING INDEX ..." walks an index in order and is fine; a bare
+    # "SCAN a" reads every row of the table.
+    return [step for step in plan if _FULL_SCAN.match(step.strip())]
+
+
+def check_query_plans(conn, queries=None):
+    results = {}
+    for name, (sql, params) in (queries or hot_queries(conn)).items():
+        plan = explain(conn, sql, params)
+        results[name] = {"plan": plan, "full_scans": full_scans(plan)}
+    return results
@@ -0,0 +1,284 @@
+import json
+import logging
+import os
+import threading
+
+from database import get_db
+
+log = logging.getLogger(__name__)
+
+CURSOR = "reminders"
+
+# Module-level so query_plans checks exactly what the scheduler runs.
+ENQUEUE_SQL = """
+    SELECT id, start_at, status FROM appointments
+    WHERE (start_at, id) > (?, ?) AND start_at <= ?
+    ORDER BY start_at, id
+    LIMIT ?
+"""
+CLAIM_SQL = """
+    UPDATE reminder_outbox
+    SET claimed_at = strftime('%Y-%m-%d %H:%M:%S', 'now'),
+        attempts = attempts + 1
+    WHERE id IN (
+        SELECT id FROM reminder_outbox
+        WHERE status = 'pending'
+          AND (claimed_at IS NULL
+               OR claimed_at < strftime('%Y-%m-%d %H:%M:%S', 'now', ?))
+        ORDER BY id
+        LIMIT ?
+    )
+    RETURNING id
+"""
+PURGE_SQL = """
+    DELETE FROM reminder_outbox
+    WHERE id IN (
+        SELECT id FROM reminder_outbox
+        WHERE status != 'pending'
+          AND created_at < strftime('%Y-%m-%d %H:%M:%S', 'now', ?)
+        LIMIT ?
+    )
+"""
+
+
+class FileSender:
+    """Stand-in for an SMS/e-mail gateway: appends one JSON line per reminder.
+
+    Senders receive a list of message dicts and either return normally (all
+    delivered) or raise (the batch is retried). Each message carries a stable
+    ``key``, so a receiver can drop the duplicates a crash between sending
+    and recording delivery may produce.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def send(self, messages):
+        with open(self.path, "a", encoding="utf-8") as handle:
+            for message in messages:
+                handle.write(json.dumps(message, sort_keys=True) + "\n")
+            handle.flush()
+            os.fsync(handle.fileno())
+
+
+def enqueue_due(conn, now, horizon, batch_size=1000):
+    """Queue Booked appointments starting in (``now``, ``horizon``].
+
+    Walks idx_appointments_start_at forward from the persisted (start_at, id)
+    cursor in batches, so each appointment is read once no matter how often
+    the scheduler runs. Appointments the cursor reaches only after they have
+    started (the scheduler was down) are passed over. Returns the number of
+    reminders queued.
+    """
+    queued = 0
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = conn.execute(
+                "SELECT position, last_id FROM job_cursors WHERE name = ?", (CURSOR,)
+            ).fetchone()
+            rows = conn.execute(
+                ENQUEUE_SQL,
+                (cursor["position"], cursor["last_id"], horizon, batch_size),
+            ).fetchall()
+            if not rows:
+                conn.rollback()
+                return queued
+            queued += conn.executemany(
+                """
+                INSERT OR IGNORE INTO reminder_outbox (appointment_id, start_at)
+                VALUES (?, ?)
+                """,
+                [
+                    (row["id"], row["start_at"])
+                    for row in rows
+                    if row["status"] == "Booked" and row["start_at"] > now
+                ],
+            ).rowcount
+            conn.execute(
+                """
+                UPDATE job_cursors
+                SET position = ?, last_id = ?,
+                    updated_at = strftime('%Y-%m-%d %H:%M:%S', 'now')
+                WHERE name = ?
+                """,
+                (rows[-1]["start_at"], rows[-1]["id"], CURSOR),
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+def claim_batch(conn, batch_size=500, lease_seconds=300):
+    """Lease up to ``batch_size`` pending reminders and build their messages.
+
+    A claimed row is invisible to other workers until its lease runs out,
+    so several scheduler threads or processes can share one outbox.
+    Reminders whose appointment was cancelled or moved are marked skipped.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows = conn.execute(
+            CLAIM_SQL, (f"-{int(lease_seconds)} seconds", batch_size)
+        ).fetchall()
+        ids = json.dumps([row["id"] for row in rows])
+        messages = [
+            {
+                "key": f"{row['appointment_id']}@{row['start_at']}",
+                "outbox_id": row["id"],
+                "appointment_id": row["appointment_id"],
+                "start_at": row["start_at"],
+                "patient_name": row["patient_name"],
+                "contact": row["contact"],
+                "email": row["email"],
+                "doctor_name": row["doctor_name"],
+            }
+            for row in conn.execute(
+                """
+                SELECT o.id, o.appointment_id, o.start_at,
+                       p.full_name AS patient_name, p.contact, u.email,
+                       d.full_name AS doctor_name
+                FROM reminder_outbox o
+                JOIN appointments a
+                  ON a.id = o.appointment_id
+                 AND a.start_at = o.start_at
+                 AND a.status = 'Booked'
+                JOIN patients p ON p.id = a.patient_id
+                JOIN users u ON u.id = p.user_id
+                JOIN doctors d ON d.id = a.doctor_id
+                WHERE o.id IN (SELECT value FROM json_each(?))
+                ORDER BY o.id
+                """,
+                (ids,),
+            )
+        ]
+        live = json.dumps([message["outbox_id"] for message in messages])
+        conn.execute(
+            """
+            UPDATE reminder_outbox SET status = 'skipped'
+            WHERE id IN (SELECT value FROM json_each(?))
+              AND id NOT IN (SELECT value FROM json_each(?))
+            """,
+            (ids, live),
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return messages
+
+
+def record_delivery(conn, messages, error=None, max_attempts=5):
+    ids = json.dumps([message["outbox_id"] for message in messages])
+    if error is None:
+        conn.execute(
+            """
+            UPDATE reminder_outbox
+            SET status = 'sent', sent_at = strftime('%Y-%m-%d %H:%M:%S', 'now')
+            WHERE id IN (SELECT value FROM json_each(?)) AND status = 'pending'
+            """,
+            (ids,),
+        )
+    else:
+        # Leave the rows pending with an expired lease so the next run
+        # retries them, until they run out of attempts.
+        conn.execute(
+            """
+            UPDATE reminder_outbox
+            SET last_error = ?, claimed_at = NULL,
+                status = CASE WHEN attempts >= ? THEN 'failed' ELSE status END
+            WHERE id IN (SELECT value FROM json_each(?)) AND status = 'pending'
+            """,
+            (str(error)[:500], max_attempts, ids),
+        )
+    conn.commit()
+
+
+def purge_done(conn, keep_days=7, batch_size=5000):
+    cursor = conn.execute(PURGE_SQL, (f"-{int(keep_days)} days", batch_size))
+    conn.commit()
+    return cursor.rowcount
+
+
+def run_once(app, sender=None):
+    """One scheduler tick: queue, deliver in batches, purge. Returns counts.
+
+    Each phase runs in its own app context so the writer connection goes
+    back to the pool while the sender is busy.
+    """
+    config = app.config
+    sender = sender or app.extensions["reminder_sender"]
+    stats = {"queued": 0, "sent": 0, "failed": 0, "purged": 0}
+
+    with app.app_context():
+        conn = get_db()
+        now, horizon = conn.execute(
+            "SELECT strftime('%Y-%m-%d %H:%M', 'now'),"
+            " strftime('%Y-%m-%d %H:%M', 'now', ?)",
+            (f"+{int(config['REMINDER_LEAD_MINUTES'])} minutes",),
+        ).fetchone()
+        stats["queued"] = enqueue_due(conn, now, horizon, config["REMINDER_BATCH_SIZE"])
+
+    while True:
+        with app.app_context():
+            messages = claim_batch(
+                get_db(), config["REMINDER_BATCH_SIZE"], config["REMINDER_LEASE_SECONDS"]
+            )
+        if not messages:
+            break
+        error = None
+        try:
+            sender.send(messages)
+        except Exception as exc:  # any sender failure means retry later
+            log.warning("reminder batch of %d failed: %s", len(messages), exc)
+            error = exc
+        with app.app_context():
+            record_delivery(get_db(), messages, error, config["REMINDER_MAX_ATTEMPTS"])
+        if error is not None:
+            stats["failed"] += len(messages)
+            break
+        stats["sent"] += len(messages)
+
+    with app.app_context():
+        stats["purged"] = purge_done(get_db(), config["REMINDER_RETENTION_DAYS"])
+    return stats
+
+
+class ReminderScheduler:
+    def __init__(self, app, interval=60.0):
+        self.app = app
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._loop, name="reminder-scheduler", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                run_once(self.app)
+            except Exception:
+                log.exception("reminder tick failed")
+            self._stop.wait(self.interval)
+
+
+def init_reminders(app):
+    sender = app.config["REMINDER_SENDER"] or FileSender(app.config["REMINDER_OUTBOX_FILE"])
+    app.extensions["reminder_sender"] = sender
+    scheduler = ReminderScheduler(app, app.config["REMINDER_INTERVAL"])
+    app.extensions["reminder_scheduler"] = scheduler
+    if app.config["REMINDERS_ENABLED"]:
+        scheduler.start()
+    return scheduler
@@ -0,0 +1,225 @@
+from datetime import date, timedelta
+
+MAX_RANGE_DAYS = 731
+
+_COUNTS = ("total", "booked", "completed", "cancelled", "pending")
+_STATUS_COLUMNS = {
+    "booked": "Booked",
+    "completed": "Completed",
+    "cancelled": "Cancelled",
+    "pending": "PendingApproval",
+}
+
+
+def rollup_statements(source, sign=1):
+    """Upserts adding ``sign`` x the rows of ``source`` to the rollups.
+
+    ``source`` is a table expression with date, doctor_id and status columns:
+    a single NEW/OLD row in the triggers, an archive batch, or a whole table
+    when rebuilding. Appointments count on the day they are scheduled for,
+    under their doctor's department at the time of the write. Per-doctor
+    numbers are also kept per month so a year-long report reads twelve rows
+    per doctor instead of 365.
+    """
+    sums = ", ".join(
+        [f"{int(sign)} * COUNT(*)"]
+        + [
+            f"{int(sign)} * SUM(r.status = '{status}')"
+            for status in _STATUS_COLUMNS.values()
+        ]
+    )
+    columns = ", ".join(_COUNTS)
+    updates = ", ".join(f"{name} = {name} + excluded.{name}" for name in _COUNTS)
+    return [
+        f"""
+        INSERT INTO daily_doctor_stats (day, doctor_id, {columns})
+        SELECT r.date, r.doctor_id, {sums}
+        FROM {source} r
+        WHERE true
+        GROUP BY r.date, r.doctor_id
+        ON CONFLICT (day, doctor_id) DO UPDATE SET {updates}
+        """,
+        f"""
+        INSERT INTO monthly_doctor_stats (month, doctor_id, {columns})
+        SELECT substr(r.date, 1, 7), r.doctor_id, {sums}
+        FROM {source} r
+        WHERE true
+        GROUP BY substr(r.date, 1, 7), r.doctor_id
+        ON CONFLICT (month, doctor_id) DO UPDATE SET {updates}
+        """,
+        f"""
+        INSERT INTO daily_department_stats (day, department_id, {columns})
+        SELECT r.date, COALESCE(d.department_id, 0), {sums}
+        FROM {source} r
+        LEFT JOIN doctors d ON d.id = r.doctor_id
+        WHERE true
+        GROUP BY r.date, COALESCE(d.department_id, 0)
+        ON CONFLICT (day, department_id) DO UPDATE SET {updates}
+        """,
+    ]
+
+
+def row_source(row):
+    # One NEW/OLD trigger row as a rollup_statements() source.
+    return (
+        f"(SELECT {row}.date AS date, {row}.doctor_id AS doctor_id,"
+        f" {row}.status AS status)"
+    )
+
+
+def rebuild_rollups(conn, appointments="appointments"):
+    conn.execute("DELETE FROM daily_doctor_stats")
+    conn.execute("DELETE FROM monthly_doctor_stats")
+    conn.execute("DELETE FROM daily_department_stats")
+    for statement in rollup_statements(appointments):
+        conn.execute(statement)
+
+
+def parse_range(args):
+    today = date.today()
+    try:
+        date_to = date.fromisoformat(args.get("to", ""))
+    except ValueError:
+        date_to = today
+    try:
+        date_from = date.fromisoformat(args.get("from", ""))
+    except ValueError:
+        date_from = date_to - timedelta(days=29)
+    date_from = max(date_from, date_to - timedelta(days=MAX_RANGE_DAYS - 1))
+    return min(date_from, date_to).isoformat(), date_to.isoformat()
+
+
+def _with_rates(row):
+    item = dict(row)
+    total = item["total"] or 0
+    item["completion_rate"] = round(item["completed"] / total, 4) if total else None
+    item["cancellation_rate"] = round(item["cancelled"] / total, 4) if total else None
+    return item
+
+
+def department_summary(conn, date_from, date_to):
+    return [
+        _with_rates(row)
+        for row in conn.execute(
+            """
+            SELECT s.department_id, COALESCE(dept.name, 'Unassigned') AS department,
+                   SUM(s.total) AS total, SUM(s.booked) AS booked,
+                   SUM(s.completed) AS completed, SUM(s.cancelled) AS cancelled,
+                   SUM(s.pending) AS pending
+            FROM daily_department_stats s
+            LEFT JOIN departments dept ON dept.id = s.department_id
+            WHERE s.day >= ? AND s.day <= ?
+            GROUP BY s.department_id
+            HAVING SUM(s.total) > 0
+            ORDER BY total DESC
+            """,
+            (date_from, date_to),
+        )
+    ]
+
+
+def _whole_months(date_from, date_to):
+    # The calendar months lying entirely inside [date_from, date_to], as
+    # (first month, last month, their first day, the day after), or None.
+    start, end = date.fromisoformat(date_from), date.fromisoformat(date_to)
+    first = start.replace(day=1)
+    if first < start:
+        first = (first + timedelta(days=32)).replace(day=1)
+    after = (end + timedelta(days=1)).replace(day=1)
+    if first >= after:
+        return None
+    last = after - timedelta(days=1)
+    return first.isoformat()[:7], last.isoformat()[:7], first.isoformat(), after.isoformat()
+
+
+def doctor_summary(conn, date_from, date_to, department_id=None, limit=50):
+    months = _whole_months(date_from, date_to)
+    if months:
+        month_from, month_to, first, after = months
+        arms = [
+            ("monthly_doctor_stats", "month >= ? AND month <= ?", [month_from, month_to]),
+            ("daily_doctor_stats", "day >= ? AND day < ?", [date_from, first]),
+            ("daily_doctor_stats", "day >= ? AND day <= ?", [after, date_to]),
+        ]
+    else:
+        arms = [("daily_doctor_stats", "day >= ? AND day <= ?", [date_from, date_to])]
+
+    parts, params = [], []
+    for table, clause, arm_params in arms:
+        if department_id is not None:
+            clause += " AND doctor_id IN (SELECT id FROM doctors WHERE department_id = ?)"
+            arm_params = arm_params + [department_id]
+        parts.append(
+            "SELECT doctor_id, total, booked, completed, cancelled, pending"
+            f" FROM {table} WHERE {clause}"
+        )
+        params.extend(arm_params)
+    source = " UNION ALL ".join(parts)
+
+    # Aggregate first and join doctors once per doctor, not once per row.
+    return [
+        _with_rates(row)
+        for row in conn.execute(
+            f"""
+            SELECT s.*, d.full_name AS doctor, d.department_id
+            FROM (
+                SELECT doctor_id, SUM(total) AS total, SUM(booked) AS booked,
+                       SUM(completed) AS completed, SUM(cancelled) AS cancelled,
+                       SUM(pending) AS pending
+                FROM ({source})
+                GROUP BY doctor_id
+                HAVING SUM(total) > 0
+            ) s
+            LEFT JOIN doctors d ON d.id = s.doctor_id
+            ORDER BY s.total DESC, s.doctor_id
+            LIMIT ?
+            """,
+            params + [limit],
+        )
+    ]
+
+
+def daily_series(conn, date_from, date_to, department_id=None, doctor_id=None):
+    if doctor_id is not None:
+        table, clause, params = "daily_doctor_stats", "doctor_id = ?", [doctor_id]
+    elif department_id is not None:
+        table, clause, params = "daily_department_stats", "department_id = ?", [
+            department_id
+        ]
+    else:
+        table, clause, params = "daily_department_stats", "1", []
+    return [
+        _with_rates(row)
+        for row in conn.execute(
+            f"""
+            SELECT day, SUM(total) AS total, SUM(booked) AS booked,
+                   SUM(completed) AS completed, SUM(cancelled) AS cancelled,
+                   SUM(pending) AS pending
+            FROM {table}
+            WHERE day >= ? AND day <= ? AND {clause}
+            GROUP BY day
+            ORDER BY day
+            """,
+            [date_from, date_to] + params,
+        )
+    ]
+
+
+def pending_backlog(conn):
+    rows = conn.execute(
+        """
+        SELECT s.department_id, COALESCE(dept.name, 'Unassigned') AS department,
+               SUM(s.pending) AS pending,
+               MIN(s.day) AS oldest_day
+        FROM daily_department_stats s
+        LEFT JOIN departments dept ON dept.id = s.department_id
+        WHERE s.pending != 0
+        GROUP BY s.department_id
+        HAVING SUM(s.pending) > 0
+        ORDER BY pending DESC
+        """
+    ).fetchall()
+    return {
+        "pending": sum(row["pending"] for row in rows),
+        "by_department": [dict(row) for row in rows],
+    }
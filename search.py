@@ -0,0 +1,73 @@
+import re
+
+from flask import current_app
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def result_limit():
+    return current_app.config.get("SEARCH_RESULT_LIMIT", 50)
+
+
+def fts_query(text, columns=None):
+    # Every word becomes a quoted prefix term, so user input can never be
+    # parsed as FTS5 syntax; terms are ANDed together.
+    terms = [f'"{token}"*' for token in _TOKEN.findall(text or "")]
+    if not terms:
+        return None
+    query = " ".join(terms)
+    if columns:
+        return f"{{{' '.join(columns)}}} : ({query})"
+    return query
+
+
+def search_doctors(conn, text, columns=None, include_blacklisted=True, limit=None):
+    limit = limit or result_limit()
+    blacklist_clause = "" if include_blacklisted else "AND d.is_blacklisted = 0"
+    match = fts_query(text, columns)
+    if match is None:
+        return conn.execute(
+            f"""
+            SELECT d.*, dept.name AS department_name
+            FROM doctors d
+            LEFT JOIN departments dept ON d.department_id = dept.id
+            WHERE 1 = 1 {blacklist_clause}
+            ORDER BY d.full_name
+            LIMIT ?
+            """,
+            (limit,),
+        ).fetchall()
+
+    return conn.execute(
+        f"""
+        SELECT d.*, dept.name AS department_name
+        FROM doctor_search s
+        JOIN doctors d ON d.id = s.rowid
+        LEFT JOIN departments dept ON d.department_id = dept.id
+        WHERE doctor_search MATCH ? {blacklist_clause}
+        ORDER BY bm25(doctor_search, 10.0, 5.0, 2.0)
+        LIMIT ?
+        """,
+        (match, limit),
+    ).fetchall()
+
+
+def search_patients(conn, text, limit=None):
+    limit = limit or result_limit()
+    match = fts_query(text)
+    if match is None:
+        return conn.execute(
+            "SELECT * FROM patients ORDER BY full_name LIMIT ?", (limit,)
+        ).fetchall()
+
+    return conn.execute(
+        """
+        SELECT p.*
+        FROM patient_search s
+        JOIN patients p ON p.id = s.rowid
+        WHERE patient_search MATCH ?
+        ORDER BY bm25(patient_search, 10.0, 5.0, 20.0)
+        LIMIT ?
+        """,
+        (match, limit),
+    ).fetchall()
@@ -0,0 +1,177 @@
+import heapq
+import json
+import threading
+from datetime import date, datetime, timedelta
+
+MAX_WINDOW_DAYS = 60
+
+
+class DayBitmap:
+    """A doctor's published start times for one day plus a free-slot mask.
+
+    Bit i of ``free`` is set while ``times[i]`` still has capacity left.
+    """
+
+    __slots__ = ("times", "free")
+
+    def __init__(self, times, free):
+        self.times = times
+        self.free = free
+
+    def free_times(self, after=None):
+        mask, index = self.free, 0
+        while mask:
+            if mask & 1 and (after is None or self.times[index] > after):
+                yield self.times[index]
+            mask >>= 1
+            index += 1
+
+
+class OccupancyIndex:
+    # Per-process cache of per-doctor-per-day bitmaps. Each doctor's entry
+    # remembers the 'doctor:<id>' data version (bumped by triggers on
+    # doctor_slots and appointments) it was built at, so a search only
+    # reloads doctors whose schedule changed, in one batched query.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._doctors = {}
+
+    def _stale(self, doctors, date_from, date_to):
+        with self._lock:
+            stale = []
+            for doctor in doctors:
+                entry = self._doctors.get(doctor["id"])
+                if (
+                    entry is None
+                    or entry["version"] != doctor["version"]
+                    or entry["from"] > date_from
+                    or entry["to"] < date_to
+                ):
+                    stale.append(doctor)
+            return stale
+
+    def _load(self, conn, doctors, date_from, date_to):
+        days = {doctor["id"]: {} for doctor in doctors}
+        for row in conn.execute(
+            """
+            SELECT s.doctor_id, s.start_at, s.capacity - COUNT(a.id) AS remaining
+            FROM doctor_slots s
+            LEFT JOIN appointments a
+              ON a.doctor_id = s.doctor_id
+             AND a.start_at = s.start_at
+             AND a.status != 'Cancelled'
+            WHERE s.doctor_id IN (SELECT value FROM json_each(?))
+              AND s.start_at >= ? AND s.start_at < date(?, '+1 day')
+            GROUP BY s.id
+            ORDER BY s.doctor_id, s.start_at
+            """,
+            (json.dumps(list(days)), date_from, date_to),
+        ):
+            day, time_ = row["start_at"].split(" ")
+            times, free = days[row["doctor_id"]].get(day, ((), 0))
+            if row["remaining"] > 0:
+                free |= 1 << len(times)
+            days[row["doctor_id"]][day] = (times + (time_,), free)
+
+        with self._lock:
+            for doctor in doctors:
+                self._doctors[doctor["id"]] = {
+                    "version": doctor["version"],
+                    "from": date_from,
+                    "to": date_to,
+                    "days": {
+                        day: DayBitmap(times, free)
+                        for day, (times, free) in days[doctor["id"]].items()
+                    },
+                }
+
+    def bitmaps(self, conn, doctors, date_from, date_to):
+        stale = self._stale(doctors, date_from, date_to)
+        if stale:
+            self._load(conn, stale, date_from, date_to)
+        with self._lock:
+            return {doctor["id"]: self._doctors[doctor["id"]]["days"] for doctor in doctors}
+
+    def clear(self):
+        with self._lock:
+            self._doctors.clear()
+
+
+def candidate_doctors(conn, department_id=None, specialization=None):
+    clauses, params = ["d.is_blacklisted = 0"], []
+    if department_id:
+        clauses.append("d.department_id = ?")
+        params.append(department_id)
+    if specialization:
+        clauses.append("d.specialization = ? COLLATE NOCASE")
+        params.append(specialization.strip())
+    return conn.execute(
+        f"""
+        SELECT d.id, d.full_name, d.specialization, dept.name AS department_name,
+               COALESCE(c.value, 0) AS version
+        FROM doctors d
+        LEFT JOIN departments dept ON d.department_id = dept.id
+        LEFT JOIN counters c ON c.scope = 'version' AND c.key = 'doctor:' || d.id
+        WHERE {' AND '.join(clauses)}
+        """,
+        params,
+    ).fetchall()
+
+
+def find_next_slots(
+    conn,
+    index,
+    department_id=None,
+    specialization=None,
+    date_from=None,
+    days=30,
+    limit=10,
+    now=None,
+):
+    now = now or datetime.utcnow()
+    start = max(date_from or now.date(), now.date())
+    days = max(1, min(days, MAX_WINDOW_DAYS))
+    window = [(start + timedelta(days=n)).isoformat() for n in range(days)]
+
+    doctors = candidate_doctors(conn, department_id, specialization)
+    if not doctors:
+        return []
+    by_id = {doctor["id"]: doctor for doctor in doctors}
+    bitmaps = index.bitmaps(conn, doctors, window[0], window[-1])
+
+    today, current_time = now.date().isoformat(), now.strftime("%H:%M")
+    found = []
+    for day in window:
+        after = current_time if day == today else None
+        candidates = (
+            (time_, doctor_id)
+            for doctor_id, doctor_days in bitmaps.items()
+            if day in doctor_days
+            for time_ in doctor_days[day].free_times(after)
+        )
+        for time_, doctor_id in heapq.nsmallest(limit - len(found), candidates):
+            doctor = by_id[doctor_id]
+            found.append(
+                {
+                    "doctor_id": doctor_id,
+                    "doctor_name": doctor["full_name"],
+                    "specialization": doctor["specialization"],
+                    "department": doctor["department_name"],
+                    "date": day,
+                    "time": time_,
+                    "start_at": f"{day} {time_}",
+                }
+            )
+        if len(found) >= limit:
+            break
+    return found
+
+
+def parse_window(args):
+    try:
+        date_from = date.fromisoformat(args.get("from", ""))
+    except ValueError:
+        date_from = None
+    days = args.get("days", 30, type=int) or 30
+    limit = max(1, min(args.get("limit", 10, type=int) or 10, 100))
+    return date_from, days, limit
@@ -0,0 +1,117 @@
+from datetime import datetime
+
+
+def slot_start(day, time):
+    try:
+        start = datetime.fromisoformat(f"{day.strip()}T{time.strip()}")
+    except (AttributeError, ValueError):
+        return None
+    return start.strftime("%Y-%m-%d %H:%M")
+
+
+def list_slots(conn, doctor_id, date_from=None, date_to=None):
+    query = "SELECT * FROM doctor_slots WHERE doctor_id = ?"
+    params = [doctor_id]
+    if date_from:
+        query += " AND start_at >= ?"
+        params.append(date_from)
+    if date_to:
+        query += " AND start_at < date(?, '+1 day')"
+        params.append(date_to)
+    query += " ORDER BY start_at"
+    return conn.execute(query, params).fetchall()
+
+
+def group_slots(rows):
+    # {day: [time, ...]} from list_slots() rows, for callers that need both.
+    availability = {}
+    for row in rows:
+        day, time = row["start_at"].split(" ")
+        availability.setdefault(day, []).append(time)
+    return availability
+
+
+def load_slots(conn, doctor_id, date_from=None, date_to=None):
+    return group_slots(list_slots(conn, doctor_id, date_from, date_to))
+
+
+def add_slot(conn, doctor_id, day, time, duration_minutes=30, capacity=1):
+    start_at = slot_start(day, time)
+    if not start_at:
+        return False
+    cursor = conn.execute(
+        """
+        INSERT OR IGNORE INTO doctor_slots (doctor_id, start_at, duration_minutes, capacity)
+        VALUES (?, ?, ?, ?)
+        """,
+        (doctor_id, start_at, duration_minutes, capacity),
+    )
+    return cursor.rowcount > 0
+
+
+def remove_slot(conn, doctor_id, slot_id):
+    cursor = conn.execute(
+        "DELETE FROM doctor_slots WHERE id = ? AND doctor_id = ?", (slot_id, doctor_id)
+    )
+    return cursor.rowcount > 0
+
+
+def set_day_slots(conn, doctor_id, day, times):
+    wanted = {start for start in (slot_start(day, t) for t in times) if start}
+    existing = {
+        row["start_at"]
+        for row in conn.execute(
+            """
+            SELECT start_at FROM doctor_slots
+            WHERE doctor_id = ? AND start_at >= ? AND start_at < date(?, '+1 day')
+            """,
+            (doctor_id, day, day),
+        )
+    }
+    removed = existing - wanted
+    added = wanted - existing
+    conn.executemany(
+        "DELETE FROM doctor_slots WHERE doctor_id = ? AND start_at = ?",
+        [(doctor_id, start) for start in removed],
+    )
+    conn.executemany(
+        "INSERT OR IGNORE INTO doctor_slots (doctor_id, start_at) VALUES (?, ?)",
+        [(doctor_id, start) for start in added],
+    )
+    return len(added), len(removed)
+
+
+def check_slot(conn, doctor_id, start_at):
+    # One indexed probe answers both "has a published schedule" and "is this
+    # start time in it" via the UNIQUE(doctor_id, start_at) index.
+    row = conn.execute(
+        """
+        SELECT
+            EXISTS (SELECT 1 FROM doctor_slots WHERE doctor_id = ?) AS has_slots,
+            EXISTS (
+                SELECT 1 FROM doctor_slots WHERE doctor_id = ? AND start_at = ?
+            ) AS in_schedule
+        """,
+        (doctor_id, doctor_id, start_at),
+    ).fetchone()
+    return bool(row["has_slots"]), bool(row["in_schedule"])
+
+
+def free_slots(conn, doctor_id, date_from, date_to):
+    return conn.execute(
+        """
+        SELECT s.id, s.start_at, s.duration_minutes, s.capacity,
+               s.capacity - COUNT(a.id) AS remaining
+        FROM doctor_slots s
+        LEFT JOIN appointments a
+          ON a.doctor_id = s.doctor_id
+         AND a.start_at = s.start_at
+         AND a.status != 'Cancelled'
+        WHERE s.doctor_id = ?
+          AND s.start_at >= ? AND s.start_at < date(?, '+1 day')
+        GROUP BY s.id
+        HAVING remaining > 0
+        ORDER BY s.start_at
+        """,
+        (doctor_id, date_from, date_to),
+    ).fetchall()
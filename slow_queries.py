@@ -0,0 +1,163 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+from flask import g, request
+
+from metrics import QueryStats
+from query_plans import explain, full_scans
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+def normalize_sql(sql):
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = " ".join(sql.split())
+    return _PLACEHOLDER_LIST.sub("(?, ...)", sql)
+
+
+def _is_many(params):
+    # executemany() hands over a one-element list holding the first row.
+    return (
+        not isinstance(params, dict)
+        and bool(params)
+        and isinstance(params[0], (list, tuple, dict))
+    )
+
+
+def params_shape(params):
+    # Types only: parameter values are patient data and never hit the log.
+    if isinstance(params, dict):
+        return {key: type(value).__name__ for key, value in params.items()}
+    if _is_many(params):
+        return ["many", params_shape(params[0])]
+    return [type(value).__name__ for value in params]
+
+
+class SlowQueryLog:
+    def __init__(self, path, threshold_ms=100, max_bytes=5 * 1024 * 1024, backups=3):
+        self.path = path
+        self.threshold = threshold_ms / 1000
+        self.backups = backups
+        self._plans = {}
+        self._lock = threading.Lock()
+        # Each worker appends whole JSON lines; rotation is per process, so
+        # an occasional line may straddle files under several workers.
+        handler = RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backups, delay=True
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        self._logger = logging.getLogger(f"hms.slow_queries.{path}")
+        self._logger.handlers[:] = [handler]
+        self._logger.setLevel(logging.INFO)
+        self._logger.propagate = False
+
+    def _plan(self, conn, normalized, sql, params):
+        with self._lock:
+            plan = self._plans.get(normalized)
+        if plan is not None:
+            return plan
+        plan = []
+        if sql.lstrip().upper().startswith(_EXPLAINABLE):
+            try:
+                plan = explain(conn, sql, params[0] if _is_many(params) else params)
+            except sqlite3.Error:
+                plan = []
+        with self._lock:
+            if len(self._plans) >= 512:
+                self._plans.clear()
+            self._plans[normalized] = plan
+        return plan
+
+    def record(self, conn, sql, params, seconds, route):
+        if seconds < self.threshold:
+            return
+        normalized = normalize_sql(sql)
+        plan = self._plan(conn, normalized, sql, params)
+        entry = {
+            "at": datetime.now().isoformat(timespec="seconds"),
+            "route": route,
+            "sql": normalized,
+            "params": params_shape(params),
+            "ms": round(seconds * 1000, 3),
+            "plan": plan,
+            "full_scans": full_scans(plan),
+        }
+        self._logger.info(json.dumps(entry))
+
+    def entries(self):
+        paths = [f"{self.path}.{n}" for n in range(self.backups, 0, -1)]
+        for path in paths + [self.path]:
+            if not os.path.exists(path):
+                continue
+            with open(path, encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+
+    def summary(self):
+        grouped = {}
+        for entry in self.entries():
+            item = grouped.setdefault(
+                entry["sql"],
+                {
+                    "sql": entry["sql"],
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "routes": set(),
+                },
+            )
+            item["count"] += 1
+            item["total_ms"] += entry["ms"]
+            item["max_ms"] = max(item["max_ms"], entry["ms"])
+            item["routes"].add(entry["route"])
+            item.update(
+                last_at=entry["at"],
+                params=entry["params"],
+                plan=entry["plan"],
+                full_scans=entry["full_scans"],
+            )
+        for item in grouped.values():
+            item["mean_ms"] = item["total_ms"] / item["count"]
+            item["routes"] = sorted(item["routes"])
+        return sorted(grouped.values(), key=lambda item: item["total_ms"], reverse=True)
+
+
+def init_slow_query_log(app):
+    log = SlowQueryLog(
+        app.config["SLOW_QUERY_LOG_FILE"],
+        threshold_ms=app.config.get("SLOW_QUERY_THRESHOLD_MS", 100),
+        max_bytes=app.config.get("SLOW_QUERY_LOG_MAX_BYTES", 5 * 1024 * 1024),
+        backups=app.config.get("SLOW_QUERY_LOG_BACKUPS", 3),
+    )
+    app.extensions["slow_query_log"] = log
+
+    @app.before_request
+    def watch_statements():
+        route = request.endpoint or "unmatched"
+        stats = g.setdefault("query_stats", QueryStats())
+        stats.on_statement = lambda conn, sql, params, seconds: log.record(
+            conn, sql, params, seconds, route
+        )
+
+    @app.teardown_request
+    def flush_statements(exc=None):
+        # Statements read with a single fetchone() are never exhausted, so
+        # record whatever is still open before the connection goes back.
+        stats = g.get("query_stats")
+        if stats is not None:
+            stats.finish()
+
+    return log
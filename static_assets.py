@@ -0,0 +1,115 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+
+from flask import Response, current_app, request, url_for
+
+try:
+    import brotli
+except ImportError:  # optional; gzip alone covers every browser
+    brotli = None
+
+COMPRESSIBLE = {".css", ".js", ".mjs", ".json", ".svg", ".txt", ".html", ".xml", ".map"}
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+class Asset:
+    def __init__(self, path, fingerprinted, digest, body, encodings):
+        self.path = path
+        self.fingerprinted = fingerprinted
+        self.digest = digest
+        self.body = body
+        self.encodings = encodings  # {"br": bytes, "gzip": bytes}
+        self.mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+
+def _compress(body):
+    variants = {}
+    if brotli is not None:
+        variants["br"] = brotli.compress(body, quality=11)
+    variants["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+    # A variant that doesn't save anything is just extra bytes to keep.
+    return {name: data for name, data in variants.items() if len(data) < len(body)}
+
+
+class AssetManifest:
+    """Content-hashed names for the files under ``static/``, built at startup.
+
+    ``css/style.css`` is published as ``css/style.<hash>.css``; a new
+    deploy that changes the file changes its URL, so the old one can be
+    cached forever. Compressed variants are built once here, not per request.
+    """
+
+    def __init__(self, root, max_bytes=2 * 1024 * 1024):
+        self.root = root
+        self.by_path = {}
+        self.by_fingerprint = {}
+        for folder, _, names in os.walk(root):
+            for name in sorted(names):
+                full = os.path.join(folder, name)
+                if os.path.getsize(full) > max_bytes:
+                    continue  # left to the plain static handler
+                path = os.path.relpath(full, root).replace(os.sep, "/")
+                with open(full, "rb") as handle:
+                    body = handle.read()
+                digest = hashlib.sha256(body).hexdigest()[:12]
+                stem, ext = os.path.splitext(path)
+                encodings = _compress(body) if ext.lower() in COMPRESSIBLE else {}
+                asset = Asset(path, f"{stem}.{digest}{ext}", digest, body, encodings)
+                self.by_path[path] = asset
+                self.by_fingerprint[asset.fingerprinted] = asset
+
+    def url_name(self, filename):
+        asset = self.by_path.get(filename.lstrip("/"))
+        return asset.fingerprinted if asset else filename
+
+
+def asset_url(endpoint, **values):
+    # Drop-in for url_for() in templates: static files get their
+    # fingerprinted name, every other endpoint is passed through.
+    manifest = current_app.extensions.get("asset_manifest")
+    if endpoint == "static" and manifest is not None and "filename" in values:
+        values["filename"] = manifest.url_name(values["filename"])
+    return url_for(endpoint, **values)
+
+
+def _negotiate(asset):
+    for encoding in ("br", "gzip"):
+        if encoding in asset.encodings and request.accept_encodings[encoding]:
+            return encoding
+    return None
+
+
+def serve_asset(app, fallback):
+    manifest = app.extensions["asset_manifest"]
+
+    def static(filename):
+        asset = manifest.by_fingerprint.get(filename)
+        if asset is None:
+            return fallback(filename=filename)
+        encoding = _negotiate(asset)
+        etag = f"{asset.digest}-{encoding}" if encoding else asset.digest
+        headers = {"Cache-Control": IMMUTABLE, "ETag": f'"{etag}"'}
+        if asset.encodings:
+            headers["Vary"] = "Accept-Encoding"
+        if request.if_none_match.contains(etag):
+            return Response(status=304, headers=headers)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        body = asset.encodings[encoding] if encoding else asset.body
+        return Response(body, mimetype=asset.mimetype, headers=headers)
+
+    return static
+
+
+def init_assets(app):
+    app.jinja_env.globals["asset_url"] = asset_url
+    if not app.config["STATIC_FINGERPRINT"]:
+        return None
+    manifest = AssetManifest(app.static_folder)
+    app.extensions["asset_manifest"] = manifest
+    # Keep the "static" endpoint so url_for('static', ...) still resolves;
+    # unknown names fall through to Flask's own handler.
+    app.view_functions["static"] = serve_asset(app, app.view_functions["static"])
+    return manifest
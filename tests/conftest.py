@@ -0,0 +1,163 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from archive import init_archive  # noqa: E402
+from db_pool import ConnectionPool  # noqa: E402
+from migrations import migrate  # noqa: E402
+
+
+@pytest.fixture
+def pool(tmp_path):
+    # A freshly migrated database with an (empty) archive attached, as the
+    # app runs by default.
+    pool = ConnectionPool(
+        str(tmp_path / "hms.db"),
+        max_size=32,
+        attach={"archive": str(tmp_path / "hms-archive.db")},
+    )
+    conn = pool.acquire()
+    init_archive(conn)
+    migrate(conn)
+    pool.release(conn)
+    yield pool
+    pool.close_all()
+
+
+@pytest.fixture
+def conn(pool):
+    conn = pool.acquire()
+    yield conn
+    pool.release(conn)
+
+
+@pytest.fixture
+def clinic(conn):
+    conn.execute(
+        "INSERT INTO users (username, email, password_hash, role)"
+        " VALUES ('doc', 'doc@example.com', '-', 'doctor')"
+    )
+    conn.execute(
+        "INSERT INTO doctors (user_id, full_name, specialization)"
+        " SELECT id, 'Test Doctor', 'General' FROM users WHERE username = 'doc'"
+    )
+    conn.executemany(
+        "INSERT INTO users (username, email, password_hash, role)"
+        " VALUES (?, ?, '-', 'patient')",
+        [(f"p{i}", f"p{i}@example.com") for i in range(16)],
+    )
+    conn.execute(
+        "INSERT INTO patients (user_id, full_name)"
+        " SELECT id, username FROM users WHERE role = 'patient'"
+    )
+    conn.commit()
+    doctor = conn.execute("SELECT id FROM doctors").fetchone()[0]
+    patients = [row[0] for row in conn.execute("SELECT id FROM patients ORDER BY id")]
+    return doctor, patients
+
+
+@pytest.fixture
+def hospital(conn):
+    # Two departments, three doctors and a spread of past and future activity:
+    # bookings, cancellations, a reschedule, an approval, a bulk reassignment,
+    # a deletion and an archive run.
+    from archive import archive_appointments
+    from booking import book_appointment
+    from bulk_ops import reassign_future, review_pending
+
+    conn.executemany(
+        "INSERT INTO departments (name) VALUES (?)", [("Heart",), ("Brain",)]
+    )
+    for n, department in enumerate(["Heart", "Heart", "Brain"]):
+        conn.execute(
+            "INSERT INTO users (username, email, password_hash, role)"
+            " VALUES (?, ?, '-', 'doctor')",
+            (f"doc{n}", f"doc{n}@example.com"),
+        )
+        conn.execute(
+            """
+            INSERT INTO doctors (user_id, full_name, specialization, department_id)
+            SELECT u.id, ?, 'General', dept.id FROM users u, departments dept
+            WHERE u.username = ? AND dept.name = ?
+            """,
+            (f"Doctor {n}", f"doc{n}", department),
+        )
+    conn.executemany(
+        "INSERT INTO users (username, email, password_hash, role)"
+        " VALUES (?, ?, '-', 'patient')",
+        [(f"p{n}", f"p{n}@example.com") for n in range(8)],
+    )
+    conn.execute(
+        "INSERT INTO patients (user_id, full_name)"
+        " SELECT id, username FROM users WHERE role = 'patient'"
+    )
+    conn.commit()
+    doctors = [row[0] for row in conn.execute("SELECT id FROM doctors ORDER BY id")]
+    patients = [row[0] for row in conn.execute("SELECT id FROM patients ORDER BY id")]
+
+    def book(patient, doctor, day, time_, **kwargs):
+        return book_appointment(
+            conn, patients[patient], doctors[doctor], day, time_, **kwargs
+        ).appointment_id
+
+    def set_status(appointment_id, status):
+        conn.execute(
+            "UPDATE appointments SET status = ? WHERE id = ?", (status, appointment_id)
+        )
+        conn.commit()
+
+    for n in range(12):
+        past = book(n % 8, n % 3, f"2020-01-{n % 4 + 1:02d}", f"{9 + n // 4:02d}:00")
+        set_status(past, "Cancelled" if n % 5 == 0 else "Completed")
+    conn.execute(
+        "INSERT INTO treatments (appointment_id, diagnosis)"
+        " SELECT id, 'Checkup' FROM appointments WHERE status = 'Completed'"
+    )
+    conn.commit()
+
+    future = [book(n, 0, "2030-01-01", f"{9 + n:02d}:00") for n in range(6)]
+    book(6, 1, "2030-01-01", "09:00")
+    set_status(future[1], "Cancelled")
+    book(2, 0, "2030-01-02", "09:00", appointment_id=future[2])
+    conn.execute(
+        "INSERT INTO doctor_slots (doctor_id, start_at) VALUES (?, '2030-01-03 09:00')",
+        (doctors[2],),
+    )
+    conn.commit()
+    book(7, 2, "2030-01-03", "15:00", request_approval=True)
+    review_pending(conn, doctors[2], "approve")
+
+    reassign_future(conn, doctors[0], "reassign_or_cancel")
+    conn.execute("DELETE FROM appointments WHERE id = ?", (future[1],))
+    conn.commit()
+    archive_appointments(conn, "2021-01-01")
+    book(0, 0, "2020-02-01", "09:00")
+    return doctors, patients
+
+
+@pytest.fixture
+def app(tmp_path):
+    # A bare Flask app over its own fresh database, wired up the way
+    # create_app() does it; tests add the pieces they exercise.
+    from flask import Flask
+    from flask_login import LoginManager
+
+    from database import close_db, ensure_schema, init_pool
+
+    app = Flask(__name__, template_folder=str(tmp_path / "templates"))
+    app.config.update(
+        SECRET_KEY="test",
+        DATABASE=str(tmp_path / "app.db"),
+        ARCHIVE_DATABASE=str(tmp_path / "app-archive.db"),
+        PASSWORD_HASH_METHOD="pbkdf2:sha256:1000",
+    )
+    init_pool(app)
+    app.teardown_appcontext(close_db)
+    ensure_schema(app)
+    LoginManager(app).user_loader(lambda user_id: None)
+    yield app
+    app.extensions["db_pool"].close_all()
+    app.extensions["db_read_pool"].close_all()
@@ -0,0 +1,106 @@
+import sqlite3
+
+import pytest
+
+from archive import APPOINTMENT_COLUMNS, archive_appointments, with_archive
+from migrations import migrate
+from pagination import page_query
+from patient_routes import HISTORY_SQL
+
+
+def visit(conn, patient, doctor, day, status="Completed"):
+    cursor = conn.execute(
+        "INSERT INTO appointments (patient_id, doctor_id, date, time, status)"
+        " VALUES (?, ?, ?, '09:00', ?)",
+        (patient, doctor, day, status),
+    )
+    conn.commit()
+    return cursor.lastrowid
+
+
+def history(conn, patient, limit=25, after=None):
+    sql, params = page_query(
+        with_archive(conn, HISTORY_SQL),
+        ["a.patient_id = ?"],
+        [patient],
+        limit=limit,
+        after=after,
+    )
+    return [(row["id"], row["status"]) for row in conn.execute(sql, params)]
+
+
+def test_history_spans_live_and_archived_rows(conn, clinic):
+    doctor, patients = clinic
+    old = [visit(conn, patients[0], doctor, f"2020-01-0{day}") for day in (1, 2, 3)]
+    visit(conn, patients[1], doctor, "2020-01-04")
+    assert archive_appointments(conn, "2021-01-01") == 4
+    upcoming = visit(conn, patients[0], doctor, "2030-01-01", status="Booked")
+
+    assert history(conn, patients[0]) == [
+        (upcoming, "Booked"),
+        *[(id, "Completed") for id in reversed(old)],
+    ]
+
+
+def test_row_in_both_tables_is_listed_once(conn, clinic):
+    # An archive run that stopped between its copy and its delete.
+    doctor, patients = clinic
+    first = visit(conn, patients[0], doctor, "2020-01-01")
+    second = visit(conn, patients[0], doctor, "2020-01-02")
+    conn.execute(
+        f"INSERT INTO archive.appointments ({APPOINTMENT_COLUMNS})"
+        f" SELECT {APPOINTMENT_COLUMNS} FROM main.appointments"
+    )
+    conn.commit()
+
+    assert history(conn, patients[0]) == [(second, "Completed"), (first, "Completed")]
+    # Keyset pages skip the duplicate as well.
+    assert history(conn, patients[0], limit=1) == [
+        (second, "Completed"),
+        (first, "Completed"),
+    ]
+    assert history(conn, patients[0], after=("2020-01-02 09:00", second)) == [
+        (first, "Completed")
+    ]
+
+    assert archive_appointments(conn, "2021-01-01") == 2
+    assert history(conn, patients[0]) == [(second, "Completed"), (first, "Completed")]
+    assert conn.execute("SELECT COUNT(*) FROM main.appointments").fetchone()[0] == 0
+
+
+def test_archive_moves_only_finished_past_rows(conn, clinic):
+    doctor, patients = clinic
+    done = [visit(conn, patients[0], doctor, f"2020-01-0{day}") for day in (1, 2, 3)]
+    cancelled = visit(conn, patients[1], doctor, "2020-01-04", status="Cancelled")
+    open_past = visit(conn, patients[2], doctor, "2020-01-05", status="Booked")
+    later = visit(conn, patients[3], doctor, "2022-01-01")
+    done.append(visit(conn, patients[0], doctor, "2020-01-06"))
+    conn.executemany(
+        "INSERT INTO treatments (appointment_id, diagnosis) VALUES (?, 'Flu')",
+        [(done[0],), (later,)],
+    )
+    conn.commit()
+
+    assert archive_appointments(conn, "2021-01-01", batch_size=2) == 5
+    archived = [row[0] for row in conn.execute("SELECT id FROM archive.appointments")]
+    assert sorted(archived) == sorted(done + [cancelled])
+    live = [row[0] for row in conn.execute("SELECT id FROM main.appointments")]
+    assert sorted(live) == [open_past, later]
+    treatments = conn.execute(
+        "SELECT appointment_id FROM archive.treatments"
+        " UNION ALL SELECT appointment_id FROM main.treatments"
+    ).fetchall()
+    assert [row[0] for row in treatments] == [done[0], later]
+
+    assert archive_appointments(conn, "2021-01-01") == 0
+    # The newest row went to the archive; its id is not handed out again.
+    assert visit(conn, patients[0], doctor, "2030-01-01") > max(archived)
+
+
+def test_archive_needs_an_attached_database(tmp_path):
+    conn = sqlite3.connect(tmp_path / "bare.db")
+    conn.row_factory = sqlite3.Row
+    migrate(conn)
+    with pytest.raises(RuntimeError):
+        archive_appointments(conn, "2021-01-01")
+    conn.close()
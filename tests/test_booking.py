@@ -0,0 +1,124 @@
+import threading
+from collections import Counter
+
+import pytest
+
+from archive import with_archive
+from booking import BOOKED, CONFLICT, PENDING_APPROVAL, book_appointment
+from patient_routes import HISTORY_SQL
+
+SLOT = ("2030-01-01", "09:00")
+
+
+def test_taken_slot_is_a_conflict(conn, clinic):
+    doctor, patients = clinic
+    assert book_appointment(conn, patients[0], doctor, *SLOT).status == BOOKED
+    result = book_appointment(conn, patients[1], doctor, *SLOT)
+    assert result.status == CONFLICT
+    assert not conn.in_transaction
+
+
+def cancel(conn, appointment_id):
+    conn.execute(
+        "UPDATE appointments SET status = 'Cancelled' WHERE id = ?", (appointment_id,)
+    )
+    conn.commit()
+
+
+def history(conn, patient_id):
+    return [
+        (row["id"], row["status"])
+        for row in conn.execute(
+            f"{with_archive(conn, HISTORY_SQL)} WHERE a.patient_id = ?", (patient_id,)
+        )
+    ]
+
+
+def test_cancelled_slot_is_rebooked_without_taking_the_row(conn, clinic):
+    doctor, patients = clinic
+    first = book_appointment(conn, patients[0], doctor, *SLOT)
+    cancel(conn, first.appointment_id)
+
+    second = book_appointment(conn, patients[1], doctor, *SLOT)
+    assert second.status == BOOKED
+    assert second.appointment_id != first.appointment_id
+    assert history(conn, patients[0]) == [(first.appointment_id, "Cancelled")]
+    assert history(conn, patients[1]) == [(second.appointment_id, "Booked")]
+    # The slot is held again by the new booking.
+    assert book_appointment(conn, patients[2], doctor, *SLOT).status == CONFLICT
+
+
+def test_cancelled_row_with_treatment_stays_put(conn, clinic):
+    doctor, patients = clinic
+    first = book_appointment(conn, patients[0], doctor, *SLOT)
+    conn.execute(
+        "INSERT INTO treatments (appointment_id, diagnosis) VALUES (?, 'seen')",
+        (first.appointment_id,),
+    )
+    cancel(conn, first.appointment_id)
+
+    assert book_appointment(conn, patients[1], doctor, *SLOT).status == BOOKED
+    assert conn.execute(
+        "SELECT a.patient_id FROM treatments t JOIN appointments a"
+        " ON a.id = t.appointment_id"
+    ).fetchone()[0] == patients[0]
+
+
+def test_reschedule_into_a_cancelled_slot(conn, clinic):
+    doctor, patients = clinic
+    cancel(conn, book_appointment(conn, patients[0], doctor, *SLOT).appointment_id)
+    own = book_appointment(conn, patients[1], doctor, "2030-01-02", "09:00")
+    moved = book_appointment(
+        conn, patients[1], doctor, *SLOT, appointment_id=own.appointment_id
+    )
+    assert (moved.status, moved.appointment_id) == (BOOKED, own.appointment_id)
+    assert len(history(conn, patients[0])) == 1
+
+
+def test_off_schedule_needs_approval(conn, clinic):
+    doctor, patients = clinic
+    conn.execute(
+        "INSERT INTO doctor_slots (doctor_id, start_at) VALUES (?, '2030-01-01 10:00')",
+        (doctor,),
+    )
+    conn.commit()
+    result = book_appointment(conn, patients[0], doctor, *SLOT)
+    assert result.status == CONFLICT and result.can_request_approval
+    result = book_appointment(conn, patients[0], doctor, *SLOT, request_approval=True)
+    assert result.status == PENDING_APPROVAL
+
+
+def test_open_transaction_is_left_to_the_caller(conn, clinic):
+    doctor, patients = clinic
+    conn.execute("UPDATE patients SET contact = 'x' WHERE id = ?", (patients[0],))
+    with pytest.raises(RuntimeError):
+        book_appointment(conn, patients[0], doctor, *SLOT)
+    assert conn.in_transaction
+    conn.rollback()
+    assert conn.execute("SELECT COUNT(*) FROM appointments").fetchone()[0] == 0
+
+
+def test_one_winner_per_slot(pool, clinic):
+    doctor, patients = clinic
+    results = Counter()
+    lock = threading.Lock()
+    barrier = threading.Barrier(len(patients), timeout=30)
+
+    def worker(patient_id):
+        conn = pool.acquire()
+        try:
+            barrier.wait()
+            result = book_appointment(
+                conn, patient_id, doctor, *SLOT, retries=50, backoff=0.001
+            )
+        finally:
+            pool.release(conn)
+        with lock:
+            results[result.status] += 1
+
+    threads = [threading.Thread(target=worker, args=(p,)) for p in patients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == {BOOKED: 1, CONFLICT: len(patients) - 1}
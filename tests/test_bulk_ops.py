@@ -0,0 +1,101 @@
+from booking import book_appointment
+from bulk_ops import preview_reassignment, reassign_future, review_pending
+
+DAY = "2031-01-01"
+
+
+def book(conn, patient, doctor, time_, **kwargs):
+    return book_appointment(conn, patient, doctor, DAY, time_, **kwargs).appointment_id
+
+
+def statuses(conn, ids):
+    return [
+        conn.execute("SELECT status FROM appointments WHERE id = ?", (i,)).fetchone()[0]
+        for i in ids
+    ]
+
+
+def doctor_of(conn, appointment_id):
+    return conn.execute(
+        "SELECT doctor_id FROM appointments WHERE id = ?", (appointment_id,)
+    ).fetchone()[0]
+
+
+def test_review_pending_only_touches_the_doctors_requests(conn, hospital):
+    doctors, patients = hospital
+    # doctors[2] publishes a schedule, so off-schedule times need approval.
+    requests = [
+        book(conn, patients[n], doctors[2], f"1{n}:00", request_approval=True)
+        for n in range(3)
+    ]
+    assert statuses(conn, requests) == ["PendingApproval"] * 3
+
+    assert review_pending(conn, doctors[0], "approve") == 0
+    assert review_pending(conn, doctors[2], "approve", [requests[0]]) == 1
+    assert review_pending(conn, doctors[2], "reject") == 2
+    assert statuses(conn, requests) == ["Booked", "Cancelled", "Cancelled"]
+    assert review_pending(conn, doctors[2], "approve", requests) == 0
+
+
+def test_reassignment_moves_what_fits_then_cancels_the_rest(conn, hospital):
+    doctors, patients = hospital
+    moving = [book(conn, patients[n], doctors[0], f"{9 + n:02d}:00") for n in range(3)]
+    # doctors[1], in the same department, is busy at 10:00; its cancelled
+    # 11:00 booking does not hold the slot.
+    book(conn, patients[3], doctors[1], "10:00")
+    cancelled = book(conn, patients[4], doctors[1], "11:00")
+    conn.execute(
+        "UPDATE appointments SET status = 'Cancelled' WHERE id = ?", (cancelled,)
+    )
+    conn.commit()
+
+    preview = {
+        row["id"]: row["target"] for row in preview_reassignment(conn, doctors[0])
+    }
+    assert [preview[i] for i in moving] == [doctors[1], None, doctors[1]]
+
+    summary = reassign_future(conn, doctors[0], "reassign")
+    assert (summary.reassigned, summary.cancelled, summary.unmatched) == (2, 0, 1)
+    assert summary.by_doctor == {doctors[1]: 2}
+    assert [doctor_of(conn, i) for i in moving] == [doctors[1], doctors[0], doctors[1]]
+
+    summary = reassign_future(conn, doctors[0], "reassign_or_cancel")
+    assert (summary.reassigned, summary.cancelled, summary.unmatched) == (0, 1, 0)
+    assert statuses(conn, moving) == ["Booked", "Cancelled", "Booked"]
+
+
+def test_reassignment_skips_blacklisted_doctors_and_other_departments(
+    conn, hospital
+):
+    doctors, patients = hospital
+    moving = book(conn, patients[0], doctors[0], "09:00")
+    conn.execute("UPDATE doctors SET is_blacklisted = 1 WHERE id = ?", (doctors[1],))
+    conn.commit()
+
+    summary = reassign_future(conn, doctors[0], "reassign")
+    assert (summary.reassigned, summary.unmatched) == (0, 1)
+    assert doctor_of(conn, moving) == doctors[0]
+
+    summary = reassign_future(conn, doctors[0], "cancel")
+    assert (summary.reassigned, summary.cancelled) == (0, 1)
+    assert statuses(conn, [moving]) == ["Cancelled"]
+
+
+def test_doctor_with_a_schedule_only_takes_published_slots(conn, hospital):
+    doctors, patients = hospital
+    conn.execute(
+        "UPDATE doctors SET department_id = (SELECT department_id FROM doctors"
+        " WHERE id = ?) WHERE id = ?",
+        (doctors[0], doctors[2]),
+    )
+    conn.execute("UPDATE doctors SET is_blacklisted = 1 WHERE id = ?", (doctors[1],))
+    conn.execute(
+        "INSERT INTO doctor_slots (doctor_id, start_at) VALUES (?, ?)",
+        (doctors[2], f"{DAY} 10:00"),
+    )
+    conn.commit()
+    moving = [book(conn, patients[n], doctors[0], f"{9 + n:02d}:00") for n in range(2)]
+
+    summary = reassign_future(conn, doctors[0], "reassign")
+    assert (summary.reassigned, summary.unmatched) == (1, 1)
+    assert [doctor_of(conn, i) for i in moving] == [doctors[0], doctors[2]]
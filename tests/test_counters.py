@@ -0,0 +1,64 @@
+from archive import has_archive
+from counters import read_totals, rebuild_counters
+
+
+def counters(conn):
+    # A rebuild leaves out the zero rows that triggers decrement down to.
+    return dict(
+        ((row["scope"], row["key"]), row["value"])
+        for row in conn.execute(
+            "SELECT scope, key, value FROM counters"
+            " WHERE scope != 'version' AND value != 0"
+        )
+    )
+
+
+def assert_matches_rebuild(conn):
+    incremental = counters(conn)
+    conn.execute("BEGIN IMMEDIATE")
+    rebuild_counters(conn)
+    rebuilt = counters(conn)
+    conn.rollback()
+    assert incremental == rebuilt
+
+
+def test_counters_match_a_rebuild(conn, hospital):
+    assert has_archive(conn)
+    archived = conn.execute("SELECT COUNT(*) FROM archive.appointments").fetchone()[0]
+    live = conn.execute("SELECT COUNT(*) FROM main.appointments").fetchone()[0]
+    assert archived and live
+    assert read_totals(conn) == {
+        "doctors": 3,
+        "patients": 8,
+        "appointments": archived + live,
+    }
+    assert_matches_rebuild(conn)
+
+
+def test_department_move_carries_archived_appointments(conn, hospital):
+    doctors, _ = hospital
+    for doctor, department in ((doctors[0], "Brain"), (doctors[2], None)):
+        conn.execute(
+            "UPDATE doctors SET department_id ="
+            " (SELECT id FROM departments WHERE name = ?) WHERE id = ?",
+            (department, doctor),
+        )
+        conn.commit()
+        assert_matches_rebuild(conn)
+
+
+def test_deleting_a_doctor_and_patient_updates_totals(conn, hospital):
+    conn.execute(
+        "INSERT INTO users (username, email, password_hash, role)"
+        " VALUES ('late', 'late@example.com', '-', 'patient')"
+    )
+    conn.execute(
+        "INSERT INTO patients (user_id, full_name)"
+        " SELECT id, 'Late' FROM users WHERE username = 'late'"
+    )
+    conn.commit()
+    assert read_totals(conn)["patients"] == 9
+    conn.execute("DELETE FROM patients WHERE full_name = 'Late'")
+    conn.commit()
+    assert read_totals(conn)["patients"] == 8
+    assert_matches_rebuild(conn)
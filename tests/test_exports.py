@@ -0,0 +1,60 @@
+import csv
+import io
+import json
+
+from archive import APPOINTMENT_COLUMNS
+from exports import EXPORT_COLUMNS, stream_export
+
+
+def csv_rows(conn, filters=None, batch_size=3):
+    body = "".join(stream_export(conn, "csv", filters or {}, batch_size=batch_size))
+    header, *rows = csv.reader(io.StringIO(body))
+    assert tuple(header) == EXPORT_COLUMNS
+    return [dict(zip(header, row)) for row in rows]
+
+
+def ndjson_rows(conn, filters=None, batch_size=3):
+    body = "".join(stream_export(conn, "ndjson", filters or {}, batch_size=batch_size))
+    return [json.loads(line) for line in body.splitlines()]
+
+
+def count(conn, table, where="1"):
+    return conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {where}").fetchone()[0]
+
+
+def test_export_covers_live_and_archived_rows(conn, hospital):
+    live = count(conn, "main.appointments")
+    archived = count(conn, "archive.appointments")
+    assert live and archived
+
+    rows = csv_rows(conn)
+    assert len(rows) == live + archived
+    assert len({row["appointment_id"] for row in rows}) == len(rows)
+    assert [row["start_at"] for row in rows] == sorted(row["start_at"] for row in rows)
+    assert sum(1 for row in rows if row["diagnosis"]) == count(
+        conn, "archive.treatments"
+    )
+    assert [row["appointment_id"] for row in ndjson_rows(conn)] == [
+        int(row["appointment_id"]) for row in rows
+    ]
+
+
+def test_export_filters_apply_to_both_arms(conn, hospital):
+    doctors, _ = hospital
+    rows = ndjson_rows(conn, {"status": "Completed", "date_to": "2020-12-31"})
+    assert len(rows) == count(conn, "archive.appointments", "status = 'Completed'")
+
+    rows = ndjson_rows(conn, {"doctor_id": str(doctors[0])})
+    assert len(rows) == count(
+        conn, "main.appointments", f"doctor_id = {doctors[0]}"
+    ) + count(conn, "archive.appointments", f"doctor_id = {doctors[0]}")
+
+
+def test_row_in_both_tables_is_exported_once(conn, hospital):
+    total = count(conn, "main.appointments") + count(conn, "archive.appointments")
+    conn.execute(
+        f"INSERT INTO archive.appointments ({APPOINTMENT_COLUMNS})"
+        f" SELECT {APPOINTMENT_COLUMNS} FROM main.appointments"
+    )
+    conn.commit()
+    assert len(csv_rows(conn)) == total
@@ -0,0 +1,79 @@
+from flask import render_template, render_template_string
+
+from database import get_db
+from fragments import Lazy, init_templates
+
+DEPARTMENTS = """
+{%- call fragment("departments", "departments") -%}
+{{ departments|length }}:{{ renders() }}
+{%- endcall -%}
+"""
+
+
+def setup(app, tmp_path, size=512):
+    app.config["JINJA_BYTECODE_CACHE_DIR"] = str(tmp_path / "jinja")
+    app.config["FRAGMENT_CACHE_SIZE"] = size
+    cache = init_templates(app)
+    renders = []
+    app.jinja_env.globals["renders"] = lambda: renders.append(1) or len(renders)
+    return cache
+
+
+def render(app, loads=None):
+    loads = [] if loads is None else loads
+    with app.test_request_context():
+        conn = get_db()
+
+        def load():
+            loads.append(1)
+            return conn.execute("SELECT * FROM departments").fetchall()
+
+        return render_template_string(DEPARTMENTS, departments=Lazy(load))
+
+
+def add_department(app, name):
+    with app.app_context():
+        conn = get_db(write=True)
+        conn.execute("INSERT INTO departments (name) VALUES (?)", (name,))
+        conn.commit()
+
+
+def test_fragment_is_reused_until_its_data_changes(app, tmp_path):
+    cache = setup(app, tmp_path)
+    loads = []
+    assert render(app, loads) == "4:1"  # seed_db's departments
+    assert render(app, loads) == "4:1"
+    assert len(loads) == 1  # the cached fragment never touched its rows
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    add_department(app, "Radiology")
+    assert render(app, loads) == "5:2"
+    assert len(loads) == 2
+
+
+def test_unrelated_writes_keep_the_fragment(app, tmp_path):
+    setup(app, tmp_path)
+    assert render(app) == "4:1"
+    with app.app_context():
+        conn = get_db(write=True)
+        conn.execute(
+            "INSERT INTO users (username, email, password_hash, role)"
+            " VALUES ('pat', 'pat@example.com', '-', 'patient')"
+        )
+        conn.commit()
+    assert render(app) == "4:1"
+
+
+def test_disabled_cache_renders_every_time(app, tmp_path):
+    assert setup(app, tmp_path, size=0) is None
+    assert render(app) == "4:1"
+    assert render(app) == "4:2"
+
+
+def test_compiled_templates_are_written_to_the_bytecode_cache(app, tmp_path):
+    setup(app, tmp_path)
+    (tmp_path / "templates").mkdir()
+    (tmp_path / "templates" / "page.html").write_text("{{ 6 * 7 }}")
+    with app.test_request_context():
+        assert render_template("page.html") == "42"
+    assert list((tmp_path / "jinja").iterdir())
@@ -0,0 +1,114 @@
+import io
+from contextlib import contextmanager
+
+import pytest
+
+from importer import import_csv
+from passwords import PasswordHasher
+
+HASHER = PasswordHasher(method="pbkdf2:sha256:1000", workers=0)
+
+
+def run(conn, kind, text, **kwargs):
+    return import_csv(conn, kind, io.StringIO(text), HASHER, **kwargs)
+
+
+def usernames(conn, role):
+    return [
+        row[0]
+        for row in conn.execute(
+            "SELECT username FROM users WHERE role = ? ORDER BY id", (role,)
+        )
+    ]
+
+
+def test_duplicates_are_rejected_per_row(conn, clinic):
+    report = run(
+        conn,
+        "patient",
+        "username,email,full_name,password,age\n"
+        "p0,new0@example.com,Taken Username,pw,\n"  # 2: taken in the database
+        "n1,p1@example.com,Taken Email,pw,\n"  # 3: taken in the database
+        "n2,n2@example.com,Fresh,pw,40\n"  # 4
+        "n2,other@example.com,Repeat Username,pw,\n"  # 5: repeated in the file
+        "n3,n2@example.com,Repeat Email,pw,\n"  # 6: repeated in the file
+        "n4,not-an-email,Bad Email,pw,\n"  # 7
+        "n5,n5@example.com,Bad Age,pw,200\n"  # 8
+        "n6,n6@example.com,Fresh Too,pw,\n",  # 9
+        chunk_size=2,
+    )
+    assert report.inserted == 2
+    assert report.errors == [
+        (2, "p0", "username already exists"),
+        (3, "n1", "email already exists"),
+        (5, "n2", "duplicate username in file"),
+        (6, "n3", "duplicate email in file"),
+        (7, "n4", "invalid email"),
+        (8, "n5", "invalid age"),
+    ]
+    assert usernames(conn, "patient")[-2:] == ["n2", "n6"]
+    assert conn.execute(
+        "SELECT age FROM patients p JOIN users u ON u.id = p.user_id"
+        " WHERE u.username = 'n2'"
+    ).fetchone()[0] == 40
+    assert not conn.in_transaction
+
+
+def test_doctors_resolve_departments_and_keep_given_hashes(conn):
+    conn.execute("INSERT INTO departments (name) VALUES ('Cardiology')")
+    conn.commit()
+    pwhash = HASHER.hash("given")
+    report = run(
+        conn,
+        "doctor",
+        "username,email,full_name,specialization,department,password,password_hash\n"
+        f"d1,d1@example.com,Doc One,Heart,cardiology,,{pwhash}\n"
+        "d2,d2@example.com,Doc Two,Brain,Neurology,pw,\n"
+        "d3,d3@example.com,Doc Three,General,,,not-a-hash\n"
+        "d4,d4@example.com,Doc Four,General,,pw,\n",
+    )
+    assert report.inserted == 2
+    assert [error[:2] for error in report.errors] == [(3, "d2"), (4, "d3")]
+    rows = conn.execute(
+        """
+        SELECT u.username, u.password_hash, dept.name
+        FROM doctors d JOIN users u ON u.id = d.user_id
+        LEFT JOIN departments dept ON dept.id = d.department_id
+        ORDER BY u.id
+        """
+    ).fetchall()
+    assert [(row[0], row[2]) for row in rows] == [("d1", "Cardiology"), ("d4", None)]
+    assert rows[0][1] == pwhash
+    assert HASHER.verify(rows[1][1], "pw")
+
+
+def test_chunk_that_loses_a_race_is_rolled_back_and_reported(conn, clinic):
+    @contextmanager
+    def writer():
+        # Another request registers n1 between the duplicate check and the
+        # insert.
+        conn.execute(
+            "INSERT INTO users (username, email, password_hash, role)"
+            " VALUES ('n1', 'elsewhere@example.com', '-', 'patient')"
+        )
+        conn.commit()
+        yield conn
+
+    report = run(
+        conn,
+        "patient",
+        "username,email,full_name,password\n"
+        "n0,n0@example.com,A,pw\n"
+        "n1,n1@example.com,B,pw\n",
+        writer=writer,
+    )
+    assert report.inserted == 0
+    assert [error[:2] for error in report.errors] == [(2, "n0"), (3, "n1")]
+    assert "n0" not in usernames(conn, "patient")
+
+
+def test_refuses_to_run_inside_an_open_transaction(conn, clinic):
+    conn.execute("BEGIN")
+    with pytest.raises(RuntimeError):
+        run(conn, "patient", "username,email,full_name,password\n")
+    conn.rollback()
@@ -0,0 +1,113 @@
+import json
+
+from booking import book_appointment
+from database import get_db
+from live_feed import FeedHub, Subscription, feed_position, purge_events, replay
+
+DAY = "2030-01-01"
+
+
+def kinds(events):
+    return [(event["appointment_id"], event["kind"]) for event in events]
+
+
+def test_replay_returns_the_doctors_changes_after_the_cursor(conn, hospital):
+    doctors, patients = hospital
+    start = feed_position(conn)
+    booked = book_appointment(
+        conn, patients[0], doctors[0], DAY, "16:00"
+    ).appointment_id
+    book_appointment(conn, patients[1], doctors[1], DAY, "16:00")
+    book_appointment(
+        conn, patients[0], doctors[0], DAY, "17:00", appointment_id=booked
+    )
+    conn.execute(
+        "UPDATE appointments SET doctor_id = ? WHERE id = ?", (doctors[1], booked)
+    )
+    conn.commit()
+
+    events = replay(conn, doctors[0], start)
+    assert kinds(events) == [
+        (booked, "booked"),
+        (booked, "rescheduled"),
+        (booked, "reassigned"),
+    ]
+    assert events[1]["start_at"] == f"{DAY} 17:00"
+    assert kinds(replay(conn, doctors[0], events[0]["id"])) == kinds(events[1:])
+    assert replay(conn, doctors[0], feed_position(conn)) == []
+    assert [event["kind"] for event in replay(conn, doctors[1], start)] == [
+        "booked",
+        "booked",
+    ]
+
+
+def test_replay_asks_for_a_reload_when_the_gap_is_too_big(conn, hospital):
+    doctors, patients = hospital
+    start = feed_position(conn)
+    for n in range(3):
+        book_appointment(conn, patients[n], doctors[0], DAY, f"{16 + n}:00")
+    assert len(replay(conn, doctors[0], start, limit=3)) == 3
+    assert replay(conn, doctors[0], start, limit=2) is None
+
+    conn.execute("UPDATE appointment_events SET created_at = '2000-01-01 00:00:00'")
+    conn.commit()
+    assert purge_events(conn, keep_hours=24) > 0
+    book_appointment(conn, patients[4], doctors[0], DAY, "20:00")
+    assert replay(conn, doctors[0], start) is None  # purged events were missed
+    assert len(replay(conn, doctors[0], feed_position(conn) - 1)) == 1
+
+
+def event(id_, doctor_id=1):
+    return {"id": id_, "doctor_id": doctor_id, "kind": "booked"}
+
+
+def test_stream_sends_backlog_then_new_live_events(app):
+    hub = FeedHub(app)
+    subscription = Subscription(1, max_queue=8)
+    for id_ in (1, 2, 3):
+        subscription.put(event(id_))
+    body = hub.stream(subscription, backlog=[event(1), event(2)], heartbeat=0.01)
+
+    assert next(body) == "retry: 3000\n\n"
+    sent = [next(body) for _ in range(3)]
+    assert [line.split("\n")[0] for line in sent] == ["id: 1", "id: 2", "id: 3"]
+    assert json.loads(sent[2].split("data: ")[1]) == event(3)
+    assert next(body) == ": ping\n\n"
+
+
+def test_overflowing_client_is_dropped(app):
+    hub = FeedHub(app)
+    subscription = hub.subscribe(1)
+    hub.stop()
+    subscription.queue.maxsize = 1
+    subscription.put(event(1))
+    subscription.put(event(2))
+    assert subscription.overflowed
+    assert list(hub.stream(subscription)) == ["retry: 3000\n\n"]
+    assert hub.subscriber_count() == 0
+
+
+def test_poller_fans_out_to_each_doctors_subscribers(app):
+    hub = FeedHub(app, poll_interval=0.05)
+    first, second, other = hub.subscribe(1), hub.subscribe(1), hub.subscribe(2)
+    try:
+        with app.app_context():
+            conn = get_db(write=True)
+            conn.executemany(
+                "INSERT INTO appointment_events (doctor_id, appointment_id, kind)"
+                " VALUES (?, ?, 'booked')",
+                [(1, 10), (2, 20), (1, 11)],
+            )
+            conn.commit()
+        for subscription, expected in (
+            (first, [10, 11]),
+            (second, [10, 11]),
+            (other, [20]),
+        ):
+            received = [
+                subscription.queue.get(timeout=5)["appointment_id"] for _ in expected
+            ]
+            assert received == expected
+        assert hub.subscriber_count() == 3
+    finally:
+        hub.stop()
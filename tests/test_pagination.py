@@ -0,0 +1,109 @@
+import base64
+
+import pytest
+from flask import Flask
+
+from pagination import decode_cursor, encode_cursor, fetch_page
+
+SELECT = "SELECT a.* FROM appointments a"
+
+
+@pytest.fixture
+def app():
+    return Flask(__name__)
+
+
+@pytest.fixture
+def appointments(conn):
+    # Three doctors booked at the same times, so most start_at values tie
+    # and only the id orders them.
+    conn.executemany(
+        "INSERT INTO users (username, email, password_hash, role)"
+        " VALUES (?, ?, '-', ?)",
+        [(f"d{i}", f"d{i}@example.com", "doctor") for i in range(3)]
+        + [("p", "p@example.com", "patient")],
+    )
+    conn.execute(
+        "INSERT INTO doctors (user_id, full_name, specialization)"
+        " SELECT id, username, 'General' FROM users WHERE role = 'doctor'"
+    )
+    conn.execute(
+        "INSERT INTO patients (user_id, full_name)"
+        " SELECT id, username FROM users WHERE role = 'patient'"
+    )
+    conn.execute(
+        """
+        INSERT INTO appointments (patient_id, doctor_id, date, time, status)
+        SELECT p.id, d.id, '2030-01-0' || t.day, t.time, 'Booked'
+        FROM patients p, doctors d,
+             (SELECT 1 AS day, '09:00' AS time UNION ALL SELECT 1, '10:00'
+              UNION ALL SELECT 2, '09:00' UNION ALL SELECT 3, '09:00') t
+        """
+    )
+    conn.commit()
+    return [
+        row[0]
+        for row in conn.execute(
+            "SELECT id FROM appointments ORDER BY start_at DESC, id DESC"
+        )
+    ]
+
+
+def page(app, conn, query=""):
+    with app.test_request_context(f"/{query}"):
+        return fetch_page(conn, SELECT)
+
+
+def ids(result):
+    return [row["id"] for row in result.items]
+
+
+def test_next_and_prev_round_trip(app, conn, appointments):
+    pages = [page(app, conn, "?limit=5")]
+    assert pages[0].prev_cursor is None
+    while pages[-1].next_cursor:
+        pages.append(page(app, conn, f"?limit=5&after={pages[-1].next_cursor}"))
+    assert [i for p in pages for i in ids(p)] == appointments
+    assert pages[-1].next_cursor is None and len(pages) == 3
+
+    back = pages[-1]
+    for expected in reversed(pages[:-1]):
+        back = page(app, conn, f"?limit=5&before={back.prev_cursor}")
+        assert ids(back) == ids(expected)
+    assert back.prev_cursor is None
+
+
+def test_ties_on_start_at_are_split_by_id(app, conn, appointments):
+    # Page boundaries that fall inside a group of equal start_at values
+    # must neither repeat nor skip rows.
+    seen = []
+    cursor = ""
+    while True:
+        result = page(app, conn, f"?limit=2{cursor}")
+        seen.extend(ids(result))
+        if not result.next_cursor:
+            break
+        cursor = f"&after={result.next_cursor}"
+    assert seen == appointments
+
+
+@pytest.mark.parametrize(
+    "token",
+    [
+        "not-base64!",
+        base64.urlsafe_b64encode(b"2030-01-01 09:00|abc").decode(),
+        base64.urlsafe_b64encode(b"no separator").decode(),
+        base64.urlsafe_b64encode(b"\xff\xfe|1").decode(),
+    ],
+)
+def test_invalid_cursor_falls_back_to_first_page(app, conn, appointments, token):
+    assert decode_cursor(token) is None
+    first = page(app, conn, "?limit=5")
+    assert ids(page(app, conn, f"?limit=5&after={token}")) == ids(first)
+    assert ids(page(app, conn, f"?limit=5&before={token}")) == ids(first)
+
+
+def test_cursor_round_trip():
+    token = encode_cursor({"start_at": "2030-01-01 09:00", "id": 42})
+    assert "=" not in token
+    assert decode_cursor(token) == ("2030-01-01 09:00", 42)
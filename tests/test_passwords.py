@@ -0,0 +1,42 @@
+import time
+
+import pytest
+
+from passwords import HasherBusy, PasswordHasher
+
+
+def test_timed_out_hash_keeps_its_slot_until_it_finishes():
+    hasher = PasswordHasher(
+        method="pbkdf2:sha256:1000", workers=1, max_pending=1, timeout=10.0
+    )
+    try:
+        hasher.hash("warm up")  # start the worker so the sleep is dispatched
+        hasher.timeout = 0.2
+        with pytest.raises(HasherBusy, match="timed out"):
+            hasher._run(time.sleep, 1.5)
+        # The sleep still occupies the pool, so its slot is still taken.
+        with pytest.raises(HasherBusy, match="queue is full"):
+            hasher.hash("secret")
+        time.sleep(2)
+        hasher.timeout = 10.0
+        assert hasher.verify(hasher.hash("secret"), "secret")
+    finally:
+        hasher.shutdown()
+
+
+def test_hash_many_keeps_order_and_releases_slots():
+    hasher = PasswordHasher(method="pbkdf2:sha256:1000", workers=2, max_pending=4)
+    try:
+        passwords = [f"pw{i}" for i in range(10)]
+        hashes = hasher.hash_many(passwords, chunksize=3)
+        assert [hasher.verify(h, p) for h, p in zip(hashes, passwords)] == [True] * 10
+    finally:
+        hasher.shutdown()
+
+
+def test_inline_hasher_round_trip():
+    hasher = PasswordHasher(method="pbkdf2:sha256:1000", workers=0)
+    pwhash = hasher.hash("secret")
+    assert hasher.verify(pwhash, "secret")
+    assert not hasher.verify(pwhash, "wrong")
+    assert not hasher.needs_rehash(pwhash)
@@ -0,0 +1,21 @@
+from query_plans import check_query_plans, hot_queries
+
+
+def test_hot_queries_use_indexes(conn):
+    results = check_query_plans(conn)
+    assert results.keys() == hot_queries(conn).keys()
+    scans = {name: r["plan"] for name, r in results.items() if r["full_scans"]}
+    assert scans == {}
+
+
+def test_paged_queries_carry_keyset_and_limit(conn):
+    queries = hot_queries(conn)
+    sql, params = queries["admin.appointments:after"]
+    assert "(a.start_at, a.id) < (?, ?)" in sql
+    assert sql.rstrip().endswith("LIMIT ?")
+    assert params[-1] == 26
+
+
+def test_history_queries_cover_archive(conn):
+    sql, _ = hot_queries(conn)["patient.history:first"]
+    assert "archive.appointments" in sql
@@ -0,0 +1,76 @@
+import sqlite3
+
+import pytest
+from flask import g
+
+from database import get_db, read_mostly, write_lane
+
+
+@pytest.fixture
+def routes(app):
+    @app.route("/plain", methods=["GET", "POST"])
+    def plain():
+        return ""
+
+    @app.route("/mostly", methods=["POST"])
+    @read_mostly
+    def mostly():
+        return ""
+
+    return app
+
+
+def test_get_reads_through_a_read_only_connection(routes):
+    with routes.test_request_context("/plain"):
+        conn = get_db()
+        assert "db" not in g
+        with pytest.raises(sqlite3.OperationalError, match="readonly"):
+            conn.execute("INSERT INTO departments (name) VALUES ('x')")
+        assert get_db(write=True) is not conn
+        # Once the writer is held, reads see its uncommitted changes.
+        assert get_db() is g.db
+
+
+def test_post_defaults_to_the_writer(routes):
+    with routes.test_request_context("/plain", method="POST"):
+        conn = get_db()
+        assert conn is g.db
+        conn.execute("INSERT INTO departments (name) VALUES ('x')")
+        conn.rollback()
+
+
+def test_read_mostly_post_asks_for_the_writer(routes):
+    with routes.test_request_context("/mostly", method="POST"):
+        assert get_db() is g.read_db
+        assert "db" not in g
+        writer = get_db(write=True)
+        assert get_db() is writer
+
+
+def test_write_lane_hands_the_writer_back(routes):
+    pool = routes.extensions["db_pool"]
+    with routes.test_request_context("/mostly", method="POST"):
+        for name in ("a", "b"):
+            with write_lane() as conn:
+                conn.execute("INSERT INTO departments (name) VALUES (?)", (name,))
+                conn.commit()
+            assert "db" not in g
+            # The single writer lane is free again for other requests.
+            other = pool.acquire()
+            pool.release(other)
+
+        held = get_db(write=True)
+        with write_lane() as conn:
+            assert conn is held
+        assert g.db is held
+
+
+def test_teardown_returns_both_connections(routes):
+    pool, read_pool = routes.extensions["db_pool"], routes.extensions["db_read_pool"]
+    with routes.test_request_context("/plain"):
+        get_db()
+        get_db(write=True)
+        routes.do_teardown_appcontext()
+        assert "db" not in g and "read_db" not in g
+    assert pool.stats()["idle"] == pool.stats()["open"]
+    assert read_pool.stats()["idle"] == read_pool.stats()["open"]
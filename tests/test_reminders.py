@@ -0,0 +1,111 @@
+from booking import book_appointment
+from reminders import claim_batch, enqueue_due, purge_done, record_delivery
+
+NOW = "2030-01-01 08:00"
+
+
+def book(conn, clinic, patient, time_, day="2030-01-01"):
+    doctor, patients = clinic
+    return book_appointment(conn, patients[patient], doctor, day, time_).appointment_id
+
+
+def set_status(conn, appointment_id, status):
+    conn.execute(
+        "UPDATE appointments SET status = ? WHERE id = ?", (status, appointment_id)
+    )
+    conn.commit()
+
+
+def outbox(conn):
+    return [
+        tuple(row)
+        for row in conn.execute(
+            "SELECT appointment_id, status FROM reminder_outbox ORDER BY appointment_id"
+        )
+    ]
+
+
+def test_cursor_reads_each_appointment_once(conn, clinic):
+    started = book(conn, clinic, 0, "09:00", day="2029-12-31")
+    soon = book(conn, clinic, 1, "09:00")
+    cancelled = book(conn, clinic, 2, "10:00")
+    later = book(conn, clinic, 3, "13:00")
+    set_status(conn, cancelled, "Cancelled")
+
+    assert enqueue_due(conn, NOW, "2030-01-01 12:00", batch_size=1) == 1
+    assert outbox(conn) == [(soon, "pending")]
+    cursor = conn.execute(
+        "SELECT position, last_id FROM job_cursors WHERE name = 'reminders'"
+    ).fetchone()
+    assert tuple(cursor) == ("2030-01-01 10:00", cancelled)
+
+    # The cursor never re-reads what it passed; a booking that lands behind
+    # it is queued by trigger instead.
+    set_status(conn, cancelled, "Booked")
+    assert outbox(conn) == [(soon, "pending"), (cancelled, "pending")]
+    assert enqueue_due(conn, NOW, "2030-01-01 12:00") == 0
+    assert enqueue_due(conn, NOW, "2030-01-01 18:00") == 1
+    assert [row[0] for row in outbox(conn)] == [soon, cancelled, later]
+    assert started not in [row[0] for row in outbox(conn)]
+
+
+def test_claims_lease_rows_until_delivery_is_recorded(conn, clinic):
+    first = book(conn, clinic, 0, "09:00")
+    second = book(conn, clinic, 1, "10:00")
+    enqueue_due(conn, NOW, "2030-01-01 12:00")
+
+    messages = claim_batch(conn, batch_size=10)
+    assert [m["appointment_id"] for m in messages] == [first, second]
+    assert messages[0]["key"] == f"{first}@2030-01-01 09:00"
+    assert claim_batch(conn) == []  # still leased
+
+    record_delivery(conn, messages[:1])
+    record_delivery(conn, messages[1:], error=RuntimeError("gateway down"))
+    assert outbox(conn) == [(first, "sent"), (second, "pending")]
+    # A failed batch goes straight back to the queue.
+    assert [m["appointment_id"] for m in claim_batch(conn)] == [second]
+
+
+def test_expired_lease_is_claimed_again_until_attempts_run_out(conn, clinic):
+    appointment = book(conn, clinic, 0, "09:00")
+    enqueue_due(conn, NOW, "2030-01-01 12:00")
+    for attempt in range(1, 4):
+        conn.execute("UPDATE reminder_outbox SET claimed_at = '2000-01-01 00:00:00'")
+        conn.commit()
+        messages = claim_batch(conn, lease_seconds=60)
+        assert [m["appointment_id"] for m in messages] == [appointment]
+        record_delivery(conn, messages, error="timeout", max_attempts=3)
+    assert outbox(conn) == [(appointment, "failed")]
+    assert claim_batch(conn) == []
+
+
+def test_cancelled_and_moved_appointments_are_skipped(conn, clinic):
+    doctor, patients = clinic
+    cancelled = book(conn, clinic, 0, "09:00")
+    moved = book(conn, clinic, 1, "10:00")
+    enqueue_due(conn, NOW, "2030-01-01 12:00")
+    set_status(conn, cancelled, "Cancelled")
+    book_appointment(
+        conn, patients[1], doctor, "2030-01-01", "11:00", appointment_id=moved
+    )
+
+    assert claim_batch(conn) == []
+    assert outbox(conn) == [(cancelled, "skipped"), (moved, "skipped")]
+
+
+def test_purge_drops_only_old_finished_rows(conn, clinic):
+    for n in range(3):
+        book(conn, clinic, n, f"{9 + n:02d}:00")
+    enqueue_due(conn, NOW, "2030-01-01 12:00")
+    messages = claim_batch(conn)
+    record_delivery(conn, messages[:2])
+    conn.execute("UPDATE reminder_outbox SET created_at = '2000-01-01 00:00:00'")
+    conn.execute(
+        "UPDATE reminder_outbox SET status = 'pending', claimed_at = NULL"
+        " WHERE appointment_id = ?",
+        (messages[2]["appointment_id"],),
+    )
+    conn.commit()
+
+    assert purge_done(conn, keep_days=7) == 2
+    assert outbox(conn) == [(messages[2]["appointment_id"], "pending")]
@@ -0,0 +1,82 @@
+from archive import all_appointments
+from booking import book_appointment
+from rollups import (
+    daily_series,
+    department_summary,
+    doctor_summary,
+    pending_backlog,
+    rebuild_rollups,
+)
+
+TABLES = {
+    "daily_doctor_stats": "day, doctor_id",
+    "monthly_doctor_stats": "month, doctor_id",
+    "daily_department_stats": "day, department_id",
+}
+
+
+def rollups(conn):
+    # A rebuild leaves out the all-zero rows that decrements leave behind.
+    return {
+        table: conn.execute(
+            f"SELECT * FROM {table} WHERE total != 0 ORDER BY {key}"
+        ).fetchall()
+        for table, key in TABLES.items()
+    }
+
+
+def as_tuples(snapshot):
+    return {table: [tuple(row) for row in rows] for table, rows in snapshot.items()}
+
+
+def counted(conn, date_from, date_to):
+    # Per-doctor totals straight from live and archived appointments.
+    return {
+        row[0]: row[1]
+        for row in conn.execute(
+            f"""
+            SELECT doctor_id, COUNT(*) FROM {all_appointments(conn)}
+            WHERE date >= ? AND date <= ? GROUP BY doctor_id
+            """,
+            (date_from, date_to),
+        )
+    }
+
+
+def test_rollups_match_a_rebuild(conn, hospital):
+    incremental = as_tuples(rollups(conn))
+    assert all(incremental.values())
+    conn.execute("BEGIN IMMEDIATE")
+    rebuild_rollups(conn, all_appointments(conn))
+    rebuilt = as_tuples(rollups(conn))
+    conn.rollback()
+    assert incremental == rebuilt
+
+
+def test_doctor_summary_mixes_months_and_days(conn, hospital):
+    for date_from, date_to in [
+        ("2019-12-15", "2020-02-01"),  # partial, whole and partial month
+        ("2020-01-02", "2020-01-03"),  # days only
+        ("2020-01-01", "2031-12-31"),  # months only
+    ]:
+        summary = doctor_summary(conn, date_from, date_to)
+        assert {row["doctor_id"]: row["total"] for row in summary} == counted(
+            conn, date_from, date_to
+        )
+
+
+def test_department_views_and_backlog(conn, hospital):
+    doctors, patients = hospital
+    everything = ("2020-01-01", "2031-12-31")
+    totals = [row["total"] for row in department_summary(conn, *everything)]
+    assert sum(totals) == sum(counted(conn, *everything).values())
+    series = daily_series(conn, "2020-01-01", "2020-01-31")
+    assert sum(day["total"] for day in series) == 12
+    assert pending_backlog(conn)["pending"] == 0
+
+    book_appointment(
+        conn, patients[0], doctors[2], "2031-01-01", "10:00", request_approval=True
+    )
+    backlog = pending_backlog(conn)
+    assert backlog["pending"] == 1
+    assert [row["department"] for row in backlog["by_department"]] == ["Brain"]
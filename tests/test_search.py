@@ -0,0 +1,90 @@
+import pytest
+
+from search import search_doctors, search_patients
+
+
+@pytest.fixture
+def staff(conn):
+    conn.execute("INSERT INTO departments (name) VALUES ('Heart Centre')")
+    conn.execute("INSERT INTO departments (name) VALUES ('Brain Unit')")
+    doctors = [
+        ("ana", "Ana Ruiz", "Cardiology", "Heart Centre", 0),
+        ("jose", "José Núñez", "Cardiology", "Brain Unit", 0),
+        ("bo", "Bo Lin", "Neurology", "Brain Unit", 1),
+    ]
+    for username, name, specialization, department, blacklisted in doctors:
+        conn.execute(
+            "INSERT INTO users (username, email, password_hash, role)"
+            " VALUES (?, ?, '-', 'doctor')",
+            (username, f"{username}@example.com"),
+        )
+        conn.execute(
+            """
+            INSERT INTO doctors
+                (user_id, full_name, specialization, department_id, is_blacklisted)
+            SELECT u.id, ?, ?, dept.id, ?
+            FROM users u, departments dept
+            WHERE u.username = ? AND dept.name = ?
+            """,
+            (name, specialization, blacklisted, username, department),
+        )
+    conn.execute(
+        "INSERT INTO users (username, email, password_hash, role)"
+        " VALUES ('pat', 'pat@example.com', '-', 'patient')"
+    )
+    conn.execute(
+        "INSERT INTO patients (user_id, full_name, contact)"
+        " SELECT id, 'Priya Shah', '555-0101' FROM users WHERE username = 'pat'"
+    )
+    conn.commit()
+
+
+def names(rows):
+    return sorted(row["full_name"] for row in rows)
+
+
+def doctors(conn, text, **kwargs):
+    return names(search_doctors(conn, text, limit=10, **kwargs))
+
+
+def test_doctor_terms_are_prefixes_across_columns(conn, staff):
+    assert doctors(conn, "card") == ["Ana Ruiz", "José Núñez"]
+    assert doctors(conn, "heart") == ["Ana Ruiz"]
+    assert doctors(conn, "card brain") == ["José Núñez"]
+    assert doctors(conn, "nunez") == ["José Núñez"]
+
+
+def test_doctor_search_filters(conn, staff):
+    assert doctors(conn, "brain") == ["Bo Lin", "José Núñez"]
+    assert doctors(conn, "brain", include_blacklisted=False) == ["José Núñez"]
+    assert doctors(conn, "brain", columns=["full_name"]) == []
+
+
+def test_index_follows_edits(conn, staff):
+    conn.execute(
+        "UPDATE departments SET name = 'Cardiac Wing' WHERE name = 'Heart Centre'"
+    )
+    conn.execute(
+        "UPDATE doctors SET full_name = 'Ana Ortiz' WHERE full_name = 'Ana Ruiz'"
+    )
+    conn.commit()
+    assert doctors(conn, "heart") == []
+    assert doctors(conn, "wing ortiz") == ["Ana Ortiz"]
+
+    conn.execute("DELETE FROM doctors WHERE full_name = 'Bo Lin'")
+    conn.commit()
+    assert doctors(conn, "neuro") == []
+
+
+def test_patients_match_name_contact_and_reference(conn, staff):
+    patient_id = conn.execute("SELECT id FROM patients").fetchone()[0]
+    assert names(search_patients(conn, "pri", limit=10)) == ["Priya Shah"]
+    assert names(search_patients(conn, "555", limit=10)) == ["Priya Shah"]
+    assert names(search_patients(conn, str(patient_id), limit=10)) == ["Priya Shah"]
+
+
+def test_user_input_is_never_fts_syntax(conn, staff):
+    for text in ['"', "ana OR", "NEAR(ana bo)", "full_name:ana", "ana*", "-bo"]:
+        search_doctors(conn, text, limit=10)
+    assert doctors(conn, "ana OR bo") == []
+    assert len(doctors(conn, "  ")) == 3
@@ -0,0 +1,101 @@
+import gzip
+
+import pytest
+from flask import Flask
+
+from static_assets import IMMUTABLE, asset_url, init_assets
+
+CSS = b"body { color: #333; }\n" * 200
+
+
+@pytest.fixture
+def site(tmp_path):
+    static = tmp_path / "static"
+    (static / "css").mkdir(parents=True)
+    (static / "css" / "site.css").write_bytes(CSS)
+    (static / "logo.png").write_bytes(b"\x89PNG not really")
+    app = Flask(__name__, static_folder=str(static))
+    app.config["STATIC_FINGERPRINT"] = True
+    manifest = init_assets(app)
+
+    @app.route("/home")
+    def home():
+        return ""
+
+    return app, manifest
+
+
+def url(app, filename):
+    with app.test_request_context():
+        return asset_url("static", filename=filename)
+
+
+def test_urls_carry_a_content_hash(site, tmp_path):
+    app, manifest = site
+    css = url(app, "css/site.css")
+    digest = manifest.by_path["css/site.css"].digest
+    assert css == f"/static/css/site.{digest}.css"
+    assert url(app, "missing.js") == "/static/missing.js"
+    with app.test_request_context():
+        assert asset_url("home") == "/home"
+
+    (tmp_path / "static" / "css" / "site.css").write_bytes(CSS + b"a { }\n")
+    rebuilt = Flask(__name__, static_folder=str(tmp_path / "static"))
+    rebuilt.config["STATIC_FINGERPRINT"] = True
+    init_assets(rebuilt)
+    assert url(rebuilt, "css/site.css") != css
+
+
+def test_fingerprinted_files_are_immutable_and_compressed(site):
+    app, _ = site
+    client = app.test_client()
+    css = url(app, "css/site.css")
+
+    plain = client.get(css)
+    assert plain.data == CSS
+    assert plain.headers["Cache-Control"] == IMMUTABLE
+    assert plain.headers["Vary"] == "Accept-Encoding"
+    assert "Content-Encoding" not in plain.headers
+
+    packed = client.get(css, headers={"Accept-Encoding": "gzip"})
+    assert packed.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(packed.data) == CSS
+    assert packed.headers["ETag"] != plain.headers["ETag"]
+
+    revalidated = client.get(
+        css,
+        headers={"Accept-Encoding": "gzip", "If-None-Match": packed.headers["ETag"]},
+    )
+    assert revalidated.status_code == 304
+
+
+def test_brotli_is_preferred_when_available(site):
+    brotli = pytest.importorskip("brotli")
+    app, _ = site
+    response = app.test_client().get(
+        url(app, "css/site.css"), headers={"Accept-Encoding": "gzip, br"}
+    )
+    assert response.headers["Content-Encoding"] == "br"
+    assert brotli.decompress(response.data) == CSS
+
+
+def test_incompressible_and_plain_names(site):
+    app, _ = site
+    client = app.test_client()
+    logo = client.get(url(app, "logo.png"), headers={"Accept-Encoding": "gzip, br"})
+    assert logo.data == b"\x89PNG not really"
+    assert "Content-Encoding" not in logo.headers
+    assert "Vary" not in logo.headers
+
+    # The unhashed name still works through Flask's own handler.
+    fallback = client.get("/static/css/site.css")
+    assert fallback.status_code == 200
+    assert fallback.headers.get("Cache-Control") != IMMUTABLE
+    fallback.close()
+
+
+def test_disabled_fingerprinting_keeps_plain_urls(tmp_path):
+    app = Flask(__name__, static_folder=str(tmp_path / "static"))
+    app.config["STATIC_FINGERPRINT"] = False
+    assert init_assets(app) is None
+    assert url(app, "css/site.css") == "/static/css/site.css"
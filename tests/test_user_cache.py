@@ -0,0 +1,71 @@
+from counters import read_versions
+from user_cache import IdentityCache
+
+
+def worker_cache(conn):
+    # What each worker builds in create_app, minus the request context.
+    def load(user_id):
+        row = conn.execute(
+            """
+            SELECT u.id, u.username, d.is_blacklisted
+            FROM users u LEFT JOIN doctors d ON d.user_id = u.id
+            WHERE u.id = ?
+            """,
+            (user_id,),
+        ).fetchone()
+        return dict(row) if row else None
+
+    def version(user_id):
+        key = f"user:{user_id}"
+        return read_versions(conn, [key])[key]
+
+    return IdentityCache(load, version=version, ttl=3600)
+
+
+def doctor_user(conn):
+    return conn.execute("SELECT user_id FROM doctors").fetchone()[0]
+
+
+def test_other_workers_see_a_blacklisting(conn, clinic):
+    user_id = doctor_user(conn)
+    editor, other = worker_cache(conn), worker_cache(conn)
+    assert other.get(user_id)["is_blacklisted"] == 0
+    assert editor.get(user_id)["is_blacklisted"] == 0
+
+    conn.execute("UPDATE doctors SET is_blacklisted = 1 WHERE user_id = ?", (user_id,))
+    conn.commit()
+    editor.invalidate(user_id)
+
+    assert editor.get(user_id)["is_blacklisted"] == 1
+    assert other.get(user_id)["is_blacklisted"] == 1
+
+
+def test_other_workers_see_a_deletion(conn, clinic):
+    user_id = doctor_user(conn)
+    other = worker_cache(conn)
+    assert other.get(user_id)["username"] == "doc"
+
+    conn.execute("DELETE FROM doctors WHERE user_id = ?", (user_id,))
+    conn.execute("DELETE FROM users WHERE id = ?", (user_id,))
+    conn.commit()
+
+    assert other.get(user_id) is None
+
+
+def test_unchanged_user_is_served_from_cache(conn, clinic):
+    user_id = doctor_user(conn)
+    loads = []
+    cache = worker_cache(conn)
+    load = cache.loader
+    cache.loader = lambda key: loads.append(key) or load(key)
+
+    cache.get(user_id)
+    cache.get(user_id)
+    # Appointments and slots bump other stamps, not the user's.
+    conn.execute(
+        "INSERT INTO doctor_slots (doctor_id, start_at)"
+        " SELECT id, '2030-01-01 09:00' FROM doctors"
+    )
+    conn.commit()
+    cache.get(user_id)
+    assert loads == [user_id]
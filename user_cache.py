@@ -0,0 +1,57 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+
+class IdentityCache:
+    # Per-worker LRU with a TTL. invalidate() only reaches the worker that
+    # made the change; ``version`` returns the user's change stamp from the
+    # database, and an entry whose stamp has moved is reloaded, so other
+    # workers pick up a blacklisting or deletion on their next request.
+    def __init__(self, loader, version=None, max_size=1024, ttl=60.0):
+        self.loader = loader
+        self.version = version
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        key = int(user_id)
+        now = time.monotonic()
+        # Read the stamp before loading: a write that lands in between leaves
+        # a newer stamp behind and the next get() reloads.
+        stamp = self.version(key) if self.version else None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now and entry[1] == stamp:
+                self._entries.move_to_end(key)
+                return entry[2]
+
+        user = self.loader(key)
+        if user is None:
+            self.invalidate(key)
+            return None
+
+        with self._lock:
+            self._entries[key] = (now + self.ttl, stamp, user)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return user
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(int(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def invalidate_user(user_id):
+    cache = current_app.extensions.get("identity_cache")
+    if cache is not None:
+        cache.invalidate(user_id)
@@ -1,3 +1,5 @@
+import time
+from contextlib import contextmanager
 from functools import wraps
 from flask import redirect, url_for, flash
 from flask_login import current_user
@@ -19,3 +21,11 @@ def role_required(role):
 
     return decorator
 
+
+@contextmanager
+def timed(timings, name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = time.perf_counter() - started